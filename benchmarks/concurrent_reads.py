@@ -0,0 +1,79 @@
+"""Time several processes reading the cache in $HELPER_DATA at once.
+
+Each reader process calls `Sis.read_cache`, looks up a sample of students
+and then loads the rest of the roster, the way a cron job or `th -s` would.
+For each number of readers, this prints the wall time of the whole run and
+the slowest reader's time for each step. With `--publish`, another process
+republishes the cache (with `Sis.write_cache`) for as long as the readers
+run, to show that readers neither wait for the writer nor see a partial
+cache.
+
+    HELPER_DATA=/path/to/data python benchmarks/concurrent_reads.py \\
+        --readers 1 2 4 8 --publish
+"""
+
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import random
+from time import perf_counter
+
+from teacherhelper.sis import Sis
+
+
+def read(lookups: int, seed: int):
+    """Read the cache and time each step; returns the seconds taken to open
+    it, to look up *lookups* students, and to load every student."""
+    start = perf_counter()
+    sis = Sis.read_cache(check_date=False)
+    opened = perf_counter()
+    names = random.Random(seed).sample(list(sis.students), lookups)
+    for name in names:
+        assert sis.find_student(name) is not None
+    looked_up = perf_counter()
+    sum(len(st.guardians) for st in sis.students.values())
+    loaded = perf_counter()
+    sis._cache.close()
+    return opened - start, looked_up - opened, loaded - looked_up
+
+
+def publish(stop):
+    sis = Sis.read_cache(check_date=False)
+    sis.students.load_all()
+    count = 0
+    while not stop.is_set():
+        sis.write_cache()
+        count += 1
+    return count
+
+
+def main():
+    parser = ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--readers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--lookups", type=int, default=100)
+    parser.add_argument(
+        "--publish", action="store_true", help="republish the cache during reads"
+    )
+    args = parser.parse_args()
+
+    Sis.read_cache(check_date=False)._cache.close()
+    print(f"{'readers':>7} {'wall':>8} {'open':>8} {'lookups':>8} {'load':>8}")
+    for n in args.readers:
+        with ProcessPoolExecutor(max_workers=n + args.publish) as pool:
+            stop = multiprocessing.Manager().Event()
+            writer = pool.submit(publish, stop) if args.publish else None
+            start = perf_counter()
+            timings = list(pool.map(read, [args.lookups] * n, range(n)))
+            wall = perf_counter() - start
+            stop.set()
+            published = f"  ({writer.result()} publishes)" if writer else ""
+        slowest = [max(step) for step in zip(*timings)]
+        print(
+            f"{n:>7} {wall:>7.3f}s "
+            + " ".join(f"{t:>7.3f}s" for t in slowest)
+            + published
+        )
+
+
+if __name__ == "__main__":
+    main()
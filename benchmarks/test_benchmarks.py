@@ -0,0 +1,92 @@
+"""pytest-benchmark timings of the operations which `th bench` times, on
+synthetic rosters of each size in $TH_BENCH_SIZES (default 1000).
+
+    pip install pytest-benchmark
+    TH_BENCH_SIZES="1000 10000" python -m pytest benchmarks --benchmark-autosave
+
+Saved runs can be compared with `pytest-benchmark compare`.
+"""
+
+from itertools import cycle
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from teacherhelper import _bench
+from teacherhelper.docx import RubricWriter
+from teacherhelper.sis import Sis, write_synthetic_exports
+
+SIZES = [int(n) for n in os.environ.get("TH_BENCH_SIZES", "1000").split()]
+
+
+@pytest.fixture(scope="module", params=SIZES, ids=lambda n: f"{n}students")
+def roster(request, tmp_path_factory):
+    """The data directory of a synthetic roster, with its cache written."""
+    path = tmp_path_factory.mktemp("roster")
+    write_synthetic_exports(path, request.param)
+    with _bench.data_dir(path):
+        Sis.new_school_year().write_cache()
+        yield path
+
+
+@pytest.fixture(scope="module")
+def sis(roster):
+    sis = Sis.read_cache()
+    sis.students.load_all()
+    return sis
+
+
+def test_new_school_year(benchmark, roster):
+    benchmark.pedantic(Sis.new_school_year, rounds=3)
+
+
+def test_write_cache(benchmark, sis):
+    benchmark.pedantic(sis.write_cache, rounds=3)
+
+
+def test_read_cache(benchmark, roster):
+    benchmark(Sis.read_cache)
+
+
+def test_read_cache_load_all(benchmark, roster):
+    benchmark.pedantic(lambda: Sis.read_cache().students.load_all(), rounds=3)
+
+
+def test_find_student_hit(benchmark, sis):
+    hits, _, _ = _bench.lookup_names(sis, 100)
+    names = cycle(hits)
+    benchmark(lambda: sis.find_student(next(names)))
+
+
+def test_find_student_miss(benchmark, sis):
+    _, misses, _ = _bench.lookup_names(sis, 10)
+    names = cycle(misses)
+    benchmark.pedantic(lambda: sis.find_student(next(names)), rounds=10)
+
+
+def test_find_parent(benchmark, sis):
+    _, _, guardians = _bench.lookup_names(sis, 10)
+    names = cycle(guardians)
+    benchmark.pedantic(lambda: sis.find_parent(next(names)), rounds=10)
+
+
+def test_add_pages(benchmark, sis):
+    pages = _bench.rubric_pages(sis, 50)
+
+    def add_pages():
+        writer = RubricWriter(
+            template_doc=_bench.rubric_template(),
+            grade_to_col_mapping=_bench.RUBRIC_COLUMNS,
+        )
+        writer.add_pages(pages)
+
+    benchmark.pedantic(add_pages, rounds=5)
+
+
+def test_complete(benchmark, sis):
+    hits, _, guardians = _bench.lookup_names(sis, 100)
+    prefixes = cycle(name[: 3 + i % 5] for i, name in enumerate(hits + guardians))
+    sis.complete("")
+    benchmark(lambda: sis.complete(next(prefixes)))
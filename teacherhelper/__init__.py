@@ -1,16 +1,32 @@
-import os
+"""Useful abstractions and CLI to make teaching more scriptable.
 
-from .helper import Helper  # raises DeprecationWarning on instantiation
-from .email_ import Email
+Importing the package doesn't import any of its modules, which pull in
+dependencies like fuzzywuzzy and markdown; the names below are imported the
+first time that they are used, so `th` and scripts only pay for what they
+need.
+"""
 
-RECCOMENDED_ENV = [
-    "EMAIL_USERNAME",
-    "EMAIL_PASSWORD",
-]
+from importlib import import_module
 
-for var in RECCOMENDED_ENV:
-    if not os.getenv(var):
-        print(
-            f"Environment variable {var} is missing, which is necessary for "
-            "certain functions within this module."
-        )
+# names which can be imported from the package, and the modules they are in
+_EXPORTS = {
+    "Email": ".email_",
+    "Helper": ".helper",  # raises DeprecationWarning on instantiation
+    "Sis": ".sis",
+}
+_SUBMODULES = ("docx", "email_", "google", "helper", "sis", "tools")
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(import_module(_EXPORTS[name], __name__), name)
+    elif name in _SUBMODULES:
+        value = import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS) | set(_SUBMODULES))
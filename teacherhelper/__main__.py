@@ -1,35 +1,163 @@
 """Teacher Heper CLI"""
 
 import argparse
-import code
+import json
+import signal
+import sys
+import threading
 
-from .sis import Sis
+# `teacherhelper.sis` pulls in fuzzywuzzy and the rest of the lookup machinery,
+# so it is only imported by the commands which need it; `th --help`, and
+# lookups which `th --serve` answers, don't. The client of `th --serve` needs
+# sockets, so it is only imported by the lookups, too
 
+# attributes of each match which `th batch` writes out, besides its name
+BATCH_FIELDS = {
+    "student": ("student_id", "grade_level", "homeroom", "email"),
+    "parent": (
+        "student",
+        "relationship_to_student",
+        "email",
+        "mobile_phone",
+        "primary_contact",
+    ),
+}
 
-sis = Sis.read_cache() if Sis.cache_exists() else None
 
+def read_sis(required=True):
+    """Read the cache, which must exist unless *required* is false, in which
+    case None is returned if it doesn't."""
+    from .sis import Sis
 
-def find_student(name):
-    if not sis:
+    if not Sis.cache_exists():
+        if not required:
+            return None
         raise ValueError("fatal: cache does not exist")
-    print(sis.find_student(name, threshold=60))
+    return Sis.read_cache()
+
+
+def find_student(name):
+    from . import _daemon
+
+    # `th --serve` already has the cache loaded, if it is running
+    result = _daemon.find("student", name, threshold=60)
+    if result is None:
+        result = read_sis().find_student(name, threshold=60)
+    print(result)
 
 
 def find_parent(name):
-    if not sis:
-        raise ValueError("fatal: cache does not exist")
-    print(sis.find_parent(name))
+    from . import _daemon
+
+    result = _daemon.find("parent", name)
+    if result is None:
+        result = read_sis().find_parent(name)
+    print(result)
+
+
+def batch(names, kind="student", threshold=None, out=None):
+    """Look up each line of *names* as a student or parent, depending on
+    *kind*, and write the results to *out* (stdout by default) as JSON
+    objects, one per line, as soon as each one is found. Every object has
+    the "query", the "match" (the matching name, or null), its "score" out
+    of 100 and the `BATCH_FIELDS` of the match. Blank lines are skipped.
+
+    Each name is matched with `Sis.rank_students` or `Sis.rank_parents`,
+    which score the match as they find it, so parents are matched by score
+    alone rather than preferring primary contacts as `th -p` does. The
+    default threshold is the same as `th -s` or `th -p`."""
+    out = out or sys.stdout
+    sis = read_sis()
+    if threshold is None:
+        threshold = 60 if kind == "student" else 70
+    rank = sis.rank_students if kind == "student" else sis.rank_parents
+    fields = BATCH_FIELDS[kind]
+    # names which are repeated in *names* are only looked up once
+    ranked = {}
+    for line in names:
+        name = line.strip()
+        if not name:
+            continue
+        record = {"query": name, "match": None, "score": None}
+        record.update(dict.fromkeys(fields))
+        if name not in ranked:
+            ranked[name] = rank(name, k=1, threshold=threshold)
+        if ranked[name]:
+            ((match, score),) = ranked[name]
+            record["match"] = match.name
+            if sis.normalize_name(name) == sis.normalize_name(match.name):
+                score = 100
+            record["score"] = score
+            for field in fields:
+                value = getattr(match, field)
+                record[field] = value.name if field == "student" else value
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+
+
+def bench(sizes, lookups=100, pages=50, save=None, previous=None):
+    """Run `th bench`, printing each timing as it is taken. The results are
+    saved as JSON to the file *save*, and compared with the earlier results
+    in *previous*, if they are given."""
+    from . import _bench
+
+    if previous is not None:
+        previous = json.load(previous)
+    print(f"{'students':>8} {'benchmark':<22} {'ops':>6} {'per op':>14}")
+    results = _bench.run(sizes, lookups, pages, progress=print)
+    if save is not None:
+        json.dump(results, save, indent=2)
+        save.write("\n")
+    if previous is not None:
+        print("\ncompared with", previous["created"])
+        print("\n".join(_bench.compare(previous, results)))
+
+
+def watch():
+    try:
+        import watchdog  # noqa: F401
+    except ImportError:
+        raise ValueError(
+            "fatal: --watch needs watchdog; run `pip install teacherhelper[watch]`"
+        )
+    import logging
+    from .sis import CacheWatcher
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        CacheWatcher().run()
+    except KeyboardInterrupt:
+        pass
+
+
+def serve():
+    import logging
+    from .sis import LookupServer
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    # shut down cleanly, removing the socket, when stopped by a service manager
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    try:
+        LookupServer().run(stop)
+    except KeyboardInterrupt:
+        pass
 
 
 def shell():
-    code.interact(
-        local={
-            "sis": sis,
-        }
-    )
+    from . import _shell
+
+    _shell.interact(read_sis(required=False))
+
+
+def at_least_one(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, not {number}")
+    return number
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser()
     parser.add_argument("--student", "-s", help="Lookup a student and print the result")
     parser.add_argument("--parent", "-p", help="Lookup a parent and print the result")
@@ -43,10 +171,121 @@ def main():
         ),
     )
 
-    args = parser.parse_args()
+    parser.add_argument(
+        "--refresh",
+        action="store_const",
+        const=True,
+        help=(
+            "Update the database with changes to student.csv and parent.csv, "
+            "rewriting only the records which changed."
+        ),
+    )
+
+    parser.add_argument(
+        "--watch",
+        action="store_const",
+        const=True,
+        help=(
+            "Watch the $HELPER_DATA directory, and update the database whenever "
+            "student.csv or parent.csv change."
+        ),
+    )
+
+    parser.add_argument(
+        "--serve",
+        action="store_const",
+        const=True,
+        help=(
+            "Keep the database loaded and answer --student and --parent lookups "
+            "from other th commands, reloading it whenever it changes."
+        ),
+    )
+
+    commands = parser.add_subparsers(dest="command", metavar="command")
+    batch_parser = commands.add_parser(
+        "batch",
+        help="Look up many names at once, printing the results as JSON lines",
+        description=(
+            "Look up each line of FILE (or stdin) as a student or parent name, "
+            "and print one JSON object per name with the match, its score and "
+            "the match's details."
+        ),
+    )
+    batch_parser.add_argument(
+        "file",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default="-",
+        help="File of names, one per line; stdin by default",
+    )
+    batch_parser.add_argument(
+        "--parents",
+        action="store_const",
+        const="parent",
+        default="student",
+        dest="kind",
+        help="Look up parents and guardians rather than students",
+    )
+    batch_parser.add_argument(
+        "--threshold",
+        type=int,
+        help="Lowest score which counts as a match (60 for students, 70 for parents)",
+    )
+
+    bench_parser = commands.add_parser(
+        "bench",
+        help="Time the library on synthetic rosters of increasing size",
+        description=(
+            "Time building, caching and reading the roster, student and parent "
+            "lookups, and writing rubrics, on synthetic rosters of each size. "
+            "Your own data directory isn't used."
+        ),
+    )
+    bench_parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[1000, 10000, 100000],
+        help="Numbers of students to time with (default: 1000 10000 100000)",
+    )
+    bench_parser.add_argument(
+        "--lookups",
+        type=at_least_one,
+        default=100,
+        help="Students to look up; misses and parents are a tenth of this",
+    )
+    bench_parser.add_argument(
+        "--pages", type=int, default=50, help="Rubric pages to write"
+    )
+    bench_parser.add_argument(
+        "--json",
+        type=argparse.FileType("w"),
+        dest="save",
+        help="Save the results to this file as JSON",
+    )
+    bench_parser.add_argument(
+        "--compare",
+        type=argparse.FileType("r"),
+        dest="previous",
+        help="Compare with the results saved by an earlier --json",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        batch(args.file, args.kind, args.threshold)
+    elif args.command == "bench":
+        bench(args.sizes, args.lookups, args.pages, args.save, args.previous)
+    elif args.new:
+        from .sis import Sis
 
-    if args.new:
         Sis.new_school_year().write_cache()
+    elif args.refresh:
+        print(read_sis().refresh())
+    elif args.watch:
+        watch()
+    elif args.serve:
+        serve()
     elif args.student:
         find_student(args.student)
     elif args.parent:
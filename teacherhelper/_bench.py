@@ -0,0 +1,206 @@
+"""Benchmarks of how the library performs as the roster grows, which
+`th bench` runs on synthetic rosters (see `sis.synthetic_roster`). The results
+of a run can be saved as JSON, and compared with an earlier run; see `run`
+and `compare`.
+
+`benchmarks/test_benchmarks.py` times the same operations with
+pytest-benchmark.
+"""
+
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+import os
+import platform
+import random
+import tempfile
+from time import perf_counter
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Union
+
+from .sis import Sis, write_synthetic_exports
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# rubric rows of the template which `RubricWriter.add_pages` is timed with,
+# and the columns that their grades are shaded in
+RUBRIC_ROWS = ("homework", "classwork", "participation")
+RUBRIC_COLUMNS = {0: 1, 10: 2, 15: 3, 20: 4}
+
+
+@dataclass
+class Timing:
+    """Seconds taken to run a benchmark *ops* times on a roster of
+    *students*."""
+
+    benchmark: str
+    students: int
+    ops: int
+    seconds: float
+
+    @property
+    def per_op(self) -> float:
+        return self.seconds / self.ops if self.ops else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.students:>8} {self.benchmark:<22} {self.ops:>6} "
+            f"{self.per_op * 1000:>12.3f}ms"
+        )
+
+
+@contextmanager
+def data_dir(path: Union[str, os.PathLike]) -> Iterator[None]:
+    """Point $HELPER_DATA at *path* until the block is done."""
+    previous = os.environ.get("HELPER_DATA")
+    os.environ["HELPER_DATA"] = str(path)
+    try:
+        yield
+    finally:
+        if previous is None:
+            del os.environ["HELPER_DATA"]
+        else:
+            os.environ["HELPER_DATA"] = previous
+
+
+def lookup_names(
+    sis: Sis, n: int, seed: int = 0
+) -> Tuple[List[str], List[str], List[str]]:
+    """Names to look up in *sis*: up to *n* students who are on the roster,
+    *n* made up names which aren't, and up to *n* guardians."""
+    rng = random.Random(seed)
+    students = list(sis.students)
+    hits = rng.sample(students, min(n, len(students)))
+    firsts = [name.split()[0] for name in students]
+    lasts = [name.split()[-1] for name in students]
+    misses: List[str] = []
+    while len(misses) < n:
+        name = f"{rng.choice(firsts)} {rng.choice(lasts)}"
+        if name not in sis.students:
+            misses.append(name)
+    guardians = [g.name for key in hits for g in sis.students[key].guardians[:1]]
+    return hits, misses, guardians
+
+
+def rubric_template():
+    """An in-memory document holding a rubric table, for `RubricWriter`."""
+    from docx import Document
+
+    doc = Document()
+    table = doc.add_table(rows=1 + len(RUBRIC_ROWS), cols=2 + len(RUBRIC_COLUMNS))
+    for cell, text in zip(table.rows[0].cells[1:], [*map(str, RUBRIC_COLUMNS), ""]):
+        cell.text = text
+    for row, name in zip(table.rows[1:], RUBRIC_ROWS):
+        row.cells[0].text = name
+        row.cells[-1].text = f"<{name}>"
+    return doc
+
+
+def rubric_pages(sis: Sis, n: int, seed: int = 0) -> list:
+    from .docx import Page
+
+    rng = random.Random(seed)
+    return [
+        Page(st, {f"<{row}>": rng.choice(list(RUBRIC_COLUMNS)) for row in RUBRIC_ROWS})
+        for st in list(sis.students.values())[:n]
+    ]
+
+
+def bench_roster(
+    students: int,
+    lookups: int = 100,
+    pages: int = 50,
+    seed: int = 0,
+    progress: Union[Callable[[Timing], None], None] = None,
+) -> List[Timing]:
+    """Time each benchmark on a roster of *students*, built from the exports
+    in the data directory. Student hits are looked up *lookups* times; the
+    slower lookups, of names which aren't on the roster and of guardians, a
+    tenth as often. Names are completed from prefixes of those students and
+    guardians. *progress* is called with each timing as it is taken."""
+    from .docx import RubricWriter
+
+    timings = []
+
+    def timed(benchmark: str, ops: int, run: Callable):
+        start = perf_counter()
+        result = run()
+        timing = Timing(benchmark, students, ops, perf_counter() - start)
+        timings.append(timing)
+        if progress is not None:
+            progress(timing)
+        return result
+
+    sis = timed("new_school_year", 1, Sis.new_school_year)
+    timed("write_cache", 1, sis.write_cache)
+    timed("read_cache", 1, Sis.read_cache)
+    timed("read_cache (load all)", 1, lambda: Sis.read_cache().students.load_all())
+
+    hits, misses, guardians = lookup_names(sis, lookups, seed)
+    slow = max(1, lookups // 10)
+    timed("find_student (hit)", len(hits), lambda: [sis.find_student(n) for n in hits])
+    timed(
+        "find_student (miss)",
+        len(misses[:slow]),
+        lambda: [sis.find_student(n) for n in misses[:slow]],
+    )
+    timed(
+        "find_parent",
+        len(guardians[:slow]),
+        lambda: [sis.find_parent(n) for n in guardians[:slow]],
+    )
+
+    writer = RubricWriter(
+        template_doc=rubric_template(), grade_to_col_mapping=RUBRIC_COLUMNS
+    )
+    batch = rubric_pages(sis, pages, seed)
+    timed("RubricWriter.add_pages", len(batch), lambda: writer.add_pages(batch))
+
+    # the first completion builds the prefix trie
+    prefixes = [name[: 3 + i % 5] for i, name in enumerate(hits + guardians)]
+    timed("complete (first)", 1, lambda: sis.complete(""))
+    timed("complete", len(prefixes), lambda: [sis.complete(p) for p in prefixes])
+    return timings
+
+
+def run(
+    sizes: Iterable[int] = DEFAULT_SIZES,
+    lookups: int = 100,
+    pages: int = 50,
+    guardians: Tuple[int, int] = (1, 4),
+    seed: int = 0,
+    progress: Union[Callable[[Timing], None], None] = None,
+) -> Dict:
+    """Run the benchmarks on a synthetic roster of each size, in a temporary
+    data directory, and return the results in the form that is saved as
+    JSON: a dict describing the machine, with the timings under
+    "results"."""
+    timings = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp, data_dir(tmp):
+            write_synthetic_exports(tmp, size, guardians, seed)
+            timings += bench_roster(size, lookups, pages, seed, progress)
+    return {
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "results": [{**asdict(t), "per_op": t.per_op} for t in timings],
+    }
+
+
+def compare(before: Dict, after: Dict) -> List[str]:
+    """Lines comparing the time per op of each benchmark in two runs, for
+    the benchmarks and roster sizes which are in both."""
+    previous = {(r["benchmark"], r["students"]): r for r in before["results"]}
+    lines = []
+    for result in after["results"]:
+        old = previous.get((result["benchmark"], result["students"]))
+        if old is None or not old["per_op"]:
+            continue
+        ratio = result["per_op"] / old["per_op"]
+        lines.append(
+            f"{result['students']:>8} {result['benchmark']:<22} "
+            f"{old['per_op'] * 1000:>10.3f}ms -> {result['per_op'] * 1000:>10.3f}ms "
+            f"({ratio:.2f}x)"
+        )
+    return lines
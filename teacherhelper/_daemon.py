@@ -0,0 +1,57 @@
+"""Client side of `th --serve`, which keeps a `Sis` loaded behind a Unix
+domain socket in the data directory; see `teacherhelper.sis.LookupServer`.
+
+`th -s` and `th -p` try the server first, so this module is imported on every
+lookup and only depends on the standard library.
+"""
+
+import json
+from pathlib import Path
+import socket
+from typing import Union
+
+from ._data_dir import get_data_dir
+
+SOCKET_FILE = "th.sock"
+
+
+def socket_path() -> Path:
+    return Path(get_data_dir(), SOCKET_FILE)
+
+
+def request(message: dict, timeout: float = 5.0) -> Union[dict, None]:
+    """Send *message* to the lookup server and return its reply, or None if
+    no server can answer it (or this platform doesn't have Unix sockets),
+    so that the caller can read the cache itself."""
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    path = socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(path))
+            sock.sendall(json.dumps(message).encode() + b"\n")
+            sock.shutdown(socket.SHUT_WR)
+            with sock.makefile("rb") as fp:
+                line = fp.readline()
+        except OSError:
+            # no server, a socket left behind by one which was killed, one
+            # which belongs to another user, or a server which timed out
+            return None
+    if not line:
+        raise ValueError("fatal: the lookup server closed the connection")
+    return json.loads(line)
+
+
+def find(kind: str, name: str, **kwargs) -> Union[str, None]:
+    """Look up a student or parent (depending on *kind*) through the lookup
+    server, returning the match as `th` prints it, or None if no server is
+    running. Keyword arguments are passed on to `Sis.find_student` or
+    `Sis.find_parent`. Errors on the server's side are raised as
+    ValueError."""
+    reply = request({"find": kind, "name": name, **kwargs})
+    if reply is None:
+        return None
+    if "error" in reply:
+        raise ValueError(reply["error"])
+    return reply["result"]
@@ -0,0 +1,115 @@
+"""The interactive shell which `th` opens when it is run without arguments,
+with the roster in scope as `sis`.
+
+Tab completes student and guardian names inside a string, using
+`Sis.complete`, so `sis.find_student("tommy sm<tab>` completes to the full
+name; elsewhere, it completes Python names and attributes as usual.
+"""
+
+import code
+import re
+import rlcompleter
+from typing import TYPE_CHECKING, Dict, List, Union
+
+if TYPE_CHECKING:
+    from .sis import Sis
+
+# readline's default delimiters, less the spaces, hyphens and commas which
+# names have in them
+COMPLETER_DELIMS = " \t\n`~!@#$%^&*()-=+[{]}\\|;:'\",<>/?".translate(
+    str.maketrans("", "", " -,")
+)
+
+# names offered for each completion
+COMPLETION_LIMIT = 50
+
+
+def unclosed_string(line: str) -> Union[str, None]:
+    """What has been typed of the string which is still open at the end of
+    *line*, or None if there isn't one."""
+    quote = None
+    start = 0
+    escaped = False
+    for i, char in enumerate(line):
+        if escaped:
+            escaped = False
+        elif quote is not None and char == "\\":
+            escaped = True
+        elif char in "'\"" and quote in (None, char):
+            quote = char if quote is None else None
+            start = i + 1
+    return None if quote is None else line[start:]
+
+
+class NameCompleter:
+    """readline completer for the shell; see the module docstring.
+
+    readline replaces the *text* it is completing with the completion, and
+    inserts the longest prefix the completions have in common when there
+    are several. So completions are returned as replacements for *text*,
+    and *text* itself is added to them when some of them don't start with
+    it, or were left out, so that readline doesn't replace it with a
+    prefix which the user didn't type.
+    """
+
+    def __init__(self, namespace: Dict, sis: Union["Sis", None] = None):
+        self.sis = sis
+        self.python = rlcompleter.Completer(namespace)
+        self.matches: List[str] = []
+
+    def __call__(self, text: str, state: int) -> Union[str, None]:
+        if state == 0:
+            import readline
+
+            line = readline.get_line_buffer()[: readline.get_endidx()]
+            self.matches = self.completions(text, line)
+        return self.matches[state] if state < len(self.matches) else None
+
+    def completions(self, text: str, line: str) -> List[str]:
+        """Completions of *text*, which ends *line*."""
+        typed = unclosed_string(line)
+        if typed is None:
+            return self.python_completions(text)
+        if self.sis is None:
+            return []
+        return self.name_completions(text, typed)
+
+    def name_completions(self, text: str, typed: str) -> List[str]:
+        names = self.sis.complete(typed, limit=COMPLETION_LIMIT + 1)
+        # readline only replaces *text*, which is less than everything typed
+        # if the name has a delimiter (like an apostrophe) in it
+        head = max(0, len(typed) - len(text))
+        if head:
+            names = [n[head:] for n in names if n.lower().startswith(typed.lower())]
+        matches = names[:COMPLETION_LIMIT]
+        if len(names) > COMPLETION_LIMIT or not all(
+            m.lower().startswith(text.lower()) for m in matches
+        ):
+            matches.append(text)
+        return matches
+
+    def python_completions(self, text: str) -> List[str]:
+        # the delimiters which aren't readline's default are split off here
+        word = re.split(r"[\s,-]", text)[-1]
+        head = text[: len(text) - len(word)]
+        matches = []
+        while (match := self.python.complete(word, len(matches))) is not None:
+            matches.append(head + match)
+        return matches
+
+
+def interact(sis: Union["Sis", None]):
+    namespace = {"sis": sis}
+    try:
+        import readline
+    except ImportError:
+        # no tab completion on platforms without readline
+        pass
+    else:
+        readline.set_completer(NameCompleter(namespace, sis))
+        readline.set_completer_delims(COMPLETER_DELIMS)
+        if "libedit" in (readline.__doc__ or ""):
+            readline.parse_and_bind("bind ^I rl_complete")
+        else:
+            readline.parse_and_bind("tab: complete")
+    code.interact(local=namespace)
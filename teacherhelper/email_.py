@@ -6,14 +6,26 @@ import smtplib
 import ssl
 import os
 from typing import Union
+import warnings
 
 import markdown
 
 from ._data_dir import get_data_dir
 
+RECCOMENDED_ENV = [
+    "EMAIL_USERNAME",
+    "EMAIL_PASSWORD",
+]
+
 
 class Email:
     def __init__(self, username=None, password=None):
+        for var, given in zip(RECCOMENDED_ENV, (username, password)):
+            if not (given or os.getenv(var)):
+                warnings.warn(
+                    f"Environment variable {var} is missing, which is necessary "
+                    "for sending email unless it is passed to Email()."
+                )
         self.email_addr = username or os.getenv("EMAIL_USERNAME", "")
         self.password = password or os.getenv("EMAIL_PASSWORD", "")
         self.connection = None
@@ -66,7 +78,7 @@ class Email:
         message: str,
         cc: Union[list, str] = "",
         bcc: Union[list, str] = "",
-        template_name: str = "default.html"
+        template_name: str = "default.html",
     ):
         """
         Simple utility for sending an email. Helpful for mail merges!
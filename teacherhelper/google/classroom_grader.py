@@ -45,6 +45,10 @@ class ClassroomGrader(ABC, GoogleClassroomApiWrapper):
     def grade_all(self) -> List[GradeResult]:
         retval: List[GradeResult] = []
 
+        # the same students turn up in every assignment
+        if sis.lookup_cache_stats is None:
+            sis.enable_lookup_cache()
+
         for course, assignment, submission in self.traverse_submissions():
             try:
                 google_student = self.get_student_profile(submission)
@@ -1,2 +1,36 @@
+from importlib import import_module
+
 from ._entities import ParentGuardian, Student, Group, Homeroom
 from ._sis import Sis
+from ._stats import (
+    FastPathStats,
+    IngestReport,
+    LinkReport,
+    LookupCacheStats,
+    LookupStats,
+    RefreshReport,
+)
+from ._cache import CacheHeader
+from ._query import Query
+from ._sets import StudentSet
+
+# names which lookups don't need, imported the first time they are used; see
+# `teacherhelper.__getattr__`
+_EXPORTS = {
+    "CacheWatcher": "._watch",
+    "LookupServer": "._server",
+    "synthetic_roster": "._synthetic",
+    "write_synthetic_exports": "._synthetic",
+}
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
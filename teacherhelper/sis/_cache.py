@@ -0,0 +1,697 @@
+"""On-disk cache of a `Sis`, stored as SQLite tables.
+
+Each entity is a row, so reading the cache doesn't need to unpickle the whole
+roster before answering a lookup. `CacheReader` returns mappings which only build
+`Student`, `ParentGuardian`, `Homeroom` and `Group` objects as they are
+accessed. The lookup indexes are stored as pickled blobs, and are also only
+loaded when a lookup first needs them.
+
+A published cache file is never modified. Writers build a new database in a
+temporary file next to it and move that into place (see `write` and
+`update`), so readers can open it as immutable and memory-map it (see
+`connect`). Any number of processes can then read the cache without locking,
+sharing its pages through the OS page cache, and a reader which opened the
+previous version keeps reading that version until it reconnects.
+"""
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+import pickle
+import sqlite3
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    MutableMapping,
+    Tuple,
+    Union,
+)
+
+from ._index import TrigramIndex
+from ._sets import StudentSet, to_bytes
+from ._entities import (
+    Group,
+    Homeroom,
+    ParentGuardian,
+    Student,
+    _GuardianList,
+    guardian_generation,
+)
+
+CACHE_FILE = "cache.sqlite3"
+
+# upper limit of the memory map of a cache; SQLite only maps as much of the
+# file as there is
+MMAP_SIZE = 1 << 30
+
+# incremented whenever the tables change in a way that older readers can't
+# understand
+SCHEMA_VERSION = 5
+
+# pickled attributes of `Sis` which are stored in the blobs table
+INDEXES = (
+    "_name_index",
+    "_key_index",
+    "_phonetic_index",
+    "_guardian_index",
+    "_field_index",
+)
+BLOBS = INDEXES + ("link_report",)
+
+# a student's name is derived from their first and last name, and is also
+# their key
+STUDENT_COLUMNS = (
+    "first_name",
+    "last_name",
+    "student_id",
+    "homeroom",
+    "grade_level",
+    "email",
+)
+GUARDIAN_COLUMNS = (
+    "first_name",
+    "last_name",
+    "home_phone",
+    "mobile_phone",
+    "work_phone",
+    "email",
+    "relationship_to_student",
+    "primary_contact",
+    "allow_contact",
+    "student_resides_with",
+)
+GUARDIAN_BOOLEANS = ("primary_contact", "allow_contact", "student_resides_with")
+
+# (name in the members table, table and `Sis` attribute, columns, entity class)
+# of the entities which hold a list of students
+COLLECTIONS = (
+    ("homeroom", "homerooms", ("teacher", "grade_level"), Homeroom),
+    ("group", "groups", ("name", "grade_level"), Group),
+)
+# collections whose members are stored as a `StudentSet` bitset in their own
+# row, rather than as rows of the members table. The bits are positions in
+# the name index, which is stored alongside them
+BITSET_COLLECTIONS = ("groups",)
+
+SCHEMA = f"""
+CREATE TABLE meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE blobs (name TEXT PRIMARY KEY, data BLOB);
+CREATE TABLE students (
+    ordinal INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    {", ".join(STUDENT_COLUMNS)},
+    primary_contact INTEGER,
+    extra BLOB
+);
+CREATE TABLE guardians (
+    student INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    {", ".join(GUARDIAN_COLUMNS)},
+    extra BLOB,
+    PRIMARY KEY (student, position)
+);
+CREATE TABLE homerooms (
+    ordinal INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    teacher,
+    grade_level,
+    extra BLOB
+);
+CREATE TABLE groups (
+    ordinal INTEGER PRIMARY KEY,
+    key TEXT UNIQUE NOT NULL,
+    name,
+    grade_level,
+    members BLOB,
+    extra BLOB
+);
+CREATE TABLE members (
+    collection TEXT NOT NULL,
+    owner INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    student TEXT NOT NULL,
+    PRIMARY KEY (collection, owner, position)
+);
+"""
+
+
+def cache_path(data_dir) -> Path:
+    return Path(data_dir, CACHE_FILE)
+
+
+def connect(path: Path) -> sqlite3.Connection:
+    """Open the published cache at *path* for reading. The connection is
+    read-only and treats the file as immutable, so it takes no locks and
+    never checks for changes; that is safe because published files are
+    replaced rather than changed. Pages are read through a memory map."""
+    db = sqlite3.connect(
+        f"{path.as_uri()}?mode=ro&immutable=1", uri=True, check_same_thread=False
+    )
+    db.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    return db
+
+
+def file_sha256(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for block in iter(lambda: fp.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheHeader:
+    """Metadata which is stored in the meta table, apart from the roster
+    itself, so that the cache can be validated without loading anything
+    else.
+
+    *source_hashes* maps the names of the CSV files the roster was built
+    from to their SHA-256 hashes."""
+
+    written_at: datetime
+    schema_version: int
+    source_hashes: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def is_compatible(self) -> bool:
+        return self.schema_version == SCHEMA_VERSION
+
+    def changed_sources(self, data_dir) -> List[str]:
+        """Names of the source files in *data_dir* which differ from the ones
+        that the cache was built from."""
+        changed = []
+        for name, digest in self.source_hashes.items():
+            path = Path(data_dir, name)
+            if not path.exists() or file_sha256(path) != digest:
+                changed.append(name)
+        return changed
+
+
+def read_header(path: Path) -> Union[CacheHeader, None]:
+    """Read only the header of the cache at *path*, returning None if there
+    isn't a readable cache there."""
+    if not path.exists():
+        return None
+    try:
+        db = connect(path)
+        try:
+            return _header(db)
+        finally:
+            db.close()
+    except sqlite3.DatabaseError:
+        return None
+
+
+def _header(db: sqlite3.Connection) -> CacheHeader:
+    meta = dict(db.execute("SELECT key, value FROM meta"))
+    return CacheHeader(
+        written_at=datetime.fromisoformat(meta["date"]),
+        schema_version=int(meta.get("schema_version", 0)),
+        source_hashes=json.loads(meta.get("source_hashes", "{}")),
+    )
+
+
+def _extra(obj, columns: Iterable[str], default: Union[Dict, None] = None):
+    """Pickle whichever attributes of *obj* don't have their own column, or
+    return None if they all have their default values."""
+    default = default or {}
+    state = obj.__getstate__() if hasattr(type(obj), "__slots__") else vars(obj)
+    extra = {
+        k: v
+        for k, v in state.items()
+        if k not in columns and not (k in default and default[k] == v)
+    }
+    return pickle.dumps(extra) if extra else None
+
+
+def _restore(cls, state: dict):
+    """Build an entity from its attributes without calling __init__, which
+    would otherwise count as a change to the student's guardians."""
+    obj = cls.__new__(cls)
+    if hasattr(obj, "__setstate__"):
+        obj.__setstate__(state)
+    else:
+        obj.__dict__.update(state)
+    return obj
+
+
+@contextmanager
+def _publishing(sis, path: Path) -> Iterator[Path]:
+    """Yield the path of a temporary file next to *path*, which replaces
+    *path* once the block is done, or is removed if it raises.
+
+    If *sis* was read from the cache at *path*, its reader is switched over
+    to the new file, which is opened before it is moved into place so that
+    the reader gets this version even if another process publishes one
+    straight afterwards."""
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        yield tmp
+        reader = vars(sis).get("_cache")
+        if reader is not None and reader.path == path:
+            db = connect(tmp)
+            os.replace(tmp, path)
+            reader.switch(db)
+        else:
+            os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+
+
+def write(sis, path: Path):
+    """Write *sis* into a new SQLite database, which replaces the cache at
+    *path* once it is complete."""
+    with _publishing(sis, path) as tmp:
+        _write(sis, tmp)
+
+
+def _write(sis, tmp: Path):
+    db = sqlite3.connect(tmp)
+    try:
+        db.executescript(SCHEMA)
+        keys = _student_keys(sis.students)
+        _write_students(
+            db, ((i, key, st) for i, (key, st) in enumerate(sis.students.items()))
+        )
+        for collection, table, columns, _ in COLLECTIONS:
+            _write_collection(
+                db,
+                collection,
+                table,
+                ((i, *item) for i, item in enumerate(getattr(sis, table).items())),
+                columns,
+                keys,
+                sis,
+            )
+        _write_blobs(db, sis)
+        db.execute("INSERT INTO meta VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+        db.commit()
+    finally:
+        db.close()
+
+
+def update(sis, reader: "CacheReader", report):
+    """Apply the changes described by a `RefreshReport` to a copy of the
+    version of the cache that *sis* was read from through *reader*, and
+    publish it in place of the cache. Only the rows of the students,
+    homerooms and groups which changed are rewritten. Unchanged rows keep
+    their ordinals, and new ones are added after the rest, which is the same
+    order that `Sis.refresh` leaves them in."""
+    with _publishing(sis, reader.path) as tmp:
+        db = sqlite3.connect(tmp)
+        try:
+            reader.db.backup(db)
+            _update(db, sis, report)
+        finally:
+            db.close()
+
+
+def _update(db: sqlite3.Connection, sis, report):
+    keys = _student_keys(sis.students)
+    ordinals = _ordinals(db, "students")
+    next_ordinal = max(ordinals.values(), default=-1) + 1
+    changed = dict.fromkeys(report.added + report.updated + report.guardians_updated)
+    for key in report.removed + list(changed):
+        if key in ordinals:
+            db.execute("DELETE FROM students WHERE ordinal = ?", (ordinals[key],))
+            db.execute("DELETE FROM guardians WHERE student = ?", (ordinals[key],))
+    rows = []
+    for key in changed:
+        if key not in ordinals:
+            ordinals[key] = next_ordinal
+            next_ordinal += 1
+        rows.append((ordinals[key], key, sis.students[key]))
+    _write_students(db, rows)
+
+    for collection, table, columns, _ in COLLECTIONS:
+        if table == "homerooms":
+            removed, changed = report.homerooms_removed, report.homerooms_changed
+        else:
+            removed, changed = [], report.groups_changed
+        entities = getattr(sis, table)
+        owners = _ordinals(db, table)
+        next_ordinal = max(owners.values(), default=-1) + 1
+        rows = []
+        for key in removed + changed:
+            if key in owners:
+                db.execute(f"DELETE FROM {table} WHERE ordinal = ?", (owners[key],))
+                db.execute(
+                    "DELETE FROM members WHERE collection = ? AND owner = ?",
+                    (collection, owners[key]),
+                )
+        for key in changed:
+            if key not in owners:
+                owners[key] = next_ordinal
+                next_ordinal += 1
+            rows.append((owners[key], key, entities[key]))
+        _write_collection(db, collection, table, rows, columns, keys, sis)
+
+    db.execute("DELETE FROM blobs")
+    db.execute("DELETE FROM meta WHERE key IN ('date', 'source_hashes')")
+    _write_blobs(db, sis)
+    db.commit()
+
+
+def _ordinals(db, table: str) -> Dict[str, int]:
+    return dict(db.execute(f"SELECT key, ordinal FROM {table}"))
+
+
+def _student_keys(students: MutableMapping[str, Student]) -> Dict[int, str]:
+    """Mapping of the `id()` of each student to its key."""
+    return {id(st): key for key, st in students.items()}
+
+
+def _write_blobs(db, sis):
+    """Insert the pickled indexes and link report, along with the parts of
+    the header which change whenever the cache is written."""
+    db.executemany(
+        "INSERT INTO blobs VALUES (?, ?)",
+        ((name, pickle.dumps(getattr(sis, name))) for name in BLOBS),
+    )
+    db.executemany(
+        "INSERT INTO meta VALUES (?, ?)",
+        (
+            ("date", datetime.now().isoformat()),
+            ("source_hashes", json.dumps(sis.source_hashes)),
+        ),
+    )
+
+
+def _write_students(db, students: Iterable[Tuple[int, str, Student]]):
+    """Insert `(ordinal, key, student)` rows, along with each student's
+    guardians."""
+    student_rows = []
+    guardian_rows = []
+    for ordinal, key, st in students:
+        primary_contact = None
+        for position, g in enumerate(st.guardians):
+            if g is st.primary_contact:
+                primary_contact = position
+            guardian_rows.append(
+                (
+                    ordinal,
+                    position,
+                    *(getattr(g, c) for c in GUARDIAN_COLUMNS),
+                    _extra(g, GUARDIAN_COLUMNS + ("student",)),
+                )
+            )
+        if st.primary_contact is not None and primary_contact is None:
+            raise ValueError(
+                f"the primary contact of {st.name} is not one of their guardians"
+            )
+        student_rows.append(
+            (
+                ordinal,
+                key,
+                *(getattr(st, c) for c in STUDENT_COLUMNS),
+                primary_contact,
+                _extra(
+                    st,
+                    STUDENT_COLUMNS + ("_guardians", "_primary_contact"),
+                    default={"groups": []},
+                ),
+            )
+        )
+    marks = ", ".join("?" * (len(STUDENT_COLUMNS) + 4))
+    db.executemany(f"INSERT INTO students VALUES ({marks})", student_rows)
+    marks = ", ".join("?" * (len(GUARDIAN_COLUMNS) + 3))
+    db.executemany(f"INSERT INTO guardians VALUES ({marks})", guardian_rows)
+
+
+def _write_collection(db, collection, table, entities, columns, keys, sis):
+    """Insert `(ordinal, key, entity)` rows of homerooms or groups, and their
+    membership lists. *keys* maps the `id()` of each student to its key."""
+    rows = []
+    members = []
+    bitset = table in BITSET_COLLECTIONS
+    for ordinal, key, entity in entities:
+        row = [ordinal, key, *(getattr(entity, c) for c in columns)]
+        if bitset:
+            try:
+                row.append(to_bytes(sis._group_members(entity).bits))
+            except KeyError as e:
+                raise ValueError(
+                    f"{e.args[0]} in {collection} {key} is not a student"
+                ) from None
+        else:
+            for position, st in enumerate(entity.students):
+                if id(st) not in keys:
+                    raise ValueError(
+                        f"{st.name} in {collection} {key} is not a student"
+                    )
+                members.append((collection, ordinal, position, keys[id(st)]))
+        row.append(_extra(entity, columns + ("students",)))
+        rows.append(row)
+    marks = ", ".join("?" * (len(columns) + 3 + bitset))
+    db.executemany(f"INSERT INTO {table} VALUES ({marks})", rows)
+    db.executemany("INSERT INTO members VALUES (?, ?, ?, ?)", members)
+
+
+class LazyDict(MutableMapping):
+    """Dict whose keys are known up front but whose values are only built on
+    first access, by calling *load* with the key. *load_all* builds all of
+    the values which haven't been built yet in one go; it is used when
+    iterating over values or items.
+
+    Keys keep their order, and each value is only built once, so the same key
+    always gives back the same object. Values can be added, replaced and
+    removed like in a normal dict. A `LazyDict` pickles as a plain `dict`.
+    """
+
+    def __init__(
+        self,
+        keys: Iterable[str],
+        load: Callable[[str], object],
+        load_all: Callable[[Iterable[str]], Iterable[Tuple[str, object]]],
+    ):
+        self._keys: Dict[str, None] = dict.fromkeys(keys)
+        self._loaded: Dict[str, object] = {}
+        self._load = load
+        self._load_all = load_all
+
+    def __getitem__(self, key):
+        try:
+            return self._loaded[key]
+        except KeyError:
+            if key not in self._keys:
+                raise
+        value = self._loaded[key] = self._load(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._keys[key] = None
+        self._loaded[key] = value
+
+    def __delitem__(self, key):
+        del self._keys[key]
+        self._loaded.pop(key, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def load_all(self, keys: Union[Iterable[str], None] = None):
+        """Build the values of *keys* (or of every key) in one go."""
+        missing = [
+            k
+            for k in (self._keys if keys is None else keys)
+            if k not in self._loaded and k in self._keys
+        ]
+        if missing:
+            self._loaded.update(self._load_all(missing))
+
+    def values(self):
+        self.load_all()
+        return super().values()
+
+    def items(self):
+        self.load_all()
+        return super().items()
+
+    def __reduce__(self):
+        return dict, (dict(self.items()),)
+
+    def __repr__(self):
+        return (
+            f"<{type(self).__name__} of {len(self)} items, {len(self._loaded)} loaded>"
+        )
+
+
+class CacheReader:
+    """Read-only connection to a cache database, which materializes entities
+    on request.
+
+    The connection stays on the version of the cache that was published when
+    the reader was opened, so everything it returns, starting with its
+    `header`, comes from that one version."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        # the stored guardian index is current as of this generation; see
+        # `_entities.guardian_generation`
+        self.generation = guardian_generation()
+        self.db = connect(path)
+        try:
+            self.header = _header(self.db)
+        except BaseException:
+            self.db.close()
+            raise
+
+    @classmethod
+    def open(cls, path: Path) -> Union["CacheReader", None]:
+        """Open the cache at *path*, or return None if there isn't a
+        readable cache there."""
+        if not path.exists():
+            return None
+        try:
+            return cls(path)
+        except sqlite3.DatabaseError:
+            return None
+
+    def switch(self, db: sqlite3.Connection):
+        """Read from *db*, a connection to a version of the cache that was
+        just published by this process, from now on. Entities which haven't
+        been loaded yet are the same in both versions."""
+        self.db.close()
+        self.db = db
+        self.header = _header(db)
+
+    def close(self):
+        self.db.close()
+
+    def blob(self, name: str):
+        row = self.db.execute(
+            "SELECT data FROM blobs WHERE name = ?", (name,)
+        ).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def keys(self, table: str) -> List[str]:
+        return [
+            k for k, in self.db.execute(f"SELECT key FROM {table} ORDER BY ordinal")
+        ]
+
+    def students(self) -> LazyDict:
+        keys = self.keys("students")
+        return LazyDict(
+            keys,
+            lambda key: self._load_students("WHERE key = ?", (key,))[0][1],
+            lambda missing: self._load_students(
+                *(("", ()) if len(missing) == len(keys) else _in(missing))
+            ),
+        )
+
+    def collection(
+        self,
+        table: str,
+        students: MutableMapping[str, Student],
+        name_index: Callable[[], TrigramIndex],
+    ):
+        """Lazily loaded homerooms or groups, depending on *table*.
+        *name_index* returns the name index, which the bitsets of groups
+        refer to."""
+        collection, _, columns, cls = next(c for c in COLLECTIONS if c[1] == table)
+        selected = ", ".join(
+            columns + (("members",) if table in BITSET_COLLECTIONS else ())
+        )
+
+        def load(keys):
+            where, params = _in(keys)
+            loaded = []
+            for ordinal, key, *row, extra in self.db.execute(
+                f"SELECT ordinal, key, {selected}, extra "
+                f"FROM {table} {where} ORDER BY ordinal",
+                params,
+            ):
+                if table in BITSET_COLLECTIONS:
+                    *row, bits = row
+                    members = StudentSet(
+                        students, name_index(), int.from_bytes(bits, "little")
+                    )
+                    loaded.append((key, _collection_entity(cls, row, members, extra)))
+                    continue
+                member_keys = [
+                    k
+                    for k, in self.db.execute(
+                        "SELECT student FROM members WHERE collection = ? "
+                        "AND owner = ? ORDER BY position",
+                        (collection, ordinal),
+                    )
+                ]
+                if isinstance(students, LazyDict):
+                    students.load_all(member_keys)
+                members = [students[k] for k in member_keys]
+                loaded.append((key, _collection_entity(cls, row, members, extra)))
+            return loaded
+
+        return LazyDict(self.keys(table), lambda key: load([key])[0][1], load)
+
+    def _load_students(self, where: str, params) -> List[Tuple[str, Student]]:
+        columns = ", ".join(STUDENT_COLUMNS)
+        student_rows = self.db.execute(
+            f"SELECT ordinal, key, {columns}, primary_contact, extra "
+            f"FROM students {where} ORDER BY ordinal",
+            params,
+        ).fetchall()
+        guardians: Dict[int, List[tuple]] = {}
+        for ordinal, *row in self.db.execute(
+            f"SELECT student, {', '.join(GUARDIAN_COLUMNS)}, extra FROM guardians "
+            f"WHERE student IN (SELECT ordinal FROM students {where}) "
+            "ORDER BY student, position",
+            params,
+        ):
+            guardians.setdefault(ordinal, []).append(row)
+
+        loaded = []
+        for ordinal, key, *row, primary_contact, extra in student_rows:
+            state = dict(zip(STUDENT_COLUMNS, row))
+            state["groups"] = []
+            if extra is not None:
+                state.update(pickle.loads(extra))
+            student = Student.__new__(Student)
+            student_guardians = []
+            for *values, g_extra in guardians.get(ordinal, ()):
+                g_state = dict(zip(GUARDIAN_COLUMNS, values))
+                for attr in GUARDIAN_BOOLEANS:
+                    if isinstance(g_state[attr], int):
+                        g_state[attr] = bool(g_state[attr])
+                g_state["student"] = student
+                if g_extra is not None:
+                    g_state.update(pickle.loads(g_extra))
+                student_guardians.append(_restore(ParentGuardian, g_state))
+            state["_guardians"] = _GuardianList(student_guardians)
+            state["_primary_contact"] = (
+                None if primary_contact is None else student_guardians[primary_contact]
+            )
+            student.__setstate__(state)
+            loaded.append((key, student))
+        return loaded
+
+
+def _collection_entity(cls, row, members, extra):
+    entity = cls(*row, members)
+    if extra is not None:
+        entity.__dict__.update(pickle.loads(extra))
+    return entity
+
+
+def _in(keys: List[str]) -> Tuple[str, tuple]:
+    """WHERE clause selecting rows by key. SQLite limits the number of
+    parameters per statement, so large selections are passed as one JSON
+    array instead."""
+    if len(keys) <= 500:
+        return f"WHERE key IN ({', '.join('?' * len(keys))})", tuple(keys)
+    return "WHERE key IN (SELECT value FROM json_each(?))", (json.dumps(keys),)
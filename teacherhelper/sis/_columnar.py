@@ -0,0 +1,150 @@
+"""Columnar view of a roster, for aggregate queries which would otherwise loop
+over every student and guardian in Python. See `Sis.columns`.
+
+This needs NumPy, which is an optional dependency:
+`pip install teacherhelper[columns]`.
+"""
+
+from typing import Dict, Iterable, List, Mapping, Tuple, Union
+
+import numpy as np
+
+from ._entities import ParentGuardian, Student
+
+
+def _encode(values: Iterable, count: int) -> Tuple[np.ndarray, list]:
+    """Categorical codes for *values*, and the categories which the codes
+    index into, in order of first appearance."""
+    categories: Dict[object, int] = {}
+    codes = np.fromiter(
+        (categories.setdefault(v, len(categories)) for v in values),
+        dtype=np.int32,
+        count=count,
+    )
+    return codes, list(categories)
+
+
+class RosterColumns:
+    """Snapshot of a roster as NumPy arrays.
+
+    Each student column holds one categorical code per student, in roster
+    order, and each guardian column holds one code per guardian, grouped by
+    student in the same order. `categories[column]` holds the value which
+    each code stands for. The guardians of the student at index `i` are at
+    indices `offsets[i]:offsets[i + 1]`, and `guardian_student` maps each
+    guardian back to the index of their student.
+
+    Filters return boolean masks, which can be combined with `&`, `|` and
+    `~`, and mapped back to entities with `students_at` and `guardians_at`.
+    """
+
+    STUDENT_COLUMNS = ("grade_level", "homeroom", "has_primary_contact")
+    GUARDIAN_COLUMNS = (
+        "relationship_to_student",
+        "primary_contact",
+        "allow_contact",
+        "student_resides_with",
+    )
+
+    def __init__(self, students: Mapping[str, Student]):
+        self._students = students
+        self.keys: List[str] = list(students)
+        roster = list(students.values())
+        guardians = [g for st in roster for g in st.guardians]
+        n = len(roster)
+
+        self.codes: Dict[str, np.ndarray] = {}
+        self.categories: Dict[str, list] = {}
+        for column in ("grade_level", "homeroom"):
+            self.codes[column], self.categories[column] = _encode(
+                (getattr(st, column) for st in roster), n
+            )
+        self.codes["has_primary_contact"], self.categories["has_primary_contact"] = (
+            _encode((st.primary_contact is not None for st in roster), n)
+        )
+        for column in self.GUARDIAN_COLUMNS:
+            self.codes[column], self.categories[column] = _encode(
+                (getattr(g, column) for g in guardians), len(guardians)
+            )
+
+        counts = np.fromiter(
+            (len(st.guardians) for st in roster), dtype=np.int64, count=n
+        )
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.offsets[1:])
+        self.guardian_student = np.repeat(np.arange(n), counts)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def n_guardians(self) -> int:
+        return len(self.guardian_student)
+
+    def student_mask(self, **criteria) -> np.ndarray:
+        """Mask of the students matching every criterion, e.g.
+        `student_mask(grade_level=6, homeroom=["Smith", "Jones"])`. A list,
+        tuple or set matches any of its values."""
+        return self._mask(criteria, self.STUDENT_COLUMNS, len(self))
+
+    def guardian_mask(self, **criteria) -> np.ndarray:
+        """Mask of the guardians matching every criterion, as for
+        `student_mask`."""
+        return self._mask(criteria, self.GUARDIAN_COLUMNS, self.n_guardians)
+
+    def _mask(self, criteria: dict, columns: Tuple[str, ...], size: int):
+        mask = np.ones(size, dtype=bool)
+        for column, value in criteria.items():
+            if column not in columns:
+                raise ValueError(f"{column!r} is not one of {columns}")
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            codes = [
+                i
+                for i, category in enumerate(self.categories[column])
+                if category in values
+            ]
+            mask &= np.isin(self.codes[column], codes)
+        return mask
+
+    def any_guardian(self, guardian_mask: np.ndarray) -> np.ndarray:
+        """Mask of the students with at least one guardian in
+        *guardian_mask*."""
+        hits = np.bincount(
+            self.guardian_student, weights=guardian_mask, minlength=len(self)
+        )
+        return hits > 0
+
+    def counts(
+        self, column: str, mask: Union[np.ndarray, None] = None
+    ) -> Dict[object, int]:
+        """Number of students (or guardians, for a guardian column) with each
+        value of *column*, optionally only amongst those in *mask*."""
+        codes = self.codes[column]
+        if mask is not None:
+            codes = codes[mask]
+        totals = np.bincount(codes, minlength=len(self.categories[column]))
+        return {
+            category: int(total)
+            for category, total in zip(self.categories[column], totals)
+            if total
+        }
+
+    def students_at(self, selection) -> List[Student]:
+        """The students selected by a mask or an array of indices."""
+        return [self._students[self.keys[i]] for i in self._indices(selection)]
+
+    def guardians_at(self, selection) -> List[ParentGuardian]:
+        """The guardians selected by a mask or an array of indices."""
+        guardians = []
+        for i in self._indices(selection):
+            student = self.guardian_student[i]
+            st = self._students[self.keys[student]]
+            guardians.append(st.guardians[i - self.offsets[student]])
+        return guardians
+
+    @staticmethod
+    def _indices(selection) -> np.ndarray:
+        selection = np.asarray(selection)
+        if selection.dtype == bool:
+            return np.flatnonzero(selection)
+        return selection
@@ -1,3 +1,115 @@
+import sys
+from typing import Tuple
+
+# Incremented whenever any student's guardians or primary contact change, so
+# that indexes over guardians can tell when they are out of date.
+_guardian_generation = 0
+
+
+def guardian_generation() -> int:
+    return _guardian_generation
+
+
+def _guardians_changed():
+    global _guardian_generation
+    _guardian_generation += 1
+
+
+class _GuardianList(list):
+    """List of a student's guardians which reports every mutation through
+    `_guardians_changed`."""
+
+    def append(self, guardian):
+        super().append(guardian)
+        _guardians_changed()
+
+    def extend(self, guardians):
+        super().extend(guardians)
+        _guardians_changed()
+
+    def insert(self, index, guardian):
+        super().insert(index, guardian)
+        _guardians_changed()
+
+    def remove(self, guardian):
+        super().remove(guardian)
+        _guardians_changed()
+
+    def pop(self, *a):
+        guardian = super().pop(*a)
+        _guardians_changed()
+        return guardian
+
+    def clear(self):
+        super().clear()
+        _guardians_changed()
+
+    def sort(self, *a, **kw):
+        super().sort(*a, **kw)
+        _guardians_changed()
+
+    def reverse(self):
+        super().reverse()
+        _guardians_changed()
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        _guardians_changed()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        _guardians_changed()
+
+    def __iadd__(self, guardians):
+        result = super().__iadd__(guardians)
+        _guardians_changed()
+        return result
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _split_name(name: str) -> Tuple[str, str]:
+    """Split a full name which is assigned to `name` into a first and last
+    name, at its first space, so that the name reads back unchanged."""
+    first, _, last = name.partition(" ")
+    return _intern(first), _intern(last)
+
+
+class _Compact:
+    """Base class for the entities which there are many thousands of. Their
+    attributes are kept in `__slots__` instead of a per-object dict, and the
+    attributes listed in `_INTERNED` (names, teachers, relationships) are
+    interned, so each distinct string is only stored once across the roster.
+    Any other attribute which is set still works; it goes in `__dict__`,
+    which is only allocated when it is first needed.
+
+    Entities pickle to (and unpickle from) a plain dict of their attributes,
+    which is also what they pickled to before they had slots."""
+
+    __slots__: Tuple[str, ...] = ()
+    _INTERNED: Tuple[str, ...] = ()
+
+    def __getstate__(self):
+        state = {
+            attr: getattr(self, attr)
+            for attr in type(self).__slots__
+            if attr != "__dict__" and hasattr(self, attr)
+        }
+        state.update(self.__dict__)
+        return state
+
+    def __setstate__(self, state):
+        for attr, value in state.items():
+            # `name` was stored before it was derived from first and last name
+            if attr == "name":
+                continue
+            if attr in self._INTERNED:
+                value = _intern(value)
+            setattr(self, attr, value)
+
+
 class Group:
     """
     Group class is used to manage groups for extracurricular activities, field
@@ -21,19 +133,32 @@ class Homeroom:
         self.students = students
 
 
-class Student:
+class Student(_Compact):
+    __slots__ = (
+        "first_name",
+        "last_name",
+        "student_id",
+        "homeroom",
+        "grade_level",
+        "groups",
+        "email",
+        "_guardians",
+        "_primary_contact",
+        "__dict__",
+    )
+    _INTERNED = ("first_name", "last_name", "homeroom")
+
     def __init__(self, context):
         context.setdefault("groups", [])
         context.setdefault("guardians", [])
-        self.first_name = context.get("first_name")
-        self.last_name = context.get("last_name")
+        self.first_name = _intern(context.get("first_name"))
+        self.last_name = _intern(context.get("last_name"))
         self.student_id = context.get("student_id")
-        self.homeroom = context.get("homeroom")
+        self.homeroom = _intern(context.get("homeroom"))
         self.grade_level = context.get("grade_level")
         self.groups = context.get("groups")
         self.email = context.get("email")
         self.guardians = context.get("guardians")
-        self.name = self.first_name + " " + self.last_name
 
         # primary_contact is an instance of ParentGuardian, which is assigned
         # during the parsing of parent / guardian data in the new_school_year
@@ -41,6 +166,42 @@ class Student:
         # TODO: assign attribute at init time, not later
         self.primary_contact = None
 
+    def __setstate__(self, state):
+        # caches written before guardians and primary_contact were properties
+        state = dict(state)
+        for attr in ("guardians", "primary_contact"):
+            if attr in state:
+                state["_" + attr] = state.pop(attr)
+        super().__setstate__(state)
+        if not isinstance(self._guardians, _GuardianList):
+            self._guardians = _GuardianList(self._guardians)
+
+    @property
+    def name(self):
+        return self.first_name + " " + self.last_name
+
+    @name.setter
+    def name(self, value):
+        self.first_name, self.last_name = _split_name(value)
+
+    @property
+    def guardians(self):
+        return self._guardians
+
+    @guardians.setter
+    def guardians(self, value):
+        self._guardians = _GuardianList(value)
+        _guardians_changed()
+
+    @property
+    def primary_contact(self):
+        return self._primary_contact
+
+    @primary_contact.setter
+    def primary_contact(self, value):
+        self._primary_contact = value
+        _guardians_changed()
+
     def __eq__(self, other):
         if not isinstance(other, Student):
             return False
@@ -81,25 +242,39 @@ class Student:
         return normal.replace("object", f'"{self.name}" object')
 
 
-class ParentGuardian:
+class ParentGuardian(_Compact):
+    __slots__ = (
+        "student",
+        "first_name",
+        "last_name",
+        "home_phone",
+        "mobile_phone",
+        "work_phone",
+        "email",
+        "relationship_to_student",
+        "primary_contact",
+        "allow_contact",
+        "student_resides_with",
+        "__dict__",
+    )
+    _INTERNED = ("first_name", "last_name", "relationship_to_student")
+
     def __init__(self, context: dict, verbose=False):
 
         self.student = context.get("student")
-        self.first_name = context.get("first_name")
-        self.last_name = context.get("last_name")
+        self.first_name = _intern(context.get("first_name"))
+        self.last_name = _intern(context.get("last_name"))
         self.home_phone = context.get("home_phone")
         self.mobile_phone = context.get("mobile_phone")
         self.work_phone = context.get("work_phone")
         self.email = context.get("email")
-        self.relationship_to_student = context.get("relationship_to_student")
+        self.relationship_to_student = _intern(context.get("relationship_to_student"))
         self.primary_contact = context.get("primary_contact")
         self.allow_contact = context.get("allow_contact")
         self.student_resides_with = context.get("student_resides_with")
 
         # full name
-        if self.first_name and self.last_name:
-            self.name = self.first_name + " " + self.last_name
-        else:
+        if not (self.first_name and self.last_name):
             raise ValueError(
                 "First and last name were not provided as context to "
                 "ParentGuardian class. This means that self.name cannot\n"
@@ -108,7 +283,7 @@ class ParentGuardian:
             )
 
         # warn about missing attributes
-        for k, v in self.__dict__.items():
+        for k, v in self.__getstate__().items():
             if not v:
                 if verbose:
                     print(f"WARNING: Guardian\t{self.name}\thas no value for\t{k}")
@@ -117,6 +292,16 @@ class ParentGuardian:
         if not isinstance(self.student, Student):
             raise ValueError("Student was a string, not a Student object.")
 
+    @property
+    def name(self):
+        return self.first_name + " " + self.last_name
+
+    @name.setter
+    def name(self, value):
+        self.first_name, self.last_name = _split_name(value)
+        # guardians are looked up by name
+        _guardians_changed()
+
     def __str__(self):
         outs = [
             self.relationship_to_student,
@@ -0,0 +1,716 @@
+"""In-memory indexes which narrow down the fuzzy name lookups in `Sis`."""
+
+from bisect import bisect_left
+import heapq
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+    cast,
+)
+
+from fuzzywuzzy import fuzz, utils
+
+from ._entities import ParentGuardian, Student, guardian_generation
+from ._normalize import NameNormalizer
+from ._phonetic import phonetic_key
+
+
+def process_name(name: str) -> str:
+    """Apply the same preprocessing that `fuzzywuzzy.process.extractOne`
+    applies to each choice before it is scored."""
+    return utils.full_process(name, force_ascii=True)
+
+
+def score(processed_query: str, processed_choice: str) -> int:
+    """Score two processed names exactly as `process.extractOne` would score
+    the unprocessed ones."""
+    return fuzz.WRatio(processed_query, processed_choice, full_process=False)
+
+
+def top_k(
+    processed_query: str,
+    processed_choices: Sequence[Union[str, None]],
+    positions: Iterable[int],
+    k: int,
+    threshold: int = 0,
+) -> List[Tuple[int, int]]:
+    """Score the choices at *positions* in one pass, keeping only the best *k*
+    in a bounded heap. Returns (position, score) pairs, best first; equal
+    scores are ordered by position."""
+    scored = (
+        (i, score(processed_query, processed_choices[i]))  # type: ignore
+        for i in positions
+    )
+    return heapq.nlargest(
+        k,
+        (item for item in scored if item[1] >= threshold),
+        key=lambda item: (item[1], -item[0]),
+    )
+
+
+class ScoreBound:
+    """An upper bound on the `score` of a processed query against any
+    processed name, which is much cheaper to work out than the score, so
+    that names which can't beat the best match found so far don't need to
+    be scored at all.
+
+    `fuzz.WRatio` is the best of several `SequenceMatcher` ratios, each of
+    which is `2 * M / T`: M characters of two strings matched in order, out
+    of T characters between them. The strings are the names, their tokens
+    sorted, or their distinct tokens sorted, and every character matched
+    must be in both names; so M is at most the number of characters that
+    the names have in common, counted with multiplicity, and T is at least
+    the length of the two strings of distinct tokens. `partial_ratio`
+    compares the shorter string to a window of the longer, at most as long,
+    so its ratio is at most `2 * M / (S + M)` where S is the shorter length.
+
+    The one exception is `token_set_ratio`, which also compares the tokens
+    that the names share with the tokens of one name alone, and can be 100
+    however different the rest of the names are. Names which share a token
+    are given the highest score that ratio can lead to. Names which share no
+    trigram (see `TrigramIndex`) share no token, so their bounds can be
+    worked out without splitting them into tokens.
+    """
+
+    def __init__(self, processed_query: str):
+        self.query = processed_query
+        counts: Dict[str, int] = {}
+        for char in processed_query:
+            counts[char] = counts.get(char, 0) + 1
+        self.counts = list(counts.items())
+        self.tokens = set(processed_query.split())
+        self.distinct_length = len(" ".join(self.tokens))
+        self.mask = profile(processed_query)[2]
+        # characters which the query has more than one of
+        self.repeats = [(1 << ord(c), n - 1) for c, n in self.counts if n > 1]
+
+    def __call__(self, processed_choice: str, may_share_token: bool = True) -> int:
+        if not self.query or not processed_choice:
+            # `fuzz.WRatio` scores empty strings 0
+            return 0
+        common = sum(min(n, processed_choice.count(c)) for c, n in self.counts)
+        choice_tokens = set(processed_choice.split())
+        return self._bound(
+            common,
+            len(processed_choice),
+            len(" ".join(choice_tokens)),
+            may_share_token and not self.tokens.isdisjoint(choice_tokens),
+        )
+
+    def estimate(
+        self,
+        processed_choice: str,
+        may_share_token: bool = True,
+        choice_profile: Union[Tuple[int, int, int], None] = None,
+    ) -> int:
+        """An upper bound on the score, like calling this, but with the
+        choice's `profile` it is quicker to work out and may be higher: every
+        character that the query has one of and the choice has at least one
+        of is taken to be in common."""
+        if choice_profile is None:
+            return self(processed_choice, may_share_token)
+        length, distinct_length, mask = choice_profile
+        if not self.query or not length:
+            return 0
+        both = self.mask & mask
+        common = bin(both).count("1")
+        common += sum(extra for bit, extra in self.repeats if both & bit)
+        return self._bound(common, length, distinct_length, may_share_token)
+
+    def _bound(
+        self, common: int, choice_length: int, choice_distinct_length: int, shared: bool
+    ) -> int:
+        # each ratio is rounded to a whole number before it is scaled, and
+        # the best of them rounded again, like `fuzz.WRatio` does; a little
+        # is added so that rounding errors can only raise the bound
+        ratio = 2 * common / (self.distinct_length + choice_distinct_length)
+        bound = utils.intr(100 * min(ratio, 1.0) + 1e-9)
+        shorter, longer = sorted((len(self.query), choice_length))
+        if longer / shorter >= 1.5:
+            # `fuzz.WRatio` takes the partial ratios, scaled down
+            scale = 0.6 if longer / shorter > 8 else 0.9
+            shortest = min(self.distinct_length, choice_distinct_length)
+            partial = 2 * common / (shortest + common)
+            bound = max(
+                bound, utils.intr(utils.intr(100 * min(partial, 1.0) + 1e-9) * scale)
+            )
+            if shared:
+                bound = max(bound, utils.intr(100 * scale * 0.95 + 1e-9))
+        elif shared:
+            bound = max(bound, 95)
+        return bound
+
+
+def profile(processed_name: str) -> Tuple[int, int, int]:
+    """The length of a processed name, the length of its distinct tokens
+    joined by spaces, and a bit mask of the characters in it, for
+    `ScoreBound.estimate`."""
+    mask = 0
+    for char in set(processed_name):
+        mask |= 1 << ord(char)
+    return (
+        len(processed_name),
+        len(" ".join(set(processed_name.split()))),
+        mask,
+    )
+
+
+def best_scores(
+    processed_query: str,
+    processed_choices: Sequence[Union[str, None]],
+    k: int = 1,
+    threshold: int = 0,
+    preferred: Iterable[int] = (),
+    candidates: Union[Sequence[int], None] = None,
+    profiles: Union[Sequence[Union[Tuple[int, int, int], None]], None] = None,
+) -> List[Tuple[int, int]]:
+    """Return the same (position, score) pairs as `top_k` over every choice,
+    best first, but only score the choices whose `ScoreBound` says that they
+    could still make the best *k*. The positions in *preferred* are scored
+    before the rest, and come before the other choices with the same score;
+    the rest are scored in order of their bounds, so that the best matches
+    are likely to be found early and rule the other choices out.
+    *candidates* must include every choice which shares a token with the
+    query, and the rest are assumed not to; pass None if that isn't known.
+    *profiles*, the `profile` of each choice, make the bounds quicker to
+    work out."""
+    if k < 1:
+        return []
+    bound = ScoreBound(processed_query)
+    preferred = [
+        i for i in dict.fromkeys(preferred) if processed_choices[i] is not None
+    ]
+    is_preferred = set(preferred)
+    # min-heap of (score, preferred, -position) of the best k so far
+    best: List[Tuple[int, bool, int]] = []
+
+    def needed(i: int) -> int:
+        if len(best) < k:
+            return threshold
+        # a choice has to beat the worst of the best, or tie with it and
+        # come before it, to take its place
+        worst, *order = best[0]
+        return max(threshold, worst + ((i in is_preferred, -i) < tuple(order)))
+
+    def consider(i: int, may_share_token: bool):
+        choice = processed_choices[i]
+        need = needed(i)
+        if need > 0 and bound(choice, may_share_token) < need:
+            return
+        item = (score(processed_query, choice), i in is_preferred, -i)
+        if item[0] < threshold:
+            return
+        if len(best) < k:
+            heapq.heappush(best, item)
+        elif item > best[0]:
+            heapq.heapreplace(best, item)
+
+    for i in preferred:
+        consider(i, True)
+    sharing = set(candidates) if candidates is not None else None
+    estimates = []
+    for i, choice in enumerate(processed_choices):
+        if choice is not None and i not in is_preferred:
+            may_share_token = sharing is None or i in sharing
+            estimate = bound.estimate(
+                choice, may_share_token, profiles[i] if profiles else None
+            )
+            if estimate >= needed(i):
+                estimates.append((-estimate, i, may_share_token))
+    estimates.sort()
+    for estimate, i, may_share_token in estimates:
+        if len(best) == k and -estimate < best[0][0]:
+            # neither can any of the choices after this one
+            break
+        if -estimate >= needed(i):
+            consider(i, may_share_token)
+    return [(-i, s) for s, _, i in sorted(best, reverse=True)]
+
+
+def trigrams(name: str, processed: bool = False) -> Set[str]:
+    """Character trigrams of each whitespace-separated token in the processed
+    name. Tokens are padded with a space on either side, so short tokens like
+    "Al" still produce trigrams."""
+    grams = set()
+    for token in (name if processed else process_name(name)).split():
+        padded = f" {token} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i : i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """Inverted index from character trigrams to names.
+
+    `candidates` returns every indexed name that shares at least one trigram
+    with the query. Those are usually the only names which score well, so
+    `best` scores them first; but a name which shares no trigram can still
+    score well enough to matter at a low threshold (with transposed or
+    inserted letters, "fDewvn Ray" scores 74 against "Devan Roy"), so the
+    rest of the names are only skipped if their `ScoreBound` shows that they
+    can't beat the best match found so far. The result is always the same as
+    `process.extractOne` over every name.
+
+    Candidates are returned in insertion order. `process.extractOne` breaks
+    ties by taking the first best choice, and so does `best`, by position.
+    """
+
+    # see `profiles`; built when it is first needed, and never pickled
+    _profiles: Union[List[Union[Tuple[int, int, int], None]], None] = None
+
+    def __init__(self, names: Iterable[str] = ()):
+        # incremented by `add` and `discard`
+        self.version = 0
+        self.names: List[Union[str, None]] = []
+        self.processed: List[Union[str, None]] = []
+        self._positions: Dict[str, int] = {}
+        self._postings: Dict[str, Set[int]] = {}
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, name):
+        return name in self._positions
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_profiles", None)
+        return state
+
+    @property
+    def profiles(self) -> List[Union[Tuple[int, int, int], None]]:
+        """The `profile` of each processed name, by position."""
+        if self._profiles is None:
+            self._profiles = [None if p is None else profile(p) for p in self.processed]
+        return self._profiles
+
+    def position(self, name: str) -> Union[int, None]:
+        """Position of *name* in the index. Positions are never reused, so
+        they can be used as stable ordinals for the names."""
+        return self._positions.get(name)
+
+    def add(self, name: str):
+        if name in self._positions:
+            return
+        self.version += 1
+        position = len(self.names)
+        processed = process_name(name)
+        self.names.append(name)
+        self.processed.append(processed)
+        self._positions[name] = position
+        if self._profiles is not None:
+            self._profiles.append(profile(processed))
+        for gram in trigrams(processed, processed=True):
+            self._postings.setdefault(gram, set()).add(position)
+
+    def discard(self, name: str):
+        """Remove a name from the index. Its slot is left empty so that the
+        positions of the other names (and therefore their order) are kept."""
+        position = self._positions.pop(name, None)
+        if position is None:
+            return
+        self.version += 1
+        self.names[position] = None
+        self.processed[position] = None
+        if self._profiles is not None:
+            self._profiles[position] = None
+        for gram in trigrams(name):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(position)
+                if not posting:
+                    del self._postings[gram]
+
+    def candidate_positions(self, processed_query: str) -> List[int]:
+        hits: Set[int] = set()
+        for gram in trigrams(processed_query, processed=True):
+            hits.update(self._postings.get(gram, ()))
+        return sorted(hits)
+
+    def candidates(self, query: str) -> List[str]:
+        positions = self.candidate_positions(process_name(query))
+        return [self.names[i] for i in positions]  # type: ignore
+
+    def best(
+        self,
+        processed_query: str,
+        k: int = 1,
+        threshold: int = 0,
+        preferred: Iterable[int] = (),
+    ) -> List[Tuple[int, int]]:
+        """The (position, score) pairs of the *k* best scoring names, best
+        first, leaving out any which score below *threshold*: the same names
+        that `top_k` would find by scoring every name, and for `k=1` the name
+        that `process.extractOne` would, except that the names at the positions
+        in *preferred* come first amongst names with the same score; see
+        `best_scores`."""
+        return best_scores(
+            processed_query,
+            self.processed,
+            k,
+            threshold,
+            preferred,
+            self.candidate_positions(processed_query),
+            self.profiles,
+        )
+
+
+class GuardianIndex:
+    """Mapping of guardian names to guardians, with a separate mapping of
+    primary contacts so that `Sis.find_parent` can prefer to match them.
+
+    Guardians are not stored directly. Each name maps to a locator: the key
+    of the student in `Sis.students`, and the position of the guardian in
+    that student's guardians (or -1 for a primary contact who isn't in the
+    list). That way the index can be stored and loaded on its own, without
+    loading every student; see `resolve`.
+
+    The index remembers the guardian generation it was built at (see
+    `_entities.guardian_generation`); it is out of date once any student's
+    guardians or primary contact have changed since.
+
+    `phonetic` indexes `all_names` by how they sound; see `PhoneticIndex`.
+    """
+
+    # indexes pickled before the phonetic index existed don't have one
+    phonetic: Union["PhoneticIndex", None] = None
+
+    # see `positions` and `profiles`; built when they are first needed, and
+    # never pickled
+    _positions: Union[Dict[str, Dict[str, int]], None] = None
+    _profiles: Union[Dict[str, List[Tuple[int, int, int]]], None] = None
+
+    def __init__(self, students: Mapping[str, Student]):
+        self.generation = guardian_generation()
+        self.all: Dict[str, Tuple[str, int]] = {}
+        self.primary: Dict[str, Tuple[str, int]] = {}
+        for key, st in students.items():
+            for i, g in enumerate(st.guardians):
+                self.all.setdefault(g.name, (key, i))
+                if g.primary_contact:
+                    self.primary.setdefault(g.name, (key, i))
+            primary_contact = cast(ParentGuardian, st.primary_contact)
+            if primary_contact is not None:
+                position = next(
+                    (i for i, g in enumerate(st.guardians) if g is primary_contact),
+                    -1,
+                )
+                self.primary.setdefault(primary_contact.name, (key, position))
+        self.all_names = list(self.all)
+        self.primary_names = list(self.primary)
+        self.all_processed = [process_name(name) for name in self.all_names]
+        self.primary_processed = [process_name(name) for name in self.primary_names]
+        self.phonetic = PhoneticIndex(self.all_names)
+
+    @property
+    def is_stale(self) -> bool:
+        return self.generation != guardian_generation()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("_positions", None)
+        state.pop("_profiles", None)
+        return state
+
+    def names(self, label: str) -> Tuple[List[str], List[str]]:
+        """The names of the "primary" contacts or of "all" parents and
+        guardians, and the same names processed for scoring."""
+        if label == "primary":
+            return self.primary_names, self.primary_processed
+        return self.all_names, self.all_processed
+
+    def positions(self, label: str) -> Dict[str, int]:
+        """The position of each name in `names(label)`."""
+        if self._positions is None:
+            self._positions = {}
+        if label not in self._positions:
+            names = self.names(label)[0]
+            self._positions[label] = {name: i for i, name in enumerate(names)}
+        return self._positions[label]
+
+    def profiles(self, label: str) -> List[Tuple[int, int, int]]:
+        """The `profile` of each processed name in `names(label)`."""
+        if self._profiles is None:
+            self._profiles = {}
+        if label not in self._profiles:
+            processed = self.names(label)[1]
+            self._profiles[label] = [profile(p) for p in processed]
+        return self._profiles[label]
+
+    def best(
+        self,
+        label: str,
+        processed_query: str,
+        threshold: int = 0,
+        preferred: Iterable[str] = (),
+    ) -> Union[Tuple[str, int], None]:
+        """The best scoring of `names(label)` and its score, if it clears
+        *threshold*: the name that `process.extractOne` would find, except
+        that the *preferred* names come first amongst names with the same
+        score. See `best_scores`."""
+        names, processed = self.names(label)
+        positions = self.positions(label)
+        best = best_scores(
+            processed_query,
+            processed,
+            threshold=threshold,
+            preferred=[positions[name] for name in preferred if name in positions],
+            profiles=self.profiles(label),
+        )
+        if best:
+            position, score = best[0]
+            return names[position], score
+        return None
+
+    @staticmethod
+    def resolve(
+        students: Mapping[str, Student], locator: Union[Tuple[str, int], None]
+    ) -> Union[ParentGuardian, None]:
+        if locator is None:
+            return None
+        key, position = locator
+        student = students[key]
+        if position == -1:
+            return student.primary_contact
+        return student.guardians[position]
+
+
+class FieldIndex:
+    """Hash indexes over the `Student` fields that other data is usually
+    joined on. Like `GuardianIndex`, it stores keys of `Sis.students` rather
+    than the students themselves.
+
+    Emails and student ids identify a single student, so they map straight
+    to a key. Grade levels and homerooms map to lists of keys in roster
+    order. Emails are compared case-insensitively.
+    """
+
+    UNIQUE = ("email", "student_id")
+    GROUPED = ("grade_level", "homeroom")
+
+    # incremented by `add` and `discard`; a class attribute so that indexes
+    # pickled before it existed still have it
+    version = 0
+
+    def __init__(self, students: Mapping[str, Student] = {}):
+        self.unique: Dict[str, Dict] = {field: {} for field in self.UNIQUE}
+        self.grouped: Dict[str, Dict[object, List[str]]] = {
+            field: {} for field in self.GROUPED
+        }
+        for key, st in students.items():
+            self.add(key, st)
+
+    @staticmethod
+    def _key(field: str, value):
+        if field == "email" and isinstance(value, str):
+            return value.strip().lower()
+        return value
+
+    def add(self, key: str, student: Student):
+        self.version += 1
+        for field, index in self.unique.items():
+            value = getattr(student, field)
+            if value:
+                index.setdefault(self._key(field, value), key)
+        for field, groups in self.grouped.items():
+            value = getattr(student, field)
+            if value is not None:
+                groups.setdefault(value, []).append(key)
+
+    def discard(self, key: str, student: Student):
+        self.version += 1
+        for field, index in self.unique.items():
+            value = self._key(field, getattr(student, field))
+            if index.get(value) == key:
+                del index[value]
+        for field, groups in self.grouped.items():
+            value = getattr(student, field)
+            if value not in groups:
+                continue
+            groups[value] = [k for k in groups[value] if k != key]
+            if not groups[value]:
+                del groups[value]
+
+    def get(self, field: str, value) -> Union[str, None]:
+        return self.unique[field].get(self._key(field, value))
+
+    def group(self, field: str, value) -> List[str]:
+        return list(self.grouped[field].get(value, ()))
+
+
+class NameKeyIndex:
+    """Mapping of normalized names (see `_normalize.NameNormalizer`) to
+    student keys, so that names which only differ in accents, case,
+    whitespace, "Last, First" order, hyphenation or nicknames can be looked
+    up in constant time.
+
+    If several students have the same normalized name, a lookup can't tell
+    them apart, so their key is left out of `keys` (and kept in `ambiguous`)
+    until only one of them is left."""
+
+    def __init__(
+        self,
+        names: Iterable[str] = (),
+        nicknames: Union[Mapping[str, str], None] = None,
+    ):
+        self.normalize = NameNormalizer(nicknames)
+        self.keys: Dict[str, str] = {}
+        self.ambiguous: Dict[str, Set[str]] = {}
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str):
+        key = self.normalize(name)
+        if key in self.ambiguous:
+            self.ambiguous[key].add(name)
+        elif self.keys.get(key, name) != name:
+            self.ambiguous[key] = {self.keys.pop(key), name}
+        else:
+            self.keys[key] = name
+
+    def discard(self, name: str):
+        key = self.normalize(name)
+        names = self.ambiguous.get(key)
+        if names is not None:
+            names.discard(name)
+            if len(names) == 1:
+                self.keys[key] = names.pop()
+                del self.ambiguous[key]
+        elif self.keys.get(key) == name:
+            del self.keys[key]
+
+    def get(self, query: str) -> Union[str, None]:
+        return self.keys.get(self.normalize(query))
+
+
+class PhoneticIndex:
+    """Mapping of phonetic keys (see `_phonetic.phonetic_key`) to the names
+    which have them, in insertion order, so that `Sis` can score the few
+    names which sound like a query before falling back to all of the names
+    which share a trigram with it.
+
+    Names are normalized without a nickname table before they are keyed, so
+    "Smith, Katelyn" and "Caitlin Smyth" have the same key."""
+
+    def __init__(self, names: Iterable[str] = ()):
+        self.normalize = NameNormalizer()
+        self.names: Dict[str, List[str]] = {}
+        for name in names:
+            self.add(name)
+
+    def key(self, name: str) -> str:
+        return phonetic_key(self.normalize(name))
+
+    def add(self, name: str):
+        names = self.names.setdefault(self.key(name), [])
+        if name not in names:
+            names.append(name)
+
+    def discard(self, name: str):
+        key = self.key(name)
+        names = self.names.get(key)
+        if names is not None and name in names:
+            names.remove(name)
+            if not names:
+                del self.names[key]
+
+    def get(self, query: str) -> List[str]:
+        """The names with the same phonetic key as *query*. A query without
+        any key (like "123") matches nothing."""
+        key = self.key(query)
+        return list(self.names.get(key, ())) if key else []
+
+
+class PrefixTrie:
+    """Prefix trie of names, for completing a name as it is typed.
+
+    Each name is keyed by its processed form (see `process_name`) starting at
+    every token, so "Tommy Smith" completes "tom", "smi" and "tommy s". The
+    trie is stored flat, as the sorted list of keys: the names under a node
+    are the contiguous run of keys which start with its prefix, so finding a
+    node is two binary searches rather than a walk of per-character dicts,
+    which would take several times the memory on big rosters.
+
+    The last node found is remembered. Typing is incremental, so when a
+    prefix extends the previous one, its node is searched for within the
+    previous node's run rather than the whole trie.
+    """
+
+    def __init__(self, names: Iterable[str] = (), processed: Iterable[str] = ()):
+        """Index *names*. If their *processed* forms are already known (as
+        they are in `TrigramIndex` and `GuardianIndex`) they can be passed
+        along, in the same order, to save processing them again."""
+        names = list(names)
+        processed = list(processed) or [process_name(name) for name in names]
+        entries = sorted(
+            (key[start:], name)
+            for name, key in zip(names, processed)
+            if name is not None and key
+            for start in self._token_starts(key)
+        )
+        self.keys = [key for key, _ in entries]
+        self.names = [name for _, name in entries]
+        self._last = ("", 0, len(self.keys))
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def _token_starts(key: str) -> Iterator[int]:
+        yield 0
+        for i in range(1, len(key)):
+            if key[i - 1] == " ":
+                yield i
+
+    @staticmethod
+    def process_prefix(prefix: str) -> str:
+        """Process *prefix* like the keys, keeping a trailing space, which
+        says that the last token is complete."""
+        processed = process_name(prefix)
+        if processed and prefix[-1:].isspace():
+            processed += " "
+        return processed
+
+    def node(self, processed_prefix: str) -> Tuple[int, int]:
+        """The run of `keys` (start and end positions) which start with
+        *processed_prefix*."""
+        last, lo, hi = self._last
+        if not processed_prefix.startswith(last):
+            lo, hi = 0, len(self.keys)
+        if processed_prefix:
+            lo = bisect_left(self.keys, processed_prefix, lo, hi)
+            # every key with the prefix sorts before the prefix with its last
+            # character incremented
+            bound = processed_prefix[:-1] + chr(ord(processed_prefix[-1]) + 1)
+            hi = bisect_left(self.keys, bound, lo, hi)
+        self._last = (processed_prefix, lo, hi)
+        return lo, hi
+
+    def iter_complete(self, processed_prefix: str) -> Iterator[Tuple[str, str]]:
+        """(key, name) pairs of the names with a token starting with
+        *processed_prefix*, in order of key. A name is repeated if more than
+        one of its tokens matches."""
+        lo, hi = self.node(processed_prefix)
+        for i in range(lo, hi):
+            yield self.keys[i], self.names[i]
+
+    def complete(self, prefix: str, limit: Union[int, None] = None) -> List[str]:
+        """Names with a token starting with *prefix*, ignoring case, accents
+        and punctuation, in alphabetical order of the matching token."""
+        if limit is not None and limit <= 0:
+            return []
+        completions: Dict[str, None] = {}
+        for _, name in self.iter_complete(self.process_prefix(prefix)):
+            completions[name] = None
+            if limit is not None and len(completions) >= limit:
+                break
+        return list(completions)
@@ -0,0 +1,233 @@
+"""Streaming reader for the csv exports which `OnCourseMixin` builds the roster
+from. Exports can be plain, gzipped or zipped, and big ones are parsed in
+chunks on a process pool; see `read_export`."""
+
+from collections import deque
+from contextlib import contextmanager
+import csv
+import gzip
+import io
+from itertools import chain, islice
+from operator import itemgetter
+import os
+from pathlib import Path
+import re
+from typing import Callable, Dict, Iterator, List, Sequence, TextIO, Tuple, Union
+import zipfile
+
+# various adapters from grade level representations to int
+GRADE_LEVELS = {"4th Grade": 4, "5th Grade": 5, "6th Grade": 6, "7th Grade": 7}
+
+# rows per chunk; an export with more rows than this is parsed in parallel
+CHUNK_SIZE = 5000
+
+# suffixes which `find_export` looks for, in order of preference
+EXPORT_SUFFIXES = (".csv", ".csv.gz", ".zip")
+
+# `Student` attributes, mapped to the (lowercased) columns of students.csv
+# that they are read from
+STUDENT_COLUMNS = {
+    "first_name": "first name",
+    "last_name": "last name",
+    "grade_level": "grade level",
+    "homeroom": "homeroom teacher",
+    "email": "email address 1",
+    "birthday": "birth date",
+    "student_id": "student id",
+}
+
+# `ParentGuardian` attributes, mapped to the columns of parents.csv
+GUARDIAN_COLUMNS = {
+    "first_name": "guardian first name",
+    "last_name": "guardian last name",
+    "primary_contact": "primary contact",
+    "email": "guardian email address 1",
+    "mobile_phone": "guardian mobile phone",
+    "home_phone": "guardian phone",
+    "work_phone": "guardian work phone",
+    "comments": "comments",
+    "allow_contact": "allow contact",
+    "student_resides_with": "student resides with",
+    "relationship_to_student": "relation to student",
+}
+
+BOOLEAN_FIELDS = ("primary_contact", "allow_contact", "student_resides_with")
+
+_NON_DIGITS = re.compile(r"\D")
+
+# a chunk of rows, each with the line it ends on
+Chunk = List[Tuple[int, List[str]]]
+
+
+def find_export(data_dir: Union[str, Path], stem: str) -> Path:
+    """The export called *stem* in *data_dir*: `{stem}.csv`, or else a
+    gzipped or zipped copy of it. If there is none, the path of the plain
+    csv file is returned, so that the error names the file that was
+    expected."""
+    for suffix in EXPORT_SUFFIXES:
+        path = Path(data_dir, stem + suffix)
+        if path.exists():
+            return path
+    return Path(data_dir, stem + EXPORT_SUFFIXES[0])
+
+
+@contextmanager
+def open_export(path: Path) -> Iterator[TextIO]:
+    """Open a csv export for reading as text, decompressing it if it is
+    gzipped (`.gz`) or zipped (`.zip`, holding a single csv file)."""
+    if path.suffix == ".gz":
+        with gzip.open(path, "rt", encoding="utf-8-sig", newline="") as fp:
+            yield fp
+    elif path.suffix == ".zip":
+        with zipfile.ZipFile(path) as archive:
+            members = [n for n in archive.namelist() if n.lower().endswith(".csv")]
+            if len(members) != 1:
+                raise ValueError(f"expected a single csv file in {path}")
+            with archive.open(members[0]) as raw:
+                yield io.TextIOWrapper(raw, encoding="utf-8-sig", newline="")
+    else:
+        with open(path, "r", encoding="utf-8-sig", newline="") as fp:
+            yield fp
+
+
+def _chunks(reader, size: int) -> Iterator[Chunk]:
+    rows = ((reader.line_num, row) for row in reader)
+    while chunk := list(islice(rows, size)):
+        yield chunk
+
+
+def read_export(
+    path: Path,
+    parse: Callable[[Sequence[str], Chunk], list],
+    workers: Union[int, None] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> list:
+    """Stream the export at *path* in chunks of *chunk_size* rows, and
+    return the concatenated results of `parse(header, chunk)` for each one,
+    in file order. The header is lowercased.
+
+    If there is more than one chunk, they are parsed on a pool of *workers*
+    processes (one per CPU by default) while the rest of the file is read.
+    Only a few chunks are in flight at once, so memory use doesn't grow with
+    the size of the export. Pass `workers=1` to parse everything in this
+    process."""
+    workers = workers or os.cpu_count() or 1
+    results: list = []
+    with open_export(path) as fp:
+        reader = csv.reader(fp)
+        header = [column.lower() for column in next(reader, [])]
+        chunks = _chunks(reader, chunk_size)
+        head = list(islice(chunks, 2))
+        if len(head) < 2 or workers == 1:
+            for chunk in chain(head, chunks):
+                results.extend(parse(header, chunk))
+            return results
+
+        # multiprocessing is slow to import, and lookups never need it
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: deque = deque()
+            for chunk in chain(head, chunks):
+                pending.append(pool.submit(parse, header, chunk))
+                if len(pending) > 2 * workers:
+                    results.extend(pending.popleft().result())
+            while pending:
+                results.extend(pending.popleft().result())
+    return results
+
+
+def _row_reader(
+    header: Sequence[str], columns: Dict[str, str]
+) -> Callable[[List[str]], dict]:
+    """Return a function which turns a row into a dict of the attributes in
+    *columns*. Like `csv.DictReader`, missing columns and short rows give
+    None, but only the wanted columns are picked out of each row."""
+    found = {column: i for i, column in enumerate(header)}
+    present = [
+        (attr, found[column]) for attr, column in columns.items() if column in found
+    ]
+    missing = dict.fromkeys(
+        attr for attr, column in columns.items() if column not in found
+    )
+    attrs = [attr for attr, _ in present]
+    positions = [i for _, i in present]
+    width = max(positions, default=-1) + 1
+    getter = itemgetter(*positions) if len(positions) > 1 else None
+
+    def read(row: List[str]) -> dict:
+        if getter is not None and len(row) >= width:
+            context = dict(zip(attrs, getter(row)))
+        else:
+            context = {attr: row[i] if i < len(row) else None for attr, i in present}
+        context.update(missing)
+        return context
+
+    return read
+
+
+def parse_students(header: Sequence[str], chunk: Chunk) -> List[dict]:
+    """Turn rows of students.csv into `Student` contexts."""
+    read = _row_reader(header, STUDENT_COLUMNS)
+    contexts = []
+    for _, row in chunk:
+        context = read(row)
+        context["grade_level"] = GRADE_LEVELS[context["grade_level"] or ""]
+        context["student_id"] = context["student_id"] or None
+        contexts.append(context)
+    return contexts
+
+
+def parse_guardians(header: Sequence[str], chunk: Chunk) -> List[Tuple[int, dict]]:
+    """Turn rows of parents.csv into cleaned `ParentGuardian` contexts, paired
+    with their line numbers. The "student" of each context is still the
+    student's name; linking it to a `Student` is up to the caller."""
+    read = _row_reader(
+        header,
+        {
+            **GUARDIAN_COLUMNS,
+            "student_first_name": "student first name",
+            "student_last_name": "student last name",
+        },
+    )
+    parsed = []
+    for line_num, row in chunk:
+        context = read(row)
+        context["student"] = (
+            f"{context.pop('student_first_name') or ''} "
+            f"{context.pop('student_last_name') or ''}"
+        )
+        for k, v in context.items():
+            if v is None:
+                raise Exception(f"could not find value for {k}")
+        clean_guardian_context(context)
+        parsed.append((line_num, context))
+    return parsed
+
+
+def clean_guardian_context(context: dict):
+    """Clean phone numbers and convert the Y/N fields of a guardian row, in
+    place."""
+    for k, v in context.items():
+        # clean phone numbers
+        if "phone" in k:
+            if "_" in v:
+                continue
+            digits = _NON_DIGITS.sub("", v)
+            if len(digits) < 10:
+                continue
+            if len(digits) > 11:
+                context["comments"] += f"\n{k} is {v}"
+                continue
+            context[k] = int(digits)
+        # convert boolean fields to boolean
+        elif k in BOOLEAN_FIELDS:
+            if "Y" in v:
+                context[k] = True
+            elif "N" in v:
+                context[k] = False
+            else:
+                raise ValueError(
+                    f"Supposedly boolean field {k} could not"
+                    "be converted into a boolean value."
+                )
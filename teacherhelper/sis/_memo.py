@@ -0,0 +1,58 @@
+"""Bounded memo of lookup results, for callers which look up the same names
+over and over. See `Sis.enable_lookup_cache`."""
+
+from collections import OrderedDict
+from typing import Hashable, Tuple
+
+from ._stats import LookupCacheStats
+
+
+class LookupCache:
+    """Least recently used cache of up to *maxsize* lookup results.
+
+    Results are only valid for the roster they were looked up in. Each
+    `get` and `put` is passed a *state*, which changes whenever the roster
+    does (see `Sis._roster_state`); the first call with a new state empties
+    the cache."""
+
+    def __init__(self, maxsize: int = 1024):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.stats = LookupCacheStats(maxsize=maxsize)
+        self._entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self._state: Hashable = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check(self, state: Hashable):
+        if state != self._state:
+            if self._entries:
+                self.stats.invalidations += 1
+                self._entries.clear()
+                self.stats.size = 0
+            self._state = state
+
+    def get(self, state: Hashable, key: Hashable) -> Tuple[bool, object]:
+        """Return `(True, result)` if *key* is cached, or `(False, None)`.
+        Results can themselves be None, for names which didn't match."""
+        self._check(state)
+        if key not in self._entries:
+            self.stats.misses += 1
+            return False, None
+        self.stats.hits += 1
+        self._entries.move_to_end(key)
+        return True, self._entries[key]
+
+    def put(self, state: Hashable, key: Hashable, result: object):
+        self._check(state)
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.stats.maxsize:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+        self.stats.size = len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.stats.size = 0
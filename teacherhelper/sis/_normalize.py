@@ -0,0 +1,57 @@
+"""Normalization of names into keys which ignore the differences that don't
+matter when matching a typed name against the roster. See `NameNormalizer`."""
+
+import re
+import unicodedata
+from typing import Dict, Mapping, Union
+
+# hyphens, dashes, underscores and periods separate words
+_SEPARATORS = re.compile(r"[-‐‑‒–—_.]")
+# apostrophes are dropped, so that "O'Neil" and "ONeil" have the same key
+_APOSTROPHES = re.compile(r"['‘’`]")
+
+
+def fold(text: str) -> str:
+    """Remove accents and case: "José" and "JOSE" both become "jose"."""
+    if text.isascii():
+        return text.lower()
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+class NameNormalizer:
+    """Callable which turns a name into its key:
+
+    1. accents and case are folded away (see `fold`)
+    2. "Last, First" is put back into "First Last" order
+    3. hyphens and periods become spaces, and apostrophes are dropped
+    4. runs of whitespace are collapsed
+    5. if there is a nickname table, a nickname in the first word is
+       replaced by the name it is short for
+
+    So "  Smith-Jones,  Bob " becomes "robert smith jones", given a nickname
+    table which maps "Bob" to "Robert". Nicknames and the names they map to
+    are normalized themselves, so the table can be written in any case.
+    """
+
+    def __init__(self, nicknames: Union[Mapping[str, str], None] = None):
+        self.nicknames: Dict[str, str] = {}
+        for nickname, name in (nicknames or {}).items():
+            self.nicknames[self._words(nickname)] = self._words(name)
+
+    @staticmethod
+    def _words(name: str) -> str:
+        text = fold(name)
+        if "," in text:
+            last, _, first = text.partition(",")
+            text = f"{first} {last}"
+        text = _APOSTROPHES.sub("", _SEPARATORS.sub(" ", text))
+        return " ".join(text.split())
+
+    def __call__(self, name: str) -> str:
+        text = self._words(name)
+        if self.nicknames:
+            first, _, rest = text.partition(" ")
+            if first in self.nicknames:
+                text = f"{self.nicknames[first]} {rest}".rstrip()
+        return text
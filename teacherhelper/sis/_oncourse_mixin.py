@@ -1,8 +1,54 @@
+from contextlib import contextmanager
 import csv
+import logging
+import os
 from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
 
 from teacherhelper._data_dir import get_data_dir
+from . import _cache
 from ._entities import Homeroom, ParentGuardian, Student
+from ._ingest import find_export, parse_guardians, parse_students, read_export
+from ._stats import IngestReport, LinkReport, RefreshReport
+
+logger = logging.getLogger(__name__)
+
+# attributes which `refresh` compares to decide whether a student or guardian
+# has changed. A student's name is their key, so it is never compared
+STUDENT_FIELDS = (
+    "first_name",
+    "last_name",
+    "student_id",
+    "homeroom",
+    "grade_level",
+    "email",
+)
+GUARDIAN_FIELDS = _cache.GUARDIAN_COLUMNS
+
+
+def _source_paths() -> Tuple[Path, Path]:
+    data_dir = get_data_dir()
+    return find_export(data_dir, "students"), find_export(data_dir, "parents")
+
+
+def _read_nicknames() -> Dict[str, str]:
+    """The optional nicknames.csv, which maps nicknames to the names they are
+    short for, one pair per row. It has no header."""
+    path = Path(get_data_dir(), "nicknames.csv")
+    if not path.exists():
+        return {}
+    with open(path, "r", encoding="utf-8-sig") as csvfile:
+        return {row[0]: row[1] for row in csv.reader(csvfile) if len(row) >= 2}
+
+
+def _read_students(
+    student_data: Path, workers: Union[int, None] = None
+) -> Dict[str, Student]:
+    students = {}
+    for context in read_export(student_data, parse_students, workers):
+        student = Student(context)
+        students[student.name] = student
+    return students
 
 
 class OnCourseMixin:
@@ -10,8 +56,15 @@ class OnCourseMixin:
     initializes the helper cache with the spreadsheet reports that I output
     from oncourse, using those specific headers."""
 
+    # report of the guardian rows which needed a fuzzy search to find their
+    # student during the last new_school_year or refresh
+    link_report = None
+
+    # timings of the last new_school_year or refresh; never stored
+    ingest_report = None
+
     @classmethod
-    def new_school_year(cls):
+    def new_school_year(cls, workers: Union[int, None] = None):
         """Take a spreadsheet of student data and parent data, build the
         necessary relationships.
 
@@ -23,6 +76,7 @@ class OnCourseMixin:
         - homeroom teacher
         - email address 1
         - birth date
+        - student id (optional)
 
         Parent data csv should include:
 
@@ -39,119 +93,291 @@ class OnCourseMixin:
         - allow contact
         - student resides with
         - relation to student
+
+        Either file can also be gzipped (`students.csv.gz`) or zipped
+        (`students.zip`). Big files are parsed in chunks on a pool of
+        *workers* processes (one per CPU by default); pass `workers=1` to
+        parse them in this process. Timings of each phase are left in
+        `ingest_report`.
         """
-        student_data = Path(get_data_dir(), "students.csv")
-        guardian_data = Path(get_data_dir(), "parents.csv")
-        STUDENTS = {}
+        student_data, guardian_data = _source_paths()
+        report = IngestReport(workers or os.cpu_count() or 1)
+        with report.phase("parse students.csv") as phase:
+            STUDENTS = _read_students(student_data, report.workers)
+            phase.rows = len(STUDENTS)
         HOMEROOMS = {}
-
-        # various adapters from grade level representations to int
-        to_number = {"4th Grade": 4, "5th Grade": 5, "6th Grade": 6, "7th Grade": 7}
-
-        with open(student_data, "r", encoding="utf-8-sig") as csvfile:
-            rd = csv.DictReader(csvfile)
-            for row in rd:
-                # convert keys to lowercase to normalize case
-                row = {k.lower(): v for k, v in row.items()}
-                student = Student(
-                    {
-                        "first_name": row.get("first name"),
-                        "last_name": row.get("last name"),
-                        "grade_level": to_number[row.get("grade level", "")],
-                        "homeroom": row.get("homeroom teacher"),
-                        "email": row.get("email address 1"),
-                        "birthday": row.get("birth date"),
-                    }
+        for student in STUDENTS.values():
+            if student.homeroom not in HOMEROOMS:
+                HOMEROOMS[student.homeroom] = Homeroom(
+                    student.homeroom,
+                    student.grade_level,
+                    [student],
                 )
-                STUDENTS[student.name] = student
-                if student.homeroom not in HOMEROOMS:
-                    HOMEROOMS[student.homeroom] = Homeroom(
-                        student.homeroom,
-                        student.grade_level,
-                        [student],
-                    )
-                else:
-                    HOMEROOMS[student.homeroom].students.append(student)
+            else:
+                HOMEROOMS[student.homeroom].students.append(student)
 
         # instantiation
         self = cls(HOMEROOMS, STUDENTS, {})  # type: ignore
-        with open(guardian_data, "r", encoding="utf8") as csvfile:
-            rd = csv.DictReader(csvfile)
-            for row in rd:
-                # normalize headers to lowercase
-                row = {k.lower(): v for k, v in row.items()}
-                context = {
-                    "first_name": row.get("guardian first name"),
-                    "last_name": row.get("guardian last name"),
-                    "student": (
-                        row.get("student first name", "")
-                        + " "
-                        + row.get("student last name", "")
-                    ),
-                    "primary_contact": row.get("primary contact"),
-                    "email": row.get("guardian email address 1"),
-                    "mobile_phone": row.get("guardian mobile phone"),
-                    "home_phone": row.get("guardian phone"),
-                    "work_phone": row.get("guardian work phone"),
-                    "comments": row.get("comments"),
-                    "allow_contact": row.get("allow contact"),
-                    "student_resides_with": row.get("student resides with"),
-                    "relationship_to_student": row.get("relation to student"),
-                }
-
-                for k, v in context.items():
-                    if v is None:
-                        raise Exception(f"could not find value for {k}")
-
-                # find student object match
-                student = self.find_student(context["student"])  # type: ignore
-                if not student:
-                    continue
-                if student.name != context["student"]:
-                    raise ValueError(
-                        f"Integrity error. {student.name} does not equal "
-                        + context["student"]
-                    )
-                context["student"] = student
-
-                for k, v in context.items():
-                    # clean phone numbers
-                    if "phone" in k:
-                        if "_" in v:
-                            continue
-                        nums = [l for l in v if l.isnumeric()]
-                        if not nums:
-                            continue
-                        if len(nums) < 10:
-                            continue
-                        if len(nums) > 11:
-                            context["comments"] += f"\n{k} is {v}"
-                            continue
-                        try:
-                            phone_number = int("".join(nums))
-                            context[k] = phone_number
-                        except TypeError:
-                            continue
-                    # convert boolean fields to boolean
-                    if k in [
-                        "primary_contact",
-                        "allow_contact",
-                        "student_resides_with",
-                    ]:
-                        if "Y" in v:
-                            v = True
-                        elif "N" in v:
-                            v = False
-                        else:
-                            raise ValueError(
-                                f"Supposedly boolean field {k} could not"
-                                "be converted into a boolean value."
-                            )
-                        context[k] = v
+        if nicknames := _read_nicknames():
+            self.set_nicknames(nicknames)
+        self.source_hashes = {
+            path.name: _cache.file_sha256(path)
+            for path in (student_data, guardian_data)
+        }
 
+        with self._read_guardians(guardian_data, report) as linked:
+            for student, context in linked:
                 parent = ParentGuardian(context)
                 student.guardians.append(parent)
                 if context["primary_contact"]:
                     student.primary_contact = parent
 
+        self.ingest_report = report
+        logger.info("read the roster:\n%s", report)
         return self
+
+    @contextmanager
+    def _read_guardians(
+        self, guardian_data: Path, report: IngestReport
+    ) -> Iterator[List[Tuple[Student, dict]]]:
+        """Link each row of parents.csv to one of `self.students`, yielding
+        the `(student, cleaned row)` pairs in file order. Rows which don't
+        match a student are left out.
+
+        Parsing and linking are timed as phases of *report*. Linking lasts
+        until the end of the `with` block, so that building the guardians
+        from the rows counts towards it."""
+        with report.phase("parse parents.csv") as phase:
+            parsed = read_export(guardian_data, parse_guardians, report.workers)
+            phase.rows = len(parsed)
+
+        with report.phase("link guardians") as phase:
+            phase.rows = len(parsed)
+            yield self._link_guardians(parsed, guardian_data)
+
+    def _link_guardians(
+        self, parsed: List[Tuple[int, dict]], guardian_data: Path
+    ) -> List[Tuple[Student, dict]]:
+        # students are linked to guardian rows by joining on their normalized
+        # name. Rows which don't join are resolved by fuzzy search afterwards,
+        # in a single batch
+        key_index = self._key_index  # type: ignore
+        rows = []
+        for line_num, context in parsed:
+            key = key_index.get(context["student"])
+            student = self.students[key] if key else None  # type: ignore
+            rows.append((line_num, context, student))
+
+        # find student object matches for the rows that didn't join
+        fallback = [i for i, (*_, student) in enumerate(rows) if student is None]
+        matches = self.find_students(  # type: ignore
+            rows[i][1]["student"] for i in fallback
+        )
+        # a match by another name may well be for a student who isn't on the
+        # roster, so it is left out rather than linked to the wrong student
+        report = LinkReport()
+        for i, student in zip(fallback, matches):
+            line_num, context, _ = rows[i]
+            row = (line_num, context["student"], student.name if student else None)
+            report.fallback_rows.append(row)
+            if student and key_index.normalize(student.name) != key_index.normalize(
+                context["student"]
+            ):
+                report.rejected_rows.append(row)
+                student = None
+            rows[i] = (line_num, context, student)
+        self.link_report = report
+        if report.fallback_rows:
+            logger.info(
+                "%d of %d rows in %s needed a fuzzy search to find their "
+                "student; see Sis.link_report",
+                len(report.fallback_rows),
+                len(rows),
+                guardian_data,
+            )
+        left_out = len(report.unmatched_rows) + len(report.rejected_rows)
+        if left_out:
+            logger.warning(
+                "%d rows in %s matched no student by their name and were left "
+                "out; see Sis.link_report.unmatched_rows and rejected_rows",
+                left_out,
+                guardian_data,
+            )
+
+        linked = []
+        for _, context, student in rows:
+            if not student:
+                continue
+            context["student"] = student
+            linked.append((student, context))
+        return linked
+
+    def refresh(self, write=True, workers: Union[int, None] = None) -> RefreshReport:
+        """Bring this instance up to date with students.csv and parents.csv,
+        without rebuilding it from scratch like `new_school_year` does.
+
+        Students are matched to rows of students.csv by name, which is their
+        key in `self.students`, and guardians are matched by student and
+        guardian name. Only the differences are applied: new students are
+        added, missing ones are removed (from their homeroom and any groups,
+        too), and changed fields, homerooms, guardians and primary contacts
+        are updated in place, so unchanged entities keep their identity.
+
+        If *write* is true, the changes are also saved. An instance read
+        from the cache only has its changed rows rewritten; otherwise, the
+        whole cache is written as by `write_cache`.
+
+        The files are read as by `new_school_year`, using *workers*
+        processes, and the timings are left in `ingest_report`."""
+        student_data, guardian_data = _source_paths()
+        ingest = IngestReport(workers or os.cpu_count() or 1)
+        with ingest.phase("parse students.csv") as phase:
+            new_students = _read_students(student_data, ingest.workers)
+            phase.rows = len(new_students)
+        report = RefreshReport()
+
+        # everything is compared, so load it all in one go
+        students = self.students  # type: ignore
+        homerooms = self.homerooms  # type: ignore
+        for loaded in (students, homerooms):
+            if isinstance(loaded, _cache.LazyDict):
+                loaded.load_all()
+        old_students = dict(students)
+        homerooms_changed = {}
+
+        def leave_homeroom(student):
+            homeroom = homerooms.get(student.homeroom)
+            if homeroom is not None:
+                homeroom.students = [s for s in homeroom.students if s is not student]
+                homerooms_changed[student.homeroom] = None
+
+        def join_homeroom(student):
+            if student.homeroom not in homerooms:
+                homerooms[student.homeroom] = Homeroom(
+                    student.homeroom, student.grade_level, []
+                )
+                report.homerooms_added.append(student.homeroom)
+            homerooms[student.homeroom].students.append(student)
+            homerooms_changed[student.homeroom] = None
+
+        # group members are positions in the name index, so they have to be
+        # removed before the students are
+        removed = self.student_set(k for k in old_students if k not in new_students)  # type: ignore
+        for group_key in self.groups:  # type: ignore
+            members = self.group_set(group_key)  # type: ignore
+            if members & removed:
+                self.groups[group_key].students = members - removed  # type: ignore
+                report.groups_changed.append(group_key)
+
+        for key, student in old_students.items():
+            if key in new_students:
+                continue
+            del students[key]
+            self._name_index.discard(key)  # type: ignore
+            self._key_index.discard(key)  # type: ignore
+            self._phonetic_index.discard(key)  # type: ignore
+            self._field_index.discard(key, student)  # type: ignore
+            leave_homeroom(student)
+            report.removed.append(key)
+
+        for key, new in new_students.items():
+            student = old_students.get(key)
+            if student is None:
+                students[key] = new
+                self._name_index.add(key)  # type: ignore
+                self._key_index.add(key)  # type: ignore
+                self._phonetic_index.add(key)  # type: ignore
+                self._field_index.add(key, new)  # type: ignore
+                join_homeroom(new)
+                report.added.append(key)
+                continue
+            changed = [
+                f for f in STUDENT_FIELDS if getattr(student, f) != getattr(new, f)
+            ]
+            if not changed:
+                continue
+            self._field_index.discard(key, student)  # type: ignore
+            if "homeroom" in changed:
+                leave_homeroom(student)
+            for f in changed:
+                setattr(student, f, getattr(new, f))
+            if "homeroom" in changed:
+                join_homeroom(student)
+            self._field_index.add(key, student)  # type: ignore
+            report.updated.append(key)
+
+        for teacher in list(homerooms_changed):
+            if teacher in homerooms and not homerooms[teacher].students:
+                del homerooms[teacher]
+                report.homerooms_removed.append(teacher)
+                del homerooms_changed[teacher]
+        report.homerooms_changed = list(homerooms_changed)
+
+        rows: Dict[str, List[dict]] = {}
+        with self._read_guardians(guardian_data, ingest) as linked:
+            for student, context in linked:
+                rows.setdefault(student.name, []).append(context)
+            for key, student in students.items():
+                if self._refresh_guardians(student, rows.get(key, [])):
+                    if key not in report.added:
+                        report.guardians_updated.append(key)
+        self.ingest_report = ingest
+
+        self.source_hashes = {  # type: ignore
+            path.name: _cache.file_sha256(path)
+            for path in (student_data, guardian_data)
+        }
+
+        if write:
+            reader = vars(self).get("_cache")
+            if reader is None:
+                self.write_cache()  # type: ignore
+            else:
+                # make sure that the guardian index is current before it is
+                # stored
+                self.guardian_index  # type: ignore
+                _cache.update(self, reader, report)
+        return report
+
+    @staticmethod
+    def _refresh_guardians(student: Student, contexts: List[dict]) -> bool:
+        """Make *student*'s guardians match their rows in parents.csv, reusing
+        the existing `ParentGuardian` of the same name where there is one.
+        Returns whether anything changed."""
+        # as in new_school_year, the last primary contact row wins
+        primary = None
+        for i, context in enumerate(contexts):
+            if context["primary_contact"]:
+                primary = i
+        current_primary = next(
+            (
+                i
+                for i, g in enumerate(student.guardians)
+                if g is student.primary_contact
+            ),
+            None,
+        )
+        current = [
+            (g.name, [getattr(g, f) for f in GUARDIAN_FIELDS])
+            for g in student.guardians
+        ]
+        new = [ParentGuardian(context) for context in contexts]
+        if primary == current_primary and current == [
+            (g.name, [getattr(g, f) for f in GUARDIAN_FIELDS]) for g in new
+        ]:
+            return False
+
+        existing = {}
+        for g in student.guardians:
+            existing.setdefault(g.name, []).append(g)
+        guardians = []
+        for g in new:
+            if existing.get(g.name):
+                reused = existing[g.name].pop(0)
+                for f in GUARDIAN_FIELDS:
+                    setattr(reused, f, getattr(g, f))
+                g = reused
+            guardians.append(g)
+        student.guardians = guardians
+        student.primary_contact = None if primary is None else guardians[primary]
+        return True
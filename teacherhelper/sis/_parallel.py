@@ -0,0 +1,82 @@
+"""Fuzzy name scoring sharded across a process pool, for rosters that are big
+enough that a single core is the bottleneck. See `Sis.enable_parallel`."""
+
+import os
+from typing import Dict, List, Sequence, Tuple, Union
+
+from ._index import score
+
+# lists of processed names, keyed by label; populated in each worker process
+# by `_init_worker` when the pool starts
+_worker_names: Dict[str, List[Union[str, None]]] = {}
+
+
+def _init_worker(names: Dict[str, List[Union[str, None]]]):
+    global _worker_names
+    _worker_names = names
+
+
+def _score_shard(
+    label: str, processed_query: str, positions: Sequence[int]
+) -> Tuple[Union[int, None], int]:
+    """Return the position and score of the best name in this shard. Like
+    `process.extractOne`, the first of several equally good names wins."""
+    names = _worker_names[label]
+    best = None
+    best_score = -1
+    for i in positions:
+        candidate_score = score(processed_query, names[i])  # type: ignore
+        if candidate_score > best_score:
+            best, best_score = i, candidate_score
+    return best, best_score
+
+
+class ShardedScorer:
+    """Process pool whose workers each hold a copy of the processed names, so
+    that only the query and the positions to score are sent with each task.
+
+    Positions are split into contiguous, ascending shards, and the best match
+    from each shard is merged by taking the highest score and, amongst equal
+    scores, the lowest position. That is the same name that a serial scan
+    would pick.
+    """
+
+    def __init__(
+        self, names: Dict[str, List[Union[str, None]]], workers: Union[int, None]
+    ):
+        # imported here, like in `_ingest.read_export`, so that importing
+        # `teacherhelper.sis` doesn't import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(names,),
+        )
+
+    def best_match(
+        self, label: str, processed_query: str, positions: Sequence[int]
+    ) -> Tuple[Union[int, None], int]:
+        if not positions:
+            return None, -1
+        shard_size = -(-len(positions) // self.workers)
+        futures = [
+            self._pool.submit(
+                _score_shard,
+                label,
+                processed_query,
+                positions[i : i + shard_size],
+            )
+            for i in range(0, len(positions), shard_size)
+        ]
+        best = None
+        best_score = -1
+        for future in futures:
+            position, shard_score = future.result()
+            if position is not None and shard_score > best_score:
+                best, best_score = position, shard_score
+        return best, best_score
+
+    def shutdown(self):
+        self._pool.shutdown()
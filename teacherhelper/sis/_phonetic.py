@@ -0,0 +1,108 @@
+"""Phonetic keys for names, so that names which sound alike but are spelled
+differently ("Katelyn" and "Caitlin") can be found without fuzzy scoring.
+See `metaphone` and `_index.PhoneticIndex`."""
+
+from ._normalize import fold
+
+_VOWELS = frozenset("AEIOU")
+# softening vowels after C and G
+_FRONT = frozenset("EIY")
+# initial letter pairs which are pronounced as their second letter
+_SILENT_FIRST = ("AE", "GN", "KN", "PN", "WR")
+
+
+def metaphone(word: str) -> str:
+    """Metaphone key of a single word, after Lawrence Philips' original rules:
+    vowels are dropped except at the start, doubled letters count once, and
+    consonants which sound alike share a code (C and K, PH and F, TH is "0",
+    SH and CH are "X", and so on). Accents are folded away and anything
+    other than a letter is ignored."""
+    w = "".join(c for c in fold(word).upper() if "A" <= c <= "Z")
+    if not w:
+        return ""
+    if w[:2] in _SILENT_FIRST:
+        w = w[1:]
+    elif w[0] == "X":
+        w = "S" + w[1:]
+    elif w[:2] == "WH":
+        w = "W" + w[2:]
+
+    def at(i: int) -> str:
+        return w[i] if 0 <= i < len(w) else ""
+
+    key = []
+    for i, c in enumerate(w):
+        prev, following = at(i - 1), at(i + 1)
+        if c == prev and c != "C":
+            continue
+        if c in _VOWELS:
+            if i == 0:
+                key.append(c)
+        elif c == "B":
+            # silent in a final "MB", as in "Lamb"
+            if not (prev == "M" and i == len(w) - 1):
+                key.append("B")
+        elif c == "C":
+            if following == "I" and at(i + 2) == "A":
+                key.append("X")
+            elif following == "H":
+                key.append("K" if prev == "S" else "X")
+            elif following in _FRONT:
+                if prev != "S":
+                    key.append("S")
+            else:
+                key.append("K")
+        elif c == "D":
+            key.append("J" if following == "G" and at(i + 2) in _FRONT else "T")
+        elif c == "G":
+            if following == "H" and not (i + 2 == len(w) or at(i + 2) in _VOWELS):
+                continue
+            if following == "N" and (i + 2 == len(w) or w[i + 1 :] == "NED"):
+                continue
+            if prev == "D" and following in _FRONT:
+                continue
+            key.append("J" if following in _FRONT and prev != "G" else "K")
+        elif c == "H":
+            if prev in ("C", "S", "P", "T", "G"):
+                continue
+            if prev in _VOWELS and following not in _VOWELS:
+                continue
+            key.append("H")
+        elif c == "K":
+            if prev != "C":
+                key.append("K")
+        elif c == "P":
+            key.append("F" if following == "H" else "P")
+        elif c == "Q":
+            key.append("K")
+        elif c == "S":
+            if following == "H" or (following == "I" and at(i + 2) in ("O", "A")):
+                key.append("X")
+            else:
+                key.append("S")
+        elif c == "T":
+            if following == "I" and at(i + 2) in ("O", "A"):
+                key.append("X")
+            elif following == "H":
+                key.append("0")
+            elif not (following == "C" and at(i + 2) == "H"):
+                key.append("T")
+        elif c == "V":
+            key.append("F")
+        elif c in ("W", "Y"):
+            if following in _VOWELS:
+                key.append(c)
+        elif c == "X":
+            key.append("KS")
+        elif c == "Z":
+            key.append("S")
+        else:
+            key.append(c)
+    return "".join(key)
+
+
+def phonetic_key(normalized_name: str) -> str:
+    """Metaphone keys of each word of a name which has already been
+    normalized (see `_normalize.NameNormalizer`), separated by spaces. Words
+    without a key are left out."""
+    return " ".join(k for k in map(metaphone, normalized_name.split()) if k)
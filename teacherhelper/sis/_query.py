@@ -0,0 +1,224 @@
+"""Filter expressions over the entities of a `Sis`, which use its indexes
+where they can. See `Sis.query`."""
+
+from dataclasses import dataclass
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
+
+from ._entities import Group, Homeroom, ParentGuardian, Student
+
+# plural names for explain()
+_NOUNS = {
+    Student: "students",
+    ParentGuardian: "guardians",
+    Homeroom: "homerooms",
+    Group: "groups",
+}
+
+
+@dataclass(frozen=True)
+class Filter:
+    """A single criterion. *path* is the chain of attributes to follow from
+    the entity, e.g. `("student", "grade_level")` for a guardian, and *op* is
+    "eq" or "in"."""
+
+    path: Tuple[str, ...]
+    op: str
+    value: object
+
+    @classmethod
+    def parse(cls, expression: str, value) -> "Filter":
+        """Parse a keyword argument to `Query.where`: `grade_level=6`,
+        `homeroom__in=[...]` or `student__grade_level=6`."""
+        *path, last = expression.split("__")
+        if last == "in" and path:
+            return cls(tuple(path), "in", tuple(value))
+        return cls(tuple(path) + (last,), "eq", value)
+
+    def resolve(self, obj):
+        for attr in self.path:
+            if obj is None:
+                return None
+            obj = getattr(obj, attr, None)
+        return obj
+
+    def matches(self, obj) -> bool:
+        value = self.resolve(obj)
+        if self.op == "in":
+            return value in self.value  # type: ignore
+        return value == self.value
+
+    def values(self) -> Sequence:
+        return self.value if self.op == "in" else (self.value,)  # type: ignore
+
+    def __str__(self):
+        return (
+            f"{'.'.join(self.path)} {'==' if self.op == 'eq' else 'in'} {self.value!r}"
+        )
+
+
+@dataclass
+class Plan:
+    """How a query will be answered. *index* is the filter which was looked
+    up in an index, or None for a full scan, and *candidates* is the number
+    of entities it leaves (students, for a guardian query). *residual*
+    holds the filters which are checked against each candidate."""
+
+    entity: type
+    index: Union[Filter, None]
+    candidates: int
+    rows: Callable[[], Iterator]
+    residual: List[Filter]
+
+    def __str__(self):
+        noun = _NOUNS[Student if self.entity is ParentGuardian else self.entity]
+        access = "full scan" if self.index is None else f"index on {self.index}"
+        lines = [
+            f"{self.entity.__name__} query",
+            f"  {access}: {self.candidates} {noun}",
+        ]
+        lines += [f"  filter: {f}" for f in self.residual]
+        return "\n".join(lines)
+
+
+class Query:
+    """Lazily evaluated query over one kind of entity. Build one with
+    `Sis.query`, narrow it down with `where`, and iterate over it (or call
+    `all`, `first` or `count`) to run it.
+
+    Each run is planned afresh: amongst the filters which an index can
+    answer, the one that leaves the fewest candidates is used, and the rest
+    of the filters are checked against each candidate as it is streamed.
+    Queries without any indexed filter scan every entity. `explain` shows
+    the plan."""
+
+    def __init__(self, sis, entity: Type = Student, filters: Iterable[Filter] = ()):
+        if entity not in _NOUNS:
+            raise ValueError(f"cannot query {entity!r}")
+        self.sis = sis
+        self.entity = entity
+        self.filters = tuple(filters)
+
+    def where(self, **criteria) -> "Query":
+        """Return a new query which also has to match *criteria*. Each
+        keyword is an attribute (`allow_contact=True`), optionally followed
+        by `__in` to match any of several values (`homeroom__in=[...]`).
+        Attributes of related entities are reached with `__`, like
+        `student__grade_level=6` on a guardian query."""
+        return Query(
+            self.sis,
+            self.entity,
+            self.filters
+            + tuple(Filter.parse(key, value) for key, value in criteria.items()),
+        )
+
+    def __iter__(self) -> Iterator:
+        plan = self.plan()
+        for obj in plan.rows():
+            if all(f.matches(obj) for f in plan.residual):
+                yield obj
+
+    def all(self) -> list:
+        return list(self)
+
+    def first(self):
+        return next(iter(self), None)
+
+    def count(self) -> int:
+        return sum(1 for _ in self)
+
+    def explain(self) -> str:
+        return str(self.plan())
+
+    def plan(self) -> Plan:
+        best: Union[Tuple[List[str], Filter], None] = None
+        for f in self.filters:
+            lookup = self._index_for(f)
+            if lookup is None:
+                continue
+            keys = lookup()
+            if best is None or len(keys) < len(best[0]):
+                best = (keys, f)
+
+        if best is None:
+            return Plan(
+                self.entity,
+                None,
+                len(self._collection()),
+                self._scan,
+                list(self.filters),
+            )
+        keys, used = best
+        return Plan(
+            self.entity,
+            used,
+            len(keys),
+            lambda: self._from_keys(keys),
+            # an index can be looser than its filter (email lookups ignore
+            # case), so the indexed filter is checked again too
+            list(self.filters),
+        )
+
+    def _collection(self):
+        if self.entity in (Student, ParentGuardian):
+            return self.sis.students
+        return self.sis.homerooms if self.entity is Homeroom else self.sis.groups
+
+    def _scan(self) -> Iterator:
+        if self.entity is ParentGuardian:
+            for st in self.sis.students.values():
+                yield from st.guardians
+        else:
+            yield from self._collection().values()
+
+    def _from_keys(self, keys: List[str]) -> Iterator:
+        collection = self._collection()
+        for key in keys:
+            obj = collection[key]
+            if self.entity is ParentGuardian:
+                yield from obj.guardians
+            else:
+                yield obj
+
+    def _index_for(self, f: Filter) -> Union[Callable[[], List[str]], None]:
+        """A function returning the keys of the students (or homerooms) which
+        can match *f*, if an index can answer it."""
+        path = f.path
+        if self.entity is ParentGuardian:
+            if path[:1] != ("student",):
+                return None
+            path = path[1:]
+        elif self.entity is not Student:
+            if self.entity is Homeroom and path == ("teacher",):
+                homerooms = self.sis.homerooms
+                return lambda: [v for v in f.values() if v in homerooms]
+            return None
+        if len(path) != 1:
+            return None
+
+        (attr,) = path
+        students = self.sis.students
+        index = self.sis._field_index
+        if attr == "name":
+            return lambda: [v for v in f.values() if v in students]
+        # empty values aren't indexed
+        if attr in index.UNIQUE and all(f.values()):
+
+            def unique():
+                keys = (index.get(attr, v) for v in f.values())
+                return list(dict.fromkeys(k for k in keys if k is not None))
+
+            return unique
+        if attr in index.GROUPED and all(v is not None for v in f.values()):
+            return lambda: list(
+                dict.fromkeys(k for v in f.values() for k in index.group(attr, v))
+            )
+        return None
@@ -0,0 +1,181 @@
+"""Resident lookup server, which `th --serve` runs so that `th -s` and `th -p`
+don't have to start up and read the cache for every lookup. See
+`LookupServer`, and `teacherhelper._daemon` for the client side.
+"""
+
+import json
+import logging
+import os
+import pickle
+import socket
+import socketserver
+import sqlite3
+import threading
+from time import perf_counter
+from typing import Hashable, Union
+
+from teacherhelper._daemon import socket_path
+from teacherhelper._data_dir import get_data_dir
+from . import _cache
+from ._sis import Sis
+
+logger = logging.getLogger(__name__)
+
+# what requests can ask to find, and the `Sis` methods which find it
+FINDERS = {"student": "find_student", "parent": "find_parent"}
+# keyword arguments which requests can pass on to those methods
+OPTIONS = ("threshold",)
+
+# version of the cache before the first load
+_NOT_LOADED = object()
+
+# what reading a cache which is missing, unreadable, corrupt or only half
+# written can raise
+LOAD_ERRORS = (
+    ValueError,
+    OSError,
+    EOFError,
+    sqlite3.DatabaseError,
+    pickle.UnpicklingError,
+)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    # seconds to wait for a client which has connected but not sent anything
+    timeout = 5
+
+    def handle(self):
+        for line in self.rfile:
+            try:
+                reply = self.server.lookups.answer(json.loads(line))
+            except Exception as e:
+                logger.exception("could not answer %r", line)
+                reply = {"error": f"fatal: {e}"}
+            self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+
+class LookupServer:
+    """Keep a `Sis` read from the cache in memory, and answer lookups over a
+    Unix domain socket at `$HELPER_DATA/th.sock`.
+
+    Requests and replies are JSON objects, one per line. A request names what
+    to find and the name to look for, along with an optional threshold, like
+    `{"find": "student", "name": "tommey", "threshold": 60}`. The reply is
+    either `{"result": ...}`, with the match as `th` prints it, or
+    `{"error": ...}`.
+
+    Before each request, and every *poll_interval* seconds while it is idle,
+    the server checks whether the cache has been replaced (by `th --new`,
+    `th --refresh` or `th --watch`) and loads the new one if so, so lookups
+    always see the latest cache. Lookups are answered one at a time, with the
+    lookup cache enabled (see `Sis.enable_lookup_cache`)."""
+
+    def __init__(self, poll_interval: float = 1.0):
+        self.path = socket_path()
+        self.cache = _cache.cache_path(get_data_dir())
+        self.poll_interval = poll_interval
+        self.sis: Union[Sis, None] = None
+        # reply to lookups while there is no `sis`
+        self.error = "fatal: cache does not exist"
+        self._version: Hashable = _NOT_LOADED
+
+    def _cache_version(self) -> Hashable:
+        # the cache is replaced rather than changed when it is written, so
+        # a new version is a new file
+        try:
+            st = os.stat(self.cache)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def reload(self) -> bool:
+        """Load the cache if it has changed since it was last loaded, and
+        return whether it had. A cache which can't be read is logged, and
+        the cache which was loaded before is kept; if there isn't one,
+        lookups are answered with the error until the cache changes again."""
+        version = self._cache_version()
+        if version == self._version:
+            return False
+        self._version = version
+        start = perf_counter()
+        sis = None
+        try:
+            if not Sis.cache_exists():
+                raise ValueError("fatal: cache does not exist")
+            sis = Sis.read_cache()
+            # load everything now rather than during the first few lookups
+            if "_cache" in vars(sis):
+                for name in _cache.INDEXES:
+                    getattr(sis, name)
+            sis.students.values()
+            sis.guardian_index
+        except LOAD_ERRORS as e:
+            if sis is not None and "_cache" in vars(sis):
+                sis._cache.close()
+            self.error = str(e) or type(e).__name__
+            logger.warning("could not load the cache: %s", self.error)
+            if self.sis is not None:
+                logger.warning("answering lookups from the cache loaded before")
+            return True
+        sis.enable_lookup_cache()
+        old, self.sis = self.sis, sis
+        if old is not None and "_cache" in vars(old):
+            old._cache.close()
+        logger.info("loaded the cache in %.2fs", perf_counter() - start)
+        return True
+
+    def answer(self, message: dict) -> dict:
+        """Reply to one request."""
+        self.reload()
+        method = FINDERS.get(message.get("find"))
+        name = message.get("name")
+        if method is None or not isinstance(name, str):
+            return {"error": f"fatal: not a lookup: {message!r}"}
+        if self.sis is None:
+            return {"error": self.error}
+        options = {k: message[k] for k in OPTIONS if k in message}
+        return {"result": str(getattr(self.sis, method)(name, **options))}
+
+    def _claim_socket(self):
+        """Remove a socket left behind by a server which didn't shut down
+        cleanly, unless a server is still listening on it."""
+        if not self.path.exists():
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(str(self.path))
+            except ConnectionRefusedError:
+                self.path.unlink()
+                return
+        raise ValueError(f"fatal: a lookup server is already running at {self.path}")
+
+    def run(
+        self,
+        stop: Union[threading.Event, None] = None,
+        ready: Union[threading.Event, None] = None,
+    ):
+        """Load the cache and answer lookups until *stop* is set (or forever,
+        if there isn't one). *ready* is set once the server is listening."""
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError("fatal: --serve needs Unix domain sockets")
+        self.reload()
+        self._claim_socket()
+        # the roster is only for the user who runs the server, so the socket
+        # is created without permissions for anyone else
+        umask = os.umask(0o077)
+        try:
+            server = socketserver.UnixStreamServer(str(self.path), _Handler)
+        finally:
+            os.umask(umask)
+        server.lookups = self  # type: ignore
+        server.timeout = self.poll_interval
+        logger.info("answering lookups on %s", self.path)
+        if ready is not None:
+            ready.set()
+        try:
+            while stop is None or not stop.is_set():
+                server.handle_request()
+                self.reload()
+        finally:
+            server.server_close()
+            self.path.unlink(missing_ok=True)
@@ -0,0 +1,143 @@
+"""Sets of students stored as bitsets. See `Sis.student_set`."""
+
+from typing import Iterable, Iterator, List, Mapping, Union
+
+from ._entities import Student
+from ._index import TrigramIndex
+
+
+def encode(positions: Iterable[int]) -> int:
+    """Bitset with the bits at *positions* set. The bits are gathered in a
+    bytearray and converted once, rather than or-ing each bit into an int,
+    which would copy the whole int every time."""
+    buf = bytearray()
+    for position in positions:
+        byte = position >> 3
+        if byte >= len(buf):
+            buf.extend(bytes(byte - len(buf) + 1))
+        buf[byte] |= 1 << (position & 7)
+    return int.from_bytes(buf, "little")
+
+
+def decode(bits: int) -> Iterator[int]:
+    """Positions of the set bits, in ascending order."""
+    for byte_index, byte in enumerate(to_bytes(bits)):
+        while byte:
+            low = byte & -byte
+            yield (byte_index << 3) + low.bit_length() - 1
+            byte ^= low
+
+
+def to_bytes(bits: int) -> bytes:
+    return bits.to_bytes((bits.bit_length() + 7) // 8, "little")
+
+
+class StudentSet:
+    """Immutable set of students, stored as an int used as a bitset. Bit `i`
+    is set when the student at position `i` of the `Sis` name index is a
+    member. Positions are stable: they are never reused when students are
+    removed, so a set stays valid as the roster changes.
+
+    Sets support `|`, `&`, `-` and `^`, which work on whole machine words at
+    a time, as well as `len`, `in` (with a student or a name) and iteration,
+    which yields students in roster order. Combining sets built against
+    different name indexes (e.g. before and after `Sis.reindex`) works, but
+    goes through the students' names.
+    """
+
+    __slots__ = ("students", "index", "bits")
+
+    def __init__(
+        self, students: Mapping[str, Student], index: TrigramIndex, bits: int = 0
+    ):
+        self.students = students
+        self.index = index
+        self.bits = bits
+
+    @classmethod
+    def of(
+        cls,
+        students: Mapping[str, Student],
+        index: TrigramIndex,
+        members: Iterable[Union[Student, str]],
+    ) -> "StudentSet":
+        """The set of *members*, which can be students or their names."""
+        positions = []
+        for member in members:
+            name = member if isinstance(member, str) else member.name
+            position = index.position(name)
+            if position is None:
+                raise KeyError(name)
+            positions.append(position)
+        return cls(students, index, encode(positions))
+
+    def names(self) -> List[str]:
+        names = self.index.names
+        return [names[i] for i in decode(self.bits) if names[i] is not None]  # type: ignore
+
+    def rebase(self, index: TrigramIndex) -> "StudentSet":
+        """The same students, as positions in *index*. Students which aren't
+        in *index* are left out."""
+        if index is self.index:
+            return self
+        return StudentSet(
+            self.students,
+            index,
+            encode(p for p in map(index.position, self.names()) if p is not None),
+        )
+
+    def _other(self, other) -> Union[int, None]:
+        if not isinstance(other, StudentSet):
+            return None
+        return other.rebase(self.index).bits
+
+    def __or__(self, other):
+        bits = self._other(other)
+        if bits is None:
+            return NotImplemented
+        return StudentSet(self.students, self.index, self.bits | bits)
+
+    def __and__(self, other):
+        bits = self._other(other)
+        if bits is None:
+            return NotImplemented
+        return StudentSet(self.students, self.index, self.bits & bits)
+
+    def __sub__(self, other):
+        bits = self._other(other)
+        if bits is None:
+            return NotImplemented
+        return StudentSet(self.students, self.index, self.bits & ~bits)
+
+    def __xor__(self, other):
+        bits = self._other(other)
+        if bits is None:
+            return NotImplemented
+        return StudentSet(self.students, self.index, self.bits ^ bits)
+
+    def __eq__(self, other):
+        bits = self._other(other)
+        if bits is None:
+            return NotImplemented
+        return self.bits == bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __iter__(self) -> Iterator[Student]:
+        for name in self.names():
+            yield self.students[name]
+
+    def __len__(self):
+        return bin(self.bits).count("1")
+
+    def __bool__(self):
+        return bool(self.bits)
+
+    def __contains__(self, member):
+        name = member if isinstance(member, str) else getattr(member, "name", None)
+        position = self.index.position(name)  # type: ignore
+        return position is not None and bool(self.bits >> position & 1)
+
+    def __repr__(self):
+        return f"<{type(self).__name__} of {len(self)} students>"
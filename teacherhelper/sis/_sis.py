@@ -1,19 +1,79 @@
 import os
 import dbm
+import heapq
 import shelve
-from typing import Union, cast, Dict
+from time import perf_counter
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
 from datetime import datetime
 
-from fuzzywuzzy import process
-
 from .._data_dir import get_data_dir
-from ._entities import Group, Homeroom, ParentGuardian, Student
+from . import _cache
+from ._entities import (
+    Group,
+    Homeroom,
+    ParentGuardian,
+    Student,
+    guardian_generation,
+)
+from ._index import (
+    FieldIndex,
+    GuardianIndex,
+    NameKeyIndex,
+    PhoneticIndex,
+    PrefixTrie,
+    ScoreBound,
+    TrigramIndex,
+    process_name,
+    top_k,
+)
 from ._oncourse_mixin import OnCourseMixin
+from ._memo import LookupCache
+from ._parallel import ShardedScorer
+from ._query import Query
+from ._sets import StudentSet
+from ._stats import FastPathStats, LookupCacheStats, LookupStats
+
+if TYPE_CHECKING:
+    from ._columnar import RosterColumns
 
 
 class Sis(OnCourseMixin):
     """Student information system."""
 
+    # see `enable_parallel`; these are never pickled
+    _parallel_options: Union[Dict[str, Union[int, None]], None] = None
+    _sharded: Union[ShardedScorer, None] = None
+    _sharded_for: tuple = ()
+
+    # see `columns`; also never pickled
+    _columns = None
+    _columns_for: tuple = ()
+
+    # see `fast_path_stats`; never pickled
+    _fast_path_stats: Union[FastPathStats, None] = None
+
+    # see `enable_lookup_cache`; never pickled
+    _lookup_cache: Union[LookupCache, None] = None
+
+    # see `complete`; never pickled
+    _prefix_tries: Dict[str, PrefixTrie] = {}
+    _prefix_tries_for: tuple = ()
+
+    # names of the csv files that the roster was built from, mapped to their
+    # hashes; see `new_school_year` and `cache_is_stale`
+    source_hashes: Dict[str, str] = {}
+
     def __init__(
         self,
         homerooms: Dict[str, Homeroom],
@@ -24,11 +84,466 @@ class Sis(OnCourseMixin):
         self.students = students
         self.groups = groups
         self.cache_dir = os.path.join(__file__, "cache")
+        self.reindex()
+
+    def __getattr__(self, name):
+        # the indexes of an instance read from the cache are loaded the first
+        # time that they are needed
+        reader = self.__dict__.get("_cache")
+        if reader is not None and name in _cache.INDEXES:
+            value = reader.blob(name)
+            if name == "_guardian_index":
+                # guardians may have changed since the cache was opened
+                value.generation = reader.generation
+            setattr(self, name, value)
+            return value
+        raise AttributeError(
+            f"{type(self).__name__!r} object has no attribute {name!r}"
+        )
+
+    def __getstate__(self):
+        # load any indexes which haven't been loaded from the cache yet, so
+        # that they are pickled along with everything else
+        if "_cache" in self.__dict__:
+            for name in _cache.INDEXES:
+                getattr(self, name)
+        state = self.__dict__.copy()
+        for attr in (
+            "_parallel_options",
+            "_sharded",
+            "_sharded_for",
+            "_columns",
+            "_columns_for",
+            "_fast_path_stats",
+            "_lookup_cache",
+            "_prefix_tries",
+            "_prefix_tries_for",
+            "ingest_report",
+            "_cache",
+        ):
+            state.pop(attr, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # caches written before the indexes existed need them built on load
+        if any(attr not in state for attr in _cache.INDEXES):
+            self.reindex()
+        # the guardian index was current when the cache was written, but the
+        # generation counter it was stamped with belongs to another process
+        self._guardian_index.generation = guardian_generation()
+
+    def reindex(self):
+        """Rebuild the lookup indexes. This needs to be called after mutating
+        `self.students` directly."""
+        key_index = getattr(self, "_key_index", None)
+        self._name_index = TrigramIndex(self.students)
+        self._key_index = NameKeyIndex(
+            self.students, key_index.normalize.nicknames if key_index else None
+        )
+        self._phonetic_index = PhoneticIndex(self.students)
+        self._guardian_index = GuardianIndex(self.students)
+        self._field_index = FieldIndex(self.students)
+
+    def normalize_name(self, name: str) -> str:
+        """Return the key which *name* is looked up by on the fast path of
+        `find_student`; see `_normalize.NameNormalizer`."""
+        return self._key_index.normalize(name)
+
+    def set_nicknames(self, nicknames: Dict[str, str]):
+        """Use a table of nicknames (mapped to the names they are short for,
+        e.g. `{"Bob": "Robert"}`) when normalizing first names."""
+        self._key_index = NameKeyIndex(self.students, nicknames)
+
+    @property
+    def fast_path_stats(self) -> FastPathStats:
+        """Counts of how student lookups have been answered since this
+        instance was created or loaded."""
+        if self._fast_path_stats is None:
+            self._fast_path_stats = FastPathStats()
+        return self._fast_path_stats
+
+    def _fast_path(self, student_name: str) -> Tuple[Union[Student, None], str]:
+        """Look *student_name* up without any fuzzy matching, returning the
+        student (or None) and "exact" or "normalized" to say how it was
+        found."""
+        if st := self.students.get(student_name.title()):
+            self.fast_path_stats.exact += 1
+            return st, "exact"
+        key = self._key_index.get(student_name)
+        if key is not None:
+            self.fast_path_stats.normalized += 1
+            return self.students[key], "normalized"
+        return None, ""
+
+    @property
+    def guardian_index(self) -> GuardianIndex:
+        """Index of guardian names, rebuilt if any student's guardians have
+        changed since it was last built."""
+        if self._guardian_index.is_stale:
+            self._guardian_index = GuardianIndex(self.students)
+        return self._guardian_index
+
+    def by_email(self, email: str) -> Union[Student, None]:
+        """Return the student with this email address, ignoring case."""
+        return self._student(self._field_index.get("email", email))
+
+    def by_student_id(self, student_id) -> Union[Student, None]:
+        return self._student(self._field_index.get("student_id", student_id))
+
+    def in_grade(self, grade_level: int) -> List[Student]:
+        """Return all of the students in a grade level."""
+        keys = self._field_index.group("grade_level", grade_level)
+        return [self.students[key] for key in keys]
+
+    def in_homeroom(self, teacher: str) -> List[Student]:
+        """Return all of the students whose homeroom teacher is *teacher*."""
+        keys = self._field_index.group("homeroom", teacher)
+        return [self.students[key] for key in keys]
+
+    def _student(self, key: Union[str, None]) -> Union[Student, None]:
+        return None if key is None else self.students[key]
+
+    def student_set(self, students: Iterable[Union[Student, str]] = ()) -> StudentSet:
+        """Return a `StudentSet` of *students*, which can be students or
+        their names. Raises KeyError for anyone who isn't in `students`."""
+        return StudentSet.of(self.students, self._name_index, students)
+
+    def homeroom_set(self, teacher: str) -> StudentSet:
+        return self.student_set(self._field_index.group("homeroom", teacher))
+
+    def grade_set(self, grade_level: int) -> StudentSet:
+        return self.student_set(self._field_index.group("grade_level", grade_level))
+
+    def group_set(self, key: str) -> StudentSet:
+        """Return the members of `self.groups[key]` as a `StudentSet`. A group
+        whose students are still a list (or a set built before the last
+        `reindex`) is converted, and keeps the converted set."""
+        group = self.groups[key]
+        group.students = self._group_members(group)
+        return group.students
+
+    def _group_members(self, group: Group) -> StudentSet:
+        if isinstance(group.students, StudentSet):
+            return group.students.rebase(self._name_index)
+        return self.student_set(group.students)
+
+    def add_group(
+        self,
+        name: str,
+        students: Iterable[Union[Student, str]],
+        grade_level: Union[int, None] = None,
+    ) -> Group:
+        """Add a group called *name* to `self.groups`, with *students* (or
+        student names) as its members."""
+        group = self.groups[name] = Group(name, grade_level, self.student_set(students))
+        return group
+
+    def query(self, entity: type = Student) -> Query:
+        """Start a query over `Student`, `ParentGuardian`, `Homeroom` or
+        `Group` entities. For example, the primary contacts who may be
+        contacted, of the sixth graders in one homeroom:
+
+            sis.query(ParentGuardian).where(
+                primary_contact=True,
+                allow_contact=True,
+                student__grade_level=6,
+                student__homeroom="Smith, Jo",
+            )
+
+        See `Query` for the filters which are supported."""
+        return Query(self, entity)
+
+    def columns(self, rebuild=False) -> "RosterColumns":
+        """Return a `RosterColumns` view of the roster, for running filters
+        and counts over every student or guardian at once. It is built on
+        the first call and reused until students are added or removed, their
+        indexed fields change, or guardians are added, removed or made the
+        primary contact. Pass *rebuild=True* after changing other
+        attributes, such as `allow_contact`, yourself.
+
+        This needs NumPy (`pip install teacherhelper[columns]`)."""
+        from ._columnar import RosterColumns
+
+        current = (
+            self._name_index,
+            self._name_index.version,
+            self._field_index,
+            self._field_index.version,
+            guardian_generation(),
+        )
+        if rebuild or self._columns is None or current != self._columns_for:
+            self._columns = RosterColumns(self.students)
+            self._columns_for = current
+        return self._columns
+
+    def enable_parallel(self, workers: Union[int, None] = None, crossover=2000):
+        """Score fuzzy lookups on a pool of *workers* processes (one per CPU
+        by default) whenever there are at least *crossover* names to score.
+        Below that, sending work to the pool costs more than it saves, and
+        names are scored in this process as usual.
+
+        Each worker is sent the processed roster once, when the pool starts.
+        The same pool is reused until the roster changes or
+        `disable_parallel` is called. Results are identical to serial
+        scoring."""
+        self.disable_parallel()
+        self._parallel_options = {"workers": workers, "crossover": crossover}
+
+    def enable_lookup_cache(self, maxsize: int = 1024):
+        """Remember the results of up to *maxsize* calls to `find_student`
+        and `find_parent`, keyed on the name and threshold, evicting the
+        least recently used. The cache is emptied whenever students or
+        guardians are added or removed, or the nickname table changes; see
+        `lookup_cache_stats` for hit and miss counts."""
+        self._lookup_cache = LookupCache(maxsize)
+
+    def disable_lookup_cache(self):
+        self._lookup_cache = None
+
+    @property
+    def lookup_cache_stats(self) -> Union[LookupCacheStats, None]:
+        """Statistics of the lookup cache, or None if it isn't enabled."""
+        return None if self._lookup_cache is None else self._lookup_cache.stats
+
+    def complete(
+        self,
+        prefix: str,
+        kind: Union[str, None] = None,
+        limit: Union[int, None] = 20,
+    ) -> List[str]:
+        """Complete a student or guardian name as it is typed, returning up to
+        *limit* names with a first, middle or last name starting with
+        *prefix*. Case, accents and punctuation are ignored, and a trailing
+        space ends the last name typed; "jo" completes "John Smith" and "Amy
+        Jones", but "jo " completes neither. Pass *kind* "student" or
+        "parent" to complete only one kind of name, and *limit=None* for
+        all of them.
+
+        Completions come from a prefix trie of the names (see
+        `_index.PrefixTrie`), which is built on the first call and reused
+        until students or guardians are added or removed. Each call after
+        that takes microseconds, however big the roster, and calls with a
+        prefix extending the previous one search only the names which
+        completed it."""
+        if kind not in (None, "student", "parent"):
+            raise ValueError(f"can't complete {kind!r} names")
+        if limit is not None and limit <= 0:
+            return []
+        tries = self._prefix_tries_current()
+        processed = PrefixTrie.process_prefix(prefix)
+        matches = heapq.merge(
+            *(
+                trie.iter_complete(processed)
+                for trie_kind, trie in tries.items()
+                if kind in (None, trie_kind)
+            )
+        )
+        # a name may match more than one of its tokens, and be both a
+        # student's and a guardian's
+        names: Dict[str, None] = {}
+        for _, name in matches:
+            names[name] = None
+            if limit is not None and len(names) >= limit:
+                break
+        return list(names)
+
+    def _prefix_tries_current(self) -> Dict[str, PrefixTrie]:
+        guardian_index = self.guardian_index
+        current = (self._name_index, self._name_index.version, guardian_index)
+        if current != self._prefix_tries_for:
+            self._prefix_tries = {
+                "student": PrefixTrie(
+                    self._name_index.names, self._name_index.processed
+                ),
+                "parent": PrefixTrie(
+                    guardian_index.all_names, guardian_index.all_processed
+                ),
+            }
+            self._prefix_tries_for = current
+        return self._prefix_tries
+
+    def _roster_state(self) -> tuple:
+        """Changes whenever the result of a lookup could change."""
+        return (
+            self._name_index,
+            self._name_index.version,
+            self._key_index,
+            guardian_generation(),
+        )
+
+    def _memoized(
+        self, kind: str, name: str, threshold: int, lookup: Callable[[str, int], Any]
+    ):
+        """Return `lookup(name, threshold)`, through the lookup cache if it
+        is enabled."""
+        cache = self._lookup_cache
+        if cache is None:
+            return lookup(name, threshold)
+        state = self._roster_state()
+        key = (kind, name, threshold)
+        found, result = cache.get(state, key)
+        if not found:
+            result = lookup(name, threshold)
+            cache.put(state, key, result)
+        return result
+
+    def disable_parallel(self):
+        if self._sharded is not None:
+            self._sharded.shutdown()
+        self._sharded = None
+        self._sharded_for = ()
+        self._parallel_options = None
+
+    def _use_parallel(self, n_choices: int) -> bool:
+        return self._parallel_options is not None and n_choices >= cast(
+            int, self._parallel_options["crossover"]
+        )
+
+    def _sharded_scorer(self) -> ShardedScorer:
+        """Return the process pool, restarting it if the names it holds are
+        out of date."""
+        guardian_index = self.guardian_index
+        current = (self._name_index, self._name_index.version, guardian_index)
+        if self._sharded is None or current != self._sharded_for:
+            if self._sharded is not None:
+                self._sharded.shutdown()
+            self._sharded = ShardedScorer(
+                {
+                    "students": self._name_index.processed,
+                    "primary": guardian_index.primary_processed,
+                    "all": guardian_index.all_processed,
+                },
+                workers=cast(dict, self._parallel_options)["workers"],
+            )
+            self._sharded_for = current
+        return self._sharded
+
+    def _best_parent(
+        self, parent_name: str, label: str, threshold: int, sounds_like: List[str]
+    ) -> Union[Tuple[str, int], None]:
+        """`GuardianIndex.best`, on the process pool if it's worth it."""
+        index = self.guardian_index
+        processed = process_name(parent_name)
+        names, processed_names = index.names(label)
+        if not self._use_parallel(len(names)):
+            return index.best(label, processed, threshold, sounds_like)
+        positions = index.positions(label)
+        best = self._best_on_pool(
+            label,
+            processed,
+            processed_names,  # type: ignore
+            [],
+            threshold,
+            profiles=index.profiles(label),  # type: ignore
+            preferred=[positions[name] for name in sounds_like if name in positions],
+        )
+        if best is not None:
+            return names[best[0]], best[1]
+        return None
+
+    def _best_on_pool(
+        self,
+        label: str,
+        processed_query: str,
+        processed_choices: List[Union[str, None]],
+        first: List[int],
+        threshold: int,
+        rest_may_share_token: bool = True,
+        profiles: Union[List[Union[Tuple[int, int, int], None]], None] = None,
+        preferred: List[int] = [],
+    ) -> Union[Tuple[int, int], None]:
+        """The position and score of the best of *processed_choices* which
+        clears *threshold*, like `best_scores`, but scored on the process
+        pool: the positions in *preferred* (which win ties), then those in
+        *first*, and then the rest of the choices which their `ScoreBound`
+        says could beat or tie with the best of those."""
+        # (score, preferred, -position) of the best so far
+        best: Union[Tuple[int, bool, int], None] = None
+        for position, score in top_k(
+            processed_query, processed_choices, preferred, 1, threshold
+        ):
+            best = (score, True, -position)
+
+        def merge(position: Union[int, None], score: int):
+            nonlocal best
+            if position is not None and (
+                best is None or (score, False, -position) > best
+            ):
+                best = (score, False, -position)
+
+        scorer = self._sharded_scorer()
+        done = set(preferred)
+        merge(
+            *scorer.best_match(
+                label, processed_query, [i for i in first if i not in done]
+            )
+        )
+        done.update(first)
+        bound = ScoreBound(processed_query)
+        needed = max(threshold, best[0] if best else 0)
+        rest = [
+            i
+            for i, choice in enumerate(processed_choices)
+            if i not in done
+            and choice is not None
+            and bound.estimate(
+                choice, rest_may_share_token, profiles[i] if profiles else None
+            )
+            >= needed
+            and bound(choice, rest_may_share_token) >= needed
+        ]
+        if rest:
+            merge(*scorer.best_match(label, processed_query, rest))
+        if best is None or best[0] < threshold:
+            return None
+        return -best[2], best[0]
+
+    def _best_student(
+        self, student_name: str, threshold: int
+    ) -> Union[Tuple[str, int, bool], None]:
+        """The best matching student name, its score and whether it sounds
+        like the query, if it clears *threshold*: the name that
+        `process.extractOne` would find amongst every student, except that
+        the names which sound like the query win ties. Those names are scored
+        first, then the names which share a trigram with the query, and the
+        rest only if they could beat them. Counted in `fast_path_stats`."""
+        processed = process_name(student_name)
+        index = self._name_index
+        sounds_like = [
+            position
+            for name in self._phonetic_index.get(student_name)
+            if (position := index.position(name)) is not None
+        ]
+        positions = index.candidate_positions(processed)
+        if self._use_parallel(len(positions)):
+            best = self._best_on_pool(
+                "students",
+                processed,
+                index.processed,
+                positions,
+                threshold,
+                False,
+                index.profiles,
+                sounds_like,
+            )
+        else:
+            best = next(iter(index.best(processed, 1, threshold, sounds_like)), None)
+        if best is None:
+            self.fast_path_stats.fuzzy += 1
+            return None
+        phonetic = best[0] in sounds_like
+        if phonetic:
+            self.fast_path_stats.phonetic += 1
+        else:
+            self.fast_path_stats.fuzzy += 1
+        return index.names[best[0]], best[1], phonetic  # type: ignore
 
     def write_cache(self):
-        with shelve.open(os.path.join(get_data_dir(), "cache"), "c") as db:
-            db["data"] = self
-            db["date"] = datetime.now()
+        """Write this instance to $HELPER_DATA/cache.sqlite3"""
+        # make sure that the guardian index is current before it is stored
+        self.guardian_index
+        _cache.write(self, _cache.cache_path(get_data_dir()))
 
     def find_student(
         self, student_name: str, threshold: int = 90
@@ -38,16 +553,122 @@ class Sis(OnCourseMixin):
         threshold below which students will not be included."""
         if not isinstance(student_name, str):
             raise Exception("Student name must be a string")
+        return self._memoized("student", student_name, threshold, self._find_student)
 
-        # direct match
-        if st := self.students.get(student_name.title()):
+    def _find_student(self, student_name: str, threshold: int) -> Union[Student, None]:
+        # direct match, or a match once accents, name order and so on are
+        # normalized away
+        if st := self._fast_path(student_name)[0]:
             return st
 
-        # get nearest match
-        if result := process.extractOne(student_name, self.students.keys()):
-            closest_name, confidence = result[0], result[1]
-            if confidence >= threshold:
-                return self.students[closest_name]
+        # get nearest match, scoring the names which sound like the query and
+        # then those which share a trigram with it first, and the rest of the
+        # roster only if it could beat them
+        if result := self._best_student(student_name, threshold):
+            return self.students[result[0]]
+        return None
+
+    def find_students(
+        self,
+        student_names: Iterable[str],
+        threshold: int = 90,
+        stats: Optional[LookupStats] = None,
+    ) -> List[Union[Student, None]]:
+        """Resolve many names at once, returning a list of results in the same
+        order as *student_names*. Each result is what `find_student` would
+        return for that name, but roster names are only processed for fuzzy
+        scoring once (when they are indexed) rather than on every lookup, and
+        repeated names are only resolved once.
+
+        Pass a `LookupStats` instance as *stats* to collect timings and
+        hit/miss counts."""
+        student_names = list(student_names)
+        if stats is None:
+            stats = LookupStats()
+        resolved: Dict[str, Union[Student, None]] = {}
+        start = perf_counter()
+        for name in student_names:
+            stats.queries += 1
+            if name in resolved:
+                stats.duplicates += 1
+                continue
+            if not isinstance(name, str):
+                raise Exception("Student name must be a string")
+
+            name_start = perf_counter()
+            st, path = self._fast_path(name)
+            if path == "exact":
+                stats.exact_hits += 1
+            elif path == "normalized":
+                stats.normalized_hits += 1
+            elif result := self._best_student(name, threshold):
+                st = self.students[result[0]]
+                if result[2]:
+                    stats.phonetic_hits += 1
+                else:
+                    stats.fuzzy_hits += 1
+            else:
+                stats.misses += 1
+            resolved[name] = st
+            stats.timings[name] = perf_counter() - name_start
+
+        stats.total_seconds += perf_counter() - start
+        return [resolved[name] for name in student_names]
+
+    def rank_students(
+        self, student_name: str, k: int = 5, threshold: int = 0
+    ) -> List[Tuple[Student, int]]:
+        """Return up to *k* `(student, score)` pairs for the students that best
+        match *student_name*, best first, leaving out any which score below
+        *threshold*. The first pair is the student that `find_student` would
+        return (if it clears the threshold), and the rest can be offered as
+        "did you mean" suggestions.
+
+        Like `find_student`, the students whose names share a trigram with
+        the query are scored first, and the rest only if they could make the
+        best *k*."""
+        if not isinstance(student_name, str):
+            raise Exception("Student name must be a string")
+        if k < 1:
+            return []
+        processed = process_name(student_name)
+        index = self._name_index
+        # amongst equal scores, names which sound like the query come first
+        sounds_like = [
+            position
+            for name in self._phonetic_index.get(student_name)
+            if (position := index.position(name)) is not None
+        ]
+        ranked = index.best(processed, k, threshold, sounds_like)
+        ranked_students = [(self.students[index.names[p]], s) for p, s in ranked]  # type: ignore
+
+        # an exact match always comes first, as it does in find_student
+        exact = self.students.get(student_name.title())
+        if exact is None and (key := self._key_index.get(student_name)):
+            exact = self.students[key]
+        if exact is not None:
+            others = [pair for pair in ranked_students if pair[0] is not exact]
+            ranked_students = [(exact, 100)] + others[: k - 1]
+        return ranked_students
+
+    def rank_parents(
+        self, parent_name: str, k: int = 5, threshold: int = 0
+    ) -> List[Tuple[ParentGuardian, int]]:
+        """Return up to *k* `(guardian, score)` pairs for the parents and
+        guardians that best match *parent_name*, best first, leaving out any
+        which score below *threshold*."""
+        index = self.guardian_index
+        ranked = top_k(
+            process_name(parent_name),
+            index.all_processed,
+            range(len(index.all_names)),
+            k,
+            threshold,
+        )
+        return [
+            (index.resolve(self.students, index.all[index.all_names[p]]), s)  # type: ignore
+            for p, s in ranked
+        ]
 
     def find_parent(
         self, parent_name: str, threshold: int = 70
@@ -55,61 +676,103 @@ class Sis(OnCourseMixin):
         """Return a parent matching the given name, preferentially searching
         amongst primary contacts. May return `None` if there is not a close
         match."""
-        # build mapping of parent name to string so we can perform a fuzzy
-        # search. Make separate collections of all_guardians and
-        # primary_guardians so we can prefer to match primaries
-        all_guardians = {}
-        primary_guardians = {}
-        for st in self.students.values():
-            for g in st.guardians:
-                all_guardians.setdefault(g.name, g)
-                if g.primary_contact:
-                    primary_guardians.setdefault(g.name, g)
-            primary_contact = cast(ParentGuardian, st.primary_contact)
-            if primary_contact is not None:
-                primary_guardians.setdefault(primary_contact.name, primary_contact)
-            # insert the other guardians only if there is no primary
-            else:
-                for g in st.guardians:
-                    all_guardians.setdefault(g.name, g)
+        return self._memoized("parent", parent_name, threshold, self._find_parent)
+
+    def _find_parent(
+        self, parent_name: str, threshold: int
+    ) -> Union[ParentGuardian, None]:
+        index = self.guardian_index
+        sounds_like = index.phonetic.get(parent_name) if index.phonetic else []
 
-        # prefer match amongst primary contacts
-        primary_match = process.extractOne(
-            parent_name, [g.name for g in primary_guardians.values()]
+        # prefer match amongst primary contacts, and search all parents and
+        # guardians otherwise; names which sound like parent_name win ties
+        for label, locators in (("primary", index.primary), ("all", index.all)):
+            match = self._best_parent(parent_name, label, threshold + 1, sounds_like)
+            if match:
+                if mo := index.resolve(self.students, locators.get(match[0])):
+                    return mo
+        return None
+
+    @classmethod
+    def read_cache(cls, check_date=True):
+        """Return the Sis instance cached in $HELPER_DATA. Students, homerooms
+        and groups are loaded from the cache as they are accessed."""
+        reader = _cache.CacheReader.open(_cache.cache_path(get_data_dir()))
+        if reader is None:
+            return cls._read_legacy_cache(check_date)
+        header = reader.header
+        if not header.is_compatible:
+            reader.close()
+            raise ValueError(
+                "cache was written by an incompatible version of teacherhelper; "
+                "run `th --new` to rebuild it"
+            )
+        if check_date and cls._is_out_of_date(header.written_at):
+            reader.close()
+            raise ValueError("cache is out of date")
+
+        self = cls.__new__(cls)
+        self._cache = reader
+        self.students = reader.students()
+        self.homerooms = reader.collection(
+            "homerooms", self.students, lambda: self._name_index
+        )
+        self.groups = reader.collection(
+            "groups", self.students, lambda: self._name_index
         )
-        if primary_match and primary_match[1] > threshold:
-            if mo := primary_guardians.get(primary_match[0]):
-                return mo
+        self.cache_dir = os.path.join(__file__, "cache")
+        self.link_report = reader.blob("link_report")
+        self.source_hashes = header.source_hashes
+        return self
+
+    @staticmethod
+    def read_cache_header() -> Union[_cache.CacheHeader, None]:
+        """Return the header of the cache in $HELPER_DATA, without reading
+        anything else from it, or None if there is no cache."""
+        return _cache.read_header(_cache.cache_path(get_data_dir()))
 
-        # search all parents and guardians otherwise
-        name_match = process.extractOne(
-            parent_name, [g.name for g in all_guardians.values()]
+    @classmethod
+    def cache_is_stale(cls) -> bool:
+        """True if the cache is missing, was written by an incompatible
+        version, looks like it's from last school year, or if students.csv or
+        parents.csv have changed since it was written. Only the cache header
+        is read."""
+        header = cls.read_cache_header()
+        if header is None:
+            return True
+        return (
+            not header.is_compatible
+            or cls._is_out_of_date(header.written_at)
+            or bool(header.changed_sources(get_data_dir()))
         )
-        if (
-            name_match
-            and name_match[1] > threshold
-            and (mo := all_guardians.get(name_match[0]))
-        ):
-            return mo
 
     @classmethod
-    def read_cache(cls, check_date=True):
-        """Return the pickled Sis instance from $HELPER_DATA/cache"""
-        if not cls.cache_exists():
+    def _read_legacy_cache(cls, check_date=True):
+        """Return the pickled Sis instance from $HELPER_DATA/cache, which is
+        where caches were written before the SQLite cache existed."""
+        if not cls._legacy_cache_exists():
             raise IOError("cache does not exist")
         with shelve.open(os.path.join(get_data_dir(), "cache"), "r") as db:
             cls = cast(cls, db["data"])
             date: datetime = cast(datetime, db["date"])
 
-        if check_date and (
-            datetime.now().month in range(9, 12) and date.month in range(1, 7)
-        ):
+        if check_date and cls._is_out_of_date(date):
             raise ValueError("cache is out of date")
         return cls
 
+    @staticmethod
+    def _is_out_of_date(date: datetime) -> bool:
+        """Heuristic that a cache from last spring is being used in the fall."""
+        return datetime.now().month in range(9, 12) and date.month in range(1, 7)
+
     @staticmethod
     def cache_exists():
-        """Check for existence of the cache at $HELPER_DATA/cache"""
+        """Check for existence of the cache at $HELPER_DATA/cache.sqlite3, or
+        a cache in the older format at $HELPER_DATA/cache"""
+        return Sis.read_cache_header() is not None or Sis._legacy_cache_exists()
+
+    @staticmethod
+    def _legacy_cache_exists():
         try:
             sh = shelve.open(os.path.join(get_data_dir(), "cache"), "r")
             sh.close()
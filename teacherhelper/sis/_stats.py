@@ -0,0 +1,191 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Dict, Iterator, List, Tuple, Union
+
+
+@dataclass
+class LookupStats:
+    """Hit/miss counts and timings collected by the batch lookup methods of
+    `Sis`. Pass an instance in through the `stats` argument, and it will be
+    filled in as names are resolved.
+
+    `timings` maps each distinct query to the number of seconds it took to
+    resolve. Repeated queries are only resolved once, and are counted in
+    `duplicates`."""
+
+    queries: int = 0
+    duplicates: int = 0
+    exact_hits: int = 0
+    normalized_hits: int = 0
+    phonetic_hits: int = 0
+    fuzzy_hits: int = 0
+    misses: int = 0
+    total_seconds: float = 0.0
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def hits(self) -> int:
+        return (
+            self.exact_hits
+            + self.normalized_hits
+            + self.phonetic_hits
+            + self.fuzzy_hits
+        )
+
+    def slowest(self, n: int = 10):
+        """The *n* slowest queries, as (query, seconds) pairs."""
+        return sorted(self.timings.items(), key=lambda i: i[1], reverse=True)[:n]
+
+
+@dataclass
+class FastPathStats:
+    """How the student lookups of a `Sis` have been answered: by an exact
+    match on the title cased name, by a match on the normalized name (see
+    `Sis.normalize_name`), by a fuzzy match whose name sounds the same, or
+    by any other fuzzy match, or not at all. See `Sis.fast_path_stats`."""
+
+    exact: int = 0
+    normalized: int = 0
+    phonetic: int = 0
+    fuzzy: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.exact + self.normalized + self.phonetic + self.fuzzy
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of lookups which didn't fall through to `fuzzy`."""
+        if not self.lookups:
+            return 0.0
+        return (self.lookups - self.fuzzy) / self.lookups
+
+
+@dataclass
+class LookupCacheStats:
+    """Counts kept by the lookup cache of a `Sis`; see
+    `Sis.enable_lookup_cache`. `invalidations` counts the times that the
+    cache was emptied because the roster changed."""
+
+    maxsize: int
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclass
+class LinkReport:
+    """Guardian rows from parents.csv whose student could not be found by a
+    match on their normalized name during `Sis.new_school_year`, and so were
+    resolved with a fuzzy search instead.
+
+    Each item of `fallback_rows` is a `(line number, student name in the
+    row, name of the matched student or None)` tuple. A row is only linked
+    if its match has the same normalized name (which happens when several
+    students share it). The rest are left out: `unmatched_rows` matched no
+    student, and `rejected_rows` matched a student by another name, so may
+    well be for a student who isn't on the roster."""
+
+    fallback_rows: List[Tuple[int, str, Union[str, None]]] = field(default_factory=list)
+    rejected_rows: List[Tuple[int, str, Union[str, None]]] = field(default_factory=list)
+
+    def __setstate__(self, state):
+        # reports pickled before rejected_rows existed didn't reject any
+        self.__dict__.update({"rejected_rows": [], **state})
+
+    @property
+    def unmatched_rows(self) -> List[Tuple[int, str, Union[str, None]]]:
+        return [row for row in self.fallback_rows if row[2] is None]
+
+
+@dataclass
+class IngestPhase:
+    name: str
+    rows: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class IngestReport:
+    """Timings of the phases of the last `Sis.new_school_year` or
+    `Sis.refresh`: parsing students.csv, parsing parents.csv, and linking
+    guardians to their students. *workers* is the number of processes which
+    rows could be parsed on."""
+
+    workers: int
+    phases: List[IngestPhase] = field(default_factory=list)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[IngestPhase]:
+        """Time the body of a `with` block as a phase called *name*. Set
+        `rows` on the phase that it yields."""
+        phase = IngestPhase(name)
+        start = perf_counter()
+        try:
+            yield phase
+        finally:
+            phase.seconds = perf_counter() - start
+            self.phases.append(phase)
+
+    def __str__(self):
+        return "\n".join(
+            f"{p.name}: {p.rows} rows in {p.seconds:.2f}s "
+            f"({p.rows_per_second:,.0f} rows/s)"
+            for p in self.phases
+        )
+
+
+@dataclass
+class RefreshReport:
+    """What `Sis.refresh` changed. Students are identified by their key in
+    `Sis.students`, and homerooms by their teacher.
+
+    - `added`, `removed` and `updated`: students which were new, which were
+      no longer in students.csv, and whose fields changed
+    - `guardians_updated`: existing students whose guardians or primary
+      contact changed
+    - `homerooms_added` and `homerooms_removed`: homerooms which gained their
+      first student or lost their last one
+    - `homerooms_changed` and `groups_changed`: homerooms and groups which
+      gained or lost students"""
+
+    added: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    updated: List[str] = field(default_factory=list)
+    guardians_updated: List[str] = field(default_factory=list)
+    homerooms_added: List[str] = field(default_factory=list)
+    homerooms_removed: List[str] = field(default_factory=list)
+    homerooms_changed: List[str] = field(default_factory=list)
+    groups_changed: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return any(
+            (
+                self.added,
+                self.removed,
+                self.updated,
+                self.guardians_updated,
+                self.homerooms_removed,
+                self.groups_changed,
+            )
+        )
+
+    def __str__(self):
+        return (
+            f"{len(self.added)} added, {len(self.removed)} removed, "
+            f"{len(self.updated)} updated, {len(self.guardians_updated)} with "
+            "changed guardians"
+        )
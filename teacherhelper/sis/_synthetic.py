@@ -0,0 +1,151 @@
+"""Synthetic rosters of any size, in the format of the `students.csv` and
+`parents.csv` exports, for trying out and benchmarking the library without
+real student data. See `synthetic_roster` and `write_synthetic_exports`."""
+
+import csv
+from importlib import resources
+from pathlib import Path
+import random
+from typing import Iterator, List, Sequence, Tuple, Union
+
+STUDENT_HEADER = [
+    "First Name",
+    "Last Name",
+    "Grade Level",
+    "Homeroom Teacher",
+    "Email Address 1",
+    "Birth Date",
+    "Student ID",
+]
+GUARDIAN_HEADER = [
+    "Guardian First Name",
+    "Guardian Last Name",
+    "Student First Name",
+    "Student Last Name",
+    "Primary Contact",
+    "Guardian Email Address 1",
+    "Guardian Mobile Phone",
+    "Guardian Phone",
+    "Guardian Work Phone",
+    "Comments",
+    "Allow Contact",
+    "Student Resides With",
+    "Relation to Student",
+]
+RELATIONSHIPS = ("Mother", "Father", "Other", "Grandmother", "Grandfather")
+
+# students per homeroom
+HOMEROOM_SIZE = 25
+
+
+def _names() -> Tuple[List[str], List[str]]:
+    """The first and last names in the list of random names which the test
+    fixtures are made from, which is shipped with the package."""
+    with resources.open_text("teacherhelper.sis", "random_names.csv") as fp:
+        names = list(csv.reader(fp))
+    return sorted({n[0] for n in names}), sorted({n[1] for n in names})
+
+
+def _student_rows(students: int, rng: random.Random) -> List[List[str]]:
+    firsts, lasts = _names()
+    if students > len(firsts) * len(lasts) // 2:
+        raise ValueError(f"can't make {students} students with distinct names")
+    taken = set()
+
+    def new_name() -> Tuple[str, str]:
+        while True:
+            name = rng.choice(firsts), rng.choice(lasts)
+            if name not in taken:
+                taken.add(name)
+                return name
+
+    # teachers don't share a name with any student
+    teachers = []
+    for _ in range(max(1, -(-students // HOMEROOM_SIZE))):
+        first, last = new_name()
+        teachers.append((f"{last}, {first}", rng.randint(4, 7)))
+
+    rows = []
+    for i in range(students):
+        first, last = new_name()
+        teacher, grade = teachers[i % len(teachers)]
+        rows.append(
+            [
+                first,
+                last,
+                f"{grade}th Grade",
+                teacher,
+                f"{first}.{last}{i}@example.org".lower(),
+                f"{rng.randint(1, 12)}/{rng.randint(1, 28)}/{2016 - grade}",
+                str(100000 + i),
+            ]
+        )
+    return rows
+
+
+def _guardian_rows(
+    students: Sequence[List[str]], guardians: Tuple[int, int], rng: random.Random
+) -> Iterator[List[str]]:
+    firsts, lasts = _names()
+    for student in students:
+        for i in range(rng.randint(*guardians)):
+            first = rng.choice(firsts)
+            # most guardians share the student's last name
+            last = student[1] if rng.random() < 0.7 else rng.choice(lasts)
+            yield [
+                first,
+                last,
+                student[0],
+                student[1],
+                "Y" if i == 0 else "N",
+                f"{first}.{last}@example.com".lower(),
+                str(rng.randint(9730000000, 9739999999)),
+                str(rng.randint(9730000000, 9739999999)) if rng.random() < 0.3 else "",
+                "",
+                "",
+                rng.choice("YN"),
+                rng.choice("YN"),
+                rng.choice(RELATIONSHIPS),
+            ]
+
+
+def synthetic_roster(
+    students: int, guardians: Tuple[int, int] = (1, 4), seed: int = 0
+) -> Tuple[List[List[str]], List[List[str]]]:
+    """Return the rows of a `students.csv` and a `parents.csv` export, each
+    starting with its header, for *students* students with between
+    `guardians[0]` and `guardians[1]` guardians each.
+
+    Names are drawn from the same list as the test fixtures. Students have
+    distinct names, and are put in homerooms of 25, with teachers who don't
+    share a name with a student; each homeroom is in one grade from 4th to
+    7th. The first guardian of each student is their primary contact. The
+    same *seed* always gives the same roster."""
+    rng = random.Random(seed)
+    student_rows = _student_rows(students, rng)
+    return (
+        [STUDENT_HEADER] + student_rows,
+        [GUARDIAN_HEADER] + list(_guardian_rows(student_rows, guardians, rng)),
+    )
+
+
+def write_synthetic_exports(
+    data_dir: Union[str, Path],
+    students: int,
+    guardians: Tuple[int, int] = (1, 4),
+    seed: int = 0,
+):
+    """Write the exports of a `synthetic_roster` to `students.csv` and
+    `parents.csv` in *data_dir*, ready for `Sis.new_school_year`. Guardian
+    rows are written as they are made, so big rosters don't have to fit in
+    memory twice."""
+    rng = random.Random(seed)
+    student_rows = _student_rows(students, rng)
+    with open(Path(data_dir, "students.csv"), "w", newline="") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(STUDENT_HEADER)
+        writer.writerows(student_rows)
+    with open(Path(data_dir, "parents.csv"), "w", newline="") as fp:
+        writer = csv.writer(fp)
+        writer.writerow(GUARDIAN_HEADER)
+        writer.writerows(_guardian_rows(student_rows, guardians, rng))
@@ -0,0 +1,151 @@
+"""Keep the cache in the data directory up to date with the csv exports next to
+it. See `CacheWatcher`, which `th --watch` runs.
+
+Watching needs watchdog, which is an optional dependency:
+`pip install teacherhelper[watch]`.
+"""
+
+import logging
+from pathlib import Path
+import threading
+from time import perf_counter
+from typing import Callable, Dict, Union
+
+from teacherhelper._data_dir import get_data_dir
+from . import _cache
+from ._ingest import EXPORT_SUFFIXES
+from ._oncourse_mixin import _source_paths
+from ._sis import Sis
+from ._stats import RefreshReport
+
+logger = logging.getLogger(__name__)
+
+# files which trigger a rebuild when they change
+WATCHED = frozenset(
+    stem + suffix for stem in ("students", "parents") for suffix in EXPORT_SUFFIXES
+)
+
+
+def _source_hashes() -> Dict[str, str]:
+    return {
+        path.name: _cache.file_sha256(path) for path in _source_paths() if path.exists()
+    }
+
+
+class CacheWatcher:
+    """Rebuild the cache whenever the exports in the data directory change.
+
+    File system events are debounced: a rebuild starts once no watched file
+    has changed for *debounce* seconds, so that an export which is copied in
+    several writes (or both exports being replaced at once) only causes one
+    rebuild. Rebuilds are incremental (see `Sis.refresh`), and the new cache
+    is written to a temporary file which then replaces the old one, so that
+    readers only ever see a complete cache. Events which don't change the
+    contents of an export, such as a `touch`, don't cause a rebuild.
+
+    *on_rebuild* is called with the `RefreshReport` of each rebuild, or None
+    when the cache was built from scratch."""
+
+    def __init__(
+        self,
+        debounce: float = 2.0,
+        on_rebuild: Union[Callable[[Union[RefreshReport, None]], None], None] = None,
+    ):
+        self.data_dir = Path(get_data_dir()).resolve()
+        self.debounce = debounce
+        self.on_rebuild = on_rebuild
+        self.sis: Union[Sis, None] = None
+        # guards the timer; rebuilds are serialized by `_rebuilding`
+        self._lock = threading.Lock()
+        self._rebuilding = threading.Lock()
+        self._timer: Union[threading.Timer, None] = None
+
+    def on_change(self, path: Union[str, Path]):
+        """Note that *path* changed, (re)starting the debounce timer if it is
+        one of the watched files."""
+        path = Path(path)
+        if path.name not in WATCHED or path.parent.resolve() != self.data_dir:
+            return
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self.rebuild)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def rebuild(self):
+        """Bring the cache up to date with the exports, if they have changed
+        since it was written. Exports which can't be read (because they are
+        still being written, say) are logged, and the cache is left alone
+        until the next change."""
+        with self._lock:
+            self._timer = None
+        with self._rebuilding:
+            start = perf_counter()
+            try:
+                if self._is_current():
+                    return
+                report = self._rebuild()
+            except Exception:
+                logger.exception("could not rebuild the cache; keeping the old one")
+                return
+            logger.info(
+                "rebuilt the cache in %.2fs%s",
+                perf_counter() - start,
+                "" if report is None else f": {report}",
+            )
+            if self.on_rebuild is not None:
+                self.on_rebuild(report)
+
+    def _is_current(self) -> bool:
+        if self.sis is None:
+            header = Sis.read_cache_header()
+            if header is None or not header.is_compatible:
+                return False
+            self.sis = Sis.read_cache(check_date=False)
+        return _source_hashes() == self.sis.source_hashes
+
+    def _rebuild(self) -> Union[RefreshReport, None]:
+        if self.sis is None:
+            sis = Sis.new_school_year()
+            sis.write_cache()
+            self.sis = sis
+            return None
+        report = self.sis.refresh(write=False)
+        self.sis.write_cache()
+        # everything was loaded by the refresh, so the connection to the
+        # cache which was just replaced isn't needed any more
+        reader = vars(self.sis).pop("_cache", None)
+        if reader is not None:
+            reader.close()
+        return report
+
+    def run(self, stop: Union[threading.Event, None] = None):
+        """Bring the cache up to date, then watch the data directory until
+        *stop* is set (or forever, if there isn't one)."""
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+
+        watcher = self
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                watcher.on_change(event.src_path)
+                # exports which are written elsewhere and moved into place
+                dest = getattr(event, "dest_path", "")
+                if dest:
+                    watcher.on_change(dest)
+
+        self.rebuild()
+        observer = Observer()
+        observer.schedule(Handler(), str(self.data_dir))
+        observer.start()
+        logger.info("watching %s for new exports", self.data_dir)
+        try:
+            (stop or threading.Event()).wait()
+        finally:
+            observer.stop()
+            observer.join()
+            with self._lock:
+                if self._timer is not None:
+                    self._timer.cancel()
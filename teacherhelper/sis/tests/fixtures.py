@@ -10,7 +10,7 @@ import random
 import pytest
 
 
-with resources.open_text("teacherhelper.sis.tests", "random_names.csv") as fp:
+with resources.open_text("teacherhelper.sis", "random_names.csv") as fp:
     names = [r for r in csv.reader(fp)]
 
 
@@ -0,0 +1,73 @@
+import pytest
+
+from .fixtures import students_csv, parents_csv
+from .test_sis import helper
+
+np = pytest.importorskip("numpy")
+
+
+def test_counts(helper):
+    columns = helper.columns()
+    students = list(helper.students.values())
+    assert len(columns) == len(students)
+    assert columns.n_guardians == sum(len(st.guardians) for st in students)
+
+    by_homeroom = {}
+    for st in students:
+        by_homeroom[st.homeroom] = by_homeroom.get(st.homeroom, 0) + 1
+    assert columns.counts("homeroom") == by_homeroom
+
+    allowed = [g for st in students for g in st.guardians if g.allow_contact]
+    assert columns.counts("allow_contact")[True] == len(allowed)
+    assert columns.guardian_mask(allow_contact=True).mean() == pytest.approx(
+        len(allowed) / columns.n_guardians
+    )
+
+
+def test_filters_map_back_to_entities(helper):
+    columns = helper.columns()
+    teacher = next(iter(helper.homerooms))
+    grade = helper.homerooms[teacher].grade_level
+    guardians = columns.guardian_mask(primary_contact=True, allow_contact=True)
+    mask = columns.student_mask(grade_level=grade, homeroom=[teacher, "Nobody"])
+    mask &= columns.any_guardian(guardians)
+
+    expected = [
+        st
+        for st in helper.students.values()
+        if st.grade_level == grade
+        and st.homeroom == teacher
+        and any(g.primary_contact and g.allow_contact for g in st.guardians)
+    ]
+    assert expected
+    assert columns.students_at(mask) == expected
+    assert columns.guardians_at(guardians) == [
+        g
+        for st in helper.students.values()
+        for g in st.guardians
+        if g.primary_contact and g.allow_contact
+    ]
+
+
+def test_students_without_primary_contact(helper):
+    st = next(iter(helper.students.values()))
+    st.primary_contact = None
+    columns = helper.columns()
+    assert columns.students_at(columns.student_mask(has_primary_contact=False)) == [
+        s for s in helper.students.values() if s.primary_contact is None
+    ]
+
+
+def test_columns_are_cached(helper):
+    columns = helper.columns()
+    assert helper.columns() is columns
+    assert helper.columns(rebuild=True) is not columns
+
+    st = next(iter(helper.students.values()))
+    st.guardians.pop()
+    assert helper.columns().n_guardians == columns.n_guardians - 1
+
+
+def test_unknown_column(helper):
+    with pytest.raises(ValueError):
+        helper.columns().student_mask(email="x@y.z")
@@ -0,0 +1,125 @@
+import copyreg
+import pickle
+
+from .._entities import ParentGuardian, Student
+
+
+class OldPickle:
+    """Pickles like an entity did before it had slots: as a plain dict of its
+    attributes, including the name."""
+
+    def __init__(self, cls, state):
+        self.cls = cls
+        self.state = state
+
+    def __reduce_ex__(self, protocol):
+        return copyreg._reconstructor, (self.cls, object, None), self.state
+
+
+def make_student(**context):
+    context.setdefault("first_name", "Sam")
+    context.setdefault("last_name", "Jones")
+    return Student(context)
+
+
+def make_guardian(student, **context):
+    context.setdefault("first_name", "Pat")
+    context.setdefault("last_name", "Jones")
+    return ParentGuardian({"student": student, **context})
+
+
+def test_entities_have_no_dict_by_default():
+    st = make_student(homeroom="Smith, Jo")
+    g = make_guardian(st)
+    assert vars(st) == {}
+    assert vars(g) == {}
+    assert st.name == "Sam Jones"
+    assert g.name == "Pat Jones"
+
+
+def test_name_follows_first_and_last_name():
+    st = make_student()
+    st.last_name = "Smith"
+    assert st.name == "Sam Smith"
+
+
+def test_assigning_name_sets_first_and_last_name():
+    st = make_student()
+    st.name = "Mary Ann Smith"
+    assert (st.first_name, st.last_name) == ("Mary", "Ann Smith")
+    assert st.name == "Mary Ann Smith"
+    assert vars(st) == {}
+    g = make_guardian(st)
+    g.name = "Pat Smith"
+    assert (g.first_name, g.last_name) == ("Pat", "Smith")
+    assert g.name == "Pat Smith"
+
+
+def test_categorical_fields_are_interned():
+    a = make_student(homeroom="".join(["Smith, ", "Jo"]))
+    b = make_student(homeroom="".join(["Smith", ", Jo"]))
+    assert a.homeroom is b.homeroom
+    g1 = make_guardian(a, relationship_to_student="".join(["Mo", "ther"]))
+    g2 = make_guardian(b, relationship_to_student="".join(["Moth", "er"]))
+    assert g1.relationship_to_student is g2.relationship_to_student
+
+
+def test_other_attributes_still_work():
+    st = make_student()
+    st.nickname = "Sammy"
+    copy = pickle.loads(pickle.dumps(st))
+    assert copy.nickname == "Sammy"
+    assert copy.name == "Sam Jones"
+
+
+def test_pickle_round_trip():
+    st = make_student(email="sam@x.org", homeroom="Smith, Jo", grade_level=6)
+    st.guardians.append(make_guardian(st, primary_contact=True))
+    st.primary_contact = st.guardians[0]
+
+    copy = pickle.loads(pickle.dumps(st))
+    assert copy.__getstate__().keys() == st.__getstate__().keys()
+    assert (copy.email, copy.homeroom, copy.grade_level) == (
+        "sam@x.org",
+        "Smith, Jo",
+        6,
+    )
+    assert copy.primary_contact is copy.guardians[0]
+    assert copy.guardians[0].student is copy
+
+
+def test_unpickle_dict_state():
+    state = {
+        "first_name": "Sam",
+        "last_name": "Jones",
+        "name": "Sam Jones",
+        "student_id": None,
+        "homeroom": "Smith, Jo",
+        "grade_level": 6,
+        "groups": [],
+        "email": "sam@x.org",
+        "guardians": [],
+        "primary_contact": None,
+    }
+    st = pickle.loads(pickle.dumps(OldPickle(Student, state)))
+    assert type(st) is Student
+    assert vars(st) == {}
+    assert st.name == "Sam Jones"
+    assert st.guardians == []
+
+    g = pickle.loads(
+        pickle.dumps(
+            OldPickle(
+                ParentGuardian,
+                {
+                    "student": st,
+                    "first_name": "Pat",
+                    "last_name": "Jones",
+                    "name": "Pat Jones",
+                },
+            )
+        )
+    )
+    assert type(g) is ParentGuardian
+    assert g.name == "Pat Jones"
+    assert g.student.name == "Sam Jones"
@@ -3,7 +3,7 @@ from pathlib import Path
 
 from .fixtures import students_csv, parents_csv
 
-with open(Path(Path(__file__).parent, "random_names.csv"), "r") as csvf:
+with open(Path(Path(__file__).parent.parent, "random_names.csv"), "r") as csvf:
     rd = csv.reader(csvf)
     names = [r for r in rd]
 
@@ -0,0 +1,188 @@
+from bisect import bisect_left
+import csv
+import pickle
+from importlib import resources
+import random
+from unittest.mock import patch
+
+from fuzzywuzzy import process
+
+from .._entities import Student
+from .._index import (
+    FieldIndex,
+    PhoneticIndex,
+    PrefixTrie,
+    ScoreBound,
+    TrigramIndex,
+    process_name,
+    profile,
+    score,
+    trigrams,
+)
+from .._phonetic import metaphone
+
+
+def test_trigrams_pad_tokens():
+    assert trigrams("Al Bo") == {" al", "al ", " bo", "bo "}
+
+
+def test_trigrams_are_case_and_punctuation_insensitive():
+    assert trigrams("O'Neil, Sam") == trigrams("o neil sam")
+
+
+def test_candidates_share_a_trigram():
+    index = TrigramIndex(["Jack Smith", "Jill Jones", "Bob Brown"])
+    assert index.candidates("Jak Smyth") == ["Jack Smith"]
+    assert index.candidates("zzz") == []
+
+
+def test_candidates_keep_insertion_order():
+    names = ["Sam Jones", "Sam Smith", "Sam Brown"]
+    index = TrigramIndex(names)
+    assert index.candidates("Sam") == names
+
+
+def test_discard_keeps_positions():
+    index = TrigramIndex(["Sam Jones", "Sam Smith", "Sam Brown"])
+    index.discard("Sam Smith")
+    index.add("Sam Green")
+    assert "Sam Smith" not in index
+    assert len(index) == 3
+    assert index.candidates("Sam") == ["Sam Jones", "Sam Brown", "Sam Green"]
+
+
+def random_names():
+    with resources.open_text("teacherhelper.sis", "random_names.csv") as fp:
+        return list(dict.fromkeys(" ".join(row) for row in csv.reader(fp)))
+
+
+def typo(name: str, rng: random.Random) -> str:
+    """*name* with a few letters inserted or transposed."""
+    chars = list(name)
+    for _ in range(rng.randint(1, 3)):
+        if rng.random() < 0.5:
+            chars.insert(rng.randrange(len(chars) + 1), rng.choice("aeiourstlnDK"))
+        else:
+            i = rng.randrange(len(chars) - 1)
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+    return "".join(chars)
+
+
+def test_best_finds_names_without_a_shared_trigram():
+    names = random_names()
+    index = TrigramIndex(names)
+    processed = process_name("fDewvn Ray")
+    assert names.index("Devan Roy") not in index.candidate_positions(processed)
+    ((position, best_score),) = index.best(processed, threshold=60)
+    assert (index.names[position], best_score) == ("Devan Roy", 74)
+
+
+def test_best_is_extract_one():
+    names = random_names()[:250]
+    index = TrigramIndex(names)
+    rng = random.Random(0)
+    for name in rng.sample(names, 20):
+        query = typo(name, rng)
+        expected = process.extractOne(query, names)
+        best = index.best(process_name(query), threshold=60)
+        if expected[1] < 60:
+            assert best == []
+        else:
+            assert [(names[p], s) for p, s in best] == [expected]
+
+
+def test_best_prefers_names_on_ties():
+    index = TrigramIndex(["Sam Jonas", "Sam Jonet", "Sam Jones"])
+    processed = process_name("Sam Jonx")
+    assert [p for p, _ in index.best(processed, k=3)] == [0, 1, 2]
+    assert [p for p, _ in index.best(processed, k=3, preferred=[2])] == [2, 0, 1]
+    # but never to a higher score
+    assert index.best(process_name("Sam Jonet"), preferred=[2])[0][0] == 1
+    assert index.best(processed, k=0, preferred=[2]) == []
+
+
+def test_score_bound():
+    rng = random.Random(0)
+    names = random_names()
+    for name in rng.sample(names, 20):
+        query = process_name(typo(name, rng))
+        bound = ScoreBound(query)
+        for choice in map(process_name, rng.sample(names, 50)):
+            assert score(query, choice) <= bound(choice)
+            assert bound(choice) <= bound.estimate(choice, True, profile(choice))
+    # names which share no trigram can still score 90
+    assert not trigrams("ab") & trigrams("xaby")
+    assert score("ab", "xaby") == 90 <= ScoreBound("ab")("xaby", False)
+
+
+def test_profiles_follow_the_names():
+    index = TrigramIndex(["Sam Jones", "Al Brown"])
+    assert index.profiles == [profile("sam jones"), profile("al brown")]
+    index.add("Jo Green")
+    index.discard("Sam Jones")
+    assert index.profiles == [None, profile("al brown"), profile("jo green")]
+    # they are rebuilt rather than stored
+    assert "_profiles" not in pickle.loads(pickle.dumps(index)).__dict__
+
+
+def test_field_index():
+    a = Student(
+        {"first_name": "A", "last_name": "A", "email": "A@x.org", "grade_level": 6}
+    )
+    b = Student(
+        {"first_name": "B", "last_name": "B", "student_id": "7", "grade_level": 6}
+    )
+    index = FieldIndex({"A A": a, "B B": b})
+    assert index.get("email", "a@X.org ") == "A A"
+    assert index.get("student_id", "7") == "B B"
+    assert index.group("grade_level", 6) == ["A A", "B B"]
+    assert index.group("grade_level", 7) == []
+
+    index.discard("A A", a)
+    assert index.get("email", "a@x.org") is None
+    assert index.group("grade_level", 6) == ["B B"]
+
+
+def test_metaphone():
+    assert metaphone("Katelyn") == metaphone("Caitlin") == "KTLN"
+    assert metaphone("Stephen") == metaphone("Steven")
+    assert metaphone("Philip") == metaphone("Filip")
+    assert metaphone("Knight") == metaphone("Night")
+    assert metaphone("Smith") == metaphone("Smyth") == "SM0"
+    assert metaphone("José") == metaphone("Jose")
+    assert metaphone("123") == ""
+
+
+def test_phonetic_index():
+    index = PhoneticIndex(["Katelyn Smith", "Kaitlyn Smyth", "Sam Jones"])
+    assert index.get("Smith, Caitlin") == ["Katelyn Smith", "Kaitlyn Smyth"]
+    assert index.get("Sam Johns") == ["Sam Jones"]
+    assert index.get("123") == []
+    index.discard("Katelyn Smith")
+    assert index.get("Caitlin Smith") == ["Kaitlyn Smyth"]
+
+
+def test_prefix_trie():
+    trie = PrefixTrie(["Sam Jones", "Jo Smith", "Mary-Jo O'Neil", "Zoë Adams"])
+    # in order of the matching token
+    assert trie.complete("jo") == ["Mary-Jo O'Neil", "Jo Smith", "Sam Jones"]
+    assert trie.complete("JO ") == ["Mary-Jo O'Neil", "Jo Smith"]
+    assert trie.complete("jo s") == ["Jo Smith"]
+    assert trie.complete("o'n") == ["Mary-Jo O'Neil"]
+    assert trie.complete("zo") == ["Zoë Adams"]
+    assert trie.complete("x") == []
+    assert len(trie.complete("")) == 4
+    assert trie.complete("", limit=2) == ["Zoë Adams", "Mary-Jo O'Neil"]
+    assert trie.complete("", limit=0) == []
+
+
+def test_prefix_trie_narrows_incrementally():
+    names = [f"{first} {last}" for first in ("Al", "Bo", "Cy") for last in "PQR"]
+    trie = PrefixTrie(names)
+    lo, hi = trie.node("b")
+    assert trie.names[lo:hi] == ["Bo P", "Bo Q", "Bo R"]
+    with patch("teacherhelper.sis._index.bisect_left", wraps=bisect_left) as search:
+        assert trie.node("bo q") == (lo + 1, lo + 2)
+    assert search.call_args_list[0].args[2:] == (lo, hi)
+    # a prefix which doesn't extend the last one searches everything again
+    assert trie.complete("c") == ["Cy P", "Cy Q", "Cy R"]
@@ -0,0 +1,95 @@
+import csv
+import gzip
+import io
+import zipfile
+
+import pytest
+
+from teacherhelper._data_dir import get_data_dir
+from .fixtures import students_csv, parents_csv
+from .test_sis import helper, check_same_roster
+from .._ingest import (
+    clean_guardian_context,
+    find_export,
+    parse_guardians,
+    parse_students,
+    read_export,
+)
+from .._sis import Sis
+
+
+def to_csv(rows) -> str:
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    return buf.getvalue()
+
+
+def test_parallel_matches_serial(tmp_path, parents_csv):
+    path = tmp_path / "parents.csv"
+    path.write_text(to_csv(parents_csv))
+    serial = read_export(path, parse_guardians, workers=1)
+    parallel = read_export(path, parse_guardians, workers=2, chunk_size=7)
+    assert parallel == serial
+    assert len(serial) == len(parents_csv) - 1
+    # line numbers are kept, for the link report
+    assert [line for line, _ in serial] == list(range(2, len(parents_csv) + 1))
+
+
+def test_missing_columns_and_short_rows(tmp_path):
+    path = tmp_path / "students.csv"
+    path.write_text("First Name,Last Name,Grade Level\nSam,Jones,6th Grade\nJo\n")
+    with pytest.raises(KeyError):
+        read_export(path, parse_students)
+    path.write_text("First Name,Last Name,Grade Level\nSam,Jones,6th Grade\n")
+    (context,) = read_export(path, parse_students)
+    assert context["first_name"] == "Sam"
+    assert context["grade_level"] == 6
+    assert context["student_id"] is None
+    assert context["email"] is None
+
+
+def test_clean_guardian_context():
+    context = {
+        "mobile_phone": "(973) 555-1234",
+        "home_phone": "555-1234",
+        "work_phone": "973 555 1234 ext 5678",
+        "comments": "",
+        "primary_contact": "Y",
+        "allow_contact": "N",
+    }
+    clean_guardian_context(context)
+    assert context["mobile_phone"] == 9735551234
+    assert context["home_phone"] == "555-1234"
+    assert context["work_phone"] == "973 555 1234 ext 5678"
+    assert context["comments"] == "\nwork_phone is 973 555 1234 ext 5678"
+    assert (context["primary_contact"], context["allow_contact"]) == (True, False)
+
+
+def test_compressed_exports(helper, students_csv, parents_csv):
+    data_dir = get_data_dir()
+    (data_dir / "students.csv").unlink()
+    (data_dir / "parents.csv").unlink()
+    with gzip.open(data_dir / "students.csv.gz", "wt") as fp:
+        fp.write(to_csv(students_csv))
+    with zipfile.ZipFile(data_dir / "parents.zip", "w") as archive:
+        archive.writestr("export/parents.csv", to_csv(parents_csv))
+
+    assert find_export(data_dir, "students").name == "students.csv.gz"
+    sis = Sis.new_school_year()
+    check_same_roster(sis, helper)
+    assert set(sis.source_hashes) == {"students.csv.gz", "parents.zip"}
+
+
+def test_ingest_report(helper):
+    report = helper.ingest_report
+    assert [p.name for p in report.phases] == [
+        "parse students.csv",
+        "parse parents.csv",
+        "link guardians",
+    ]
+    assert report.phases[0].rows == len(helper.students)
+    assert all(p.rows_per_second > 0 for p in report.phases)
+    assert "rows/s" in str(report)
+
+    helper.refresh(write=False)
+    assert helper.ingest_report is not report
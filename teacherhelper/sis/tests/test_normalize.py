@@ -0,0 +1,34 @@
+from .._index import NameKeyIndex
+from .._normalize import NameNormalizer, fold
+
+
+def test_fold_removes_accents_and_case():
+    assert fold("José") == fold("JOSE") == "jose"
+    assert fold("Zoë Ångström") == "zoe angstrom"
+
+
+def test_last_first_order():
+    normalize = NameNormalizer()
+    assert normalize("Jones, Sam") == normalize("Sam Jones") == "sam jones"
+
+
+def test_separators_and_whitespace():
+    normalize = NameNormalizer()
+    assert normalize("  Mary-Kate   O'Neil ") == "mary kate oneil"
+    assert normalize("J. R. Smith") == normalize("j r smith")
+
+
+def test_nicknames():
+    normalize = NameNormalizer({"bob": "Robert", "Liz": "Elizabeth"})
+    assert normalize("Bob Smith") == normalize("Robert Smith") == "robert smith"
+    assert normalize("Smith, LIZ") == "elizabeth smith"
+    # only the first name is replaced
+    assert normalize("Sam Bob") == "sam bob"
+
+
+def test_key_index_leaves_out_ambiguous_names():
+    index = NameKeyIndex(["Sam Jones", "Jo Smith", "Jo-Smith"])
+    assert index.get("jones, sam") == "Sam Jones"
+    assert index.get("Jo Smith") is None
+    index.discard("Jo-Smith")
+    assert index.get("jo smith") == "Jo Smith"
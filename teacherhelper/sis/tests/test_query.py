@@ -0,0 +1,84 @@
+from .fixtures import students_csv, parents_csv
+from .test_sis import helper
+from .._sis import Sis
+from .._entities import Group, Homeroom, ParentGuardian, Student
+
+
+def test_query_students_uses_most_selective_index(helper):
+    st = next(iter(helper.students.values()))
+    query = helper.query(Student).where(
+        grade_level=st.grade_level, homeroom=st.homeroom, email=st.email
+    )
+    assert query.all() == [st]
+    assert query.plan().index.path == ("email",)
+    assert f"index on email == {st.email!r}: 1 students" in query.explain()
+
+
+def test_query_matches_loops(helper):
+    homeroom = next(iter(helper.homerooms.values()))
+    query = helper.query(ParentGuardian).where(
+        primary_contact=True,
+        allow_contact=True,
+        student__grade_level=homeroom.grade_level,
+        student__homeroom=homeroom.teacher,
+    )
+    expected = [
+        g
+        for st in helper.students.values()
+        for g in st.guardians
+        if g.primary_contact
+        and g.allow_contact
+        and st.grade_level == homeroom.grade_level
+        and st.homeroom == homeroom.teacher
+    ]
+    assert expected
+    assert query.all() == expected
+    assert query.count() == len(expected)
+    assert query.plan().index.path == ("student", "homeroom")
+    assert query.plan().candidates == len(homeroom.students)
+
+
+def test_query_membership(helper):
+    teachers = list(helper.homerooms)[:2]
+    query = helper.query(Student).where(homeroom__in=teachers)
+    assert set(s.name for s in query) == {
+        s.name for t in teachers for s in helper.homerooms[t].students
+    }
+    assert "index on homeroom in" in query.explain()
+    assert helper.query(Student).where(homeroom__in=[]).first() is None
+
+
+def test_query_without_index_scans(helper):
+    query = helper.query(ParentGuardian).where(allow_contact=False)
+    assert query.plan().index is None
+    assert "full scan" in query.explain()
+    assert query.all() == [
+        g
+        for st in helper.students.values()
+        for g in st.guardians
+        if not g.allow_contact
+    ]
+
+
+def test_query_is_lazy(helper):
+    helper.write_cache()
+    cached = Sis.read_cache()
+    st = next(iter(helper.students.values()))
+    query = cached.query(ParentGuardian).where(student__homeroom=st.homeroom)
+    assert query.first().name == st.guardians[0].name
+    assert list(cached.students._loaded) == [st.name]
+
+
+def test_query_unindexed_values(helper):
+    # students without an id aren't in the student id index
+    assert helper.query(Student).where(student_id=None).count() == len(helper.students)
+
+
+def test_query_homerooms_and_groups(helper):
+    teacher = next(iter(helper.homerooms))
+    query = helper.query(Homeroom).where(teacher=teacher)
+    assert query.all() == [helper.homerooms[teacher]]
+    assert "index on teacher" in query.explain()
+
+    helper.groups["band"] = Group("band", 6, [])
+    assert helper.query(Group).where(grade_level=6).all() == [helper.groups["band"]]
@@ -0,0 +1,127 @@
+from contextlib import closing
+import os
+import socket
+import sqlite3
+import stat
+import threading
+
+import pytest
+
+from teacherhelper import _daemon
+from teacherhelper._data_dir import get_data_dir
+from .fixtures import students_csv, parents_csv
+from .test_sis import helper, with_zebras, write_sources
+from .._cache import cache_path
+from .._sis import Sis
+from .._server import LookupServer
+
+
+@pytest.fixture
+def server(helper):
+    server = LookupServer(poll_interval=0.05)
+    stop = threading.Event()
+    ready = threading.Event()
+    thread = threading.Thread(target=server.run, args=(stop, ready), daemon=True)
+    thread.start()
+    assert ready.wait(5)
+    yield server
+    stop.set()
+    thread.join(5)
+    assert not server.path.exists()
+
+
+def test_no_server(helper):
+    assert _daemon.find("student", "anyone") is None
+
+
+def test_server_of_another_user(helper, monkeypatch):
+    class Socket(_daemon.socket.socket):
+        def connect(self, address):
+            raise PermissionError(13, "Permission denied", address)
+
+    monkeypatch.setattr(_daemon.socket, "socket", Socket)
+    assert _daemon.find("student", "anyone") is None
+
+
+def test_server_which_does_not_reply(helper):
+    path = _daemon.socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listening:
+        listening.bind(str(path))
+        # connections are queued, but never accepted
+        listening.listen(1)
+        try:
+            assert _daemon.request({"find": "student", "name": "x"}, 0.1) is None
+        finally:
+            path.unlink()
+
+
+def test_lookups(helper, server):
+    student = list(helper.students.values())[3]
+    assert server.sis is None
+    assert _daemon.request({"find": "student", "name": "x"}) == {
+        "error": "fatal: cache does not exist"
+    }
+
+    helper.write_cache()
+    assert _daemon.find("student", student.name[:-1], threshold=60) == str(student)
+    guardian = student.guardians[0]
+    assert _daemon.find("parent", guardian.name) == str(guardian)
+    assert _daemon.find("student", "Zzyzx Qwerty", threshold=99) == "None"
+    assert server.sis.lookup_cache_stats.misses == 3
+
+    with pytest.raises(ValueError, match="not a lookup"):
+        _daemon.find("teacher", student.name)
+    assert "error" in _daemon.request({"find": "student", "name": None})
+
+
+def test_reloads_replaced_cache(helper, server, students_csv, parents_csv):
+    helper.write_cache()
+    assert _daemon.find("student", "Zed Zebra", threshold=95) == "None"
+
+    write_sources(*with_zebras(students_csv, parents_csv))
+    Sis.read_cache().refresh()
+    zed = Sis.read_cache().students["Zed Zebra"]
+    assert _daemon.find("student", "Zed Zebra", threshold=95) == str(zed)
+
+
+def test_one_server_at_a_time(helper, server):
+    with pytest.raises(ValueError, match="already running"):
+        LookupServer().run()
+    assert server.path.exists()
+
+
+def test_stale_socket(helper):
+    server = LookupServer()
+    server.path.touch()
+    assert _daemon.find("student", "anyone") is None
+    stop = threading.Event()
+    stop.set()
+    server.run(stop)
+    assert not server.path.exists()
+
+
+def test_socket_is_private(helper, server):
+    assert stat.S_IMODE(os.stat(server.path).st_mode) & 0o077 == 0
+
+
+@pytest.mark.parametrize("corrupt", ["garbage", "blob"])
+def test_keeps_cache_when_new_one_is_unreadable(helper, corrupt):
+    student = list(helper.students.values())[3]
+    helper.write_cache()
+    server = LookupServer()
+    assert server.reload()
+    sis = server.sis
+
+    path = cache_path(get_data_dir())
+    if corrupt == "garbage":
+        replacement = path.with_name("garbage")
+        replacement.write_bytes(b"not a database" * 100)
+        os.replace(replacement, path)
+    else:
+        with closing(sqlite3.connect(path)) as db, db:
+            db.execute("UPDATE blobs SET data = x'00' WHERE name = '_name_index'")
+
+    assert server.reload()
+    assert server.sis is sis
+    reply = server.answer({"find": "student", "name": student.name})
+    assert reply == {"result": str(student)}
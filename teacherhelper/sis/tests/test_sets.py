@@ -0,0 +1,87 @@
+from contextlib import closing
+import sqlite3
+
+import pytest
+
+from teacherhelper._data_dir import get_data_dir
+from .fixtures import students_csv, parents_csv
+from .test_sis import helper
+from .._sets import StudentSet, decode, encode
+from .._sis import Sis
+
+
+def test_encode_decode():
+    positions = [0, 3, 7, 8, 64, 1000]
+    assert list(decode(encode(positions))) == positions
+    assert encode([]) == 0
+    assert list(decode(0)) == []
+
+
+def test_set_algebra(helper):
+    students = list(helper.students.values())
+    band = helper.student_set(students[:10])
+    trip = helper.student_set(st.name for st in students[5:15])
+
+    assert list(band - trip) == students[:5]
+    assert list(band & trip) == students[5:10]
+    assert list(band | trip) == students[:15]
+    assert list(band ^ trip) == students[:5] + students[10:15]
+    assert len(band) == 10
+    assert students[0] in band and students[0].name in band
+    assert students[20] not in band
+    assert band == helper.student_set(reversed(students[:10]))
+    assert not helper.student_set()
+
+    with pytest.raises(KeyError):
+        helper.student_set(["Nobody Atall"])
+
+
+def test_homeroom_and_grade_sets(helper):
+    teacher, homeroom = next(iter(helper.homerooms.items()))
+    grade = homeroom.grade_level
+    assert list(helper.homeroom_set(teacher)) == homeroom.students
+    assert list(helper.grade_set(grade) & helper.homeroom_set(teacher)) == [
+        st for st in homeroom.students if st.grade_level == grade
+    ]
+    assert list(helper.grade_set(grade)) == [
+        st for st in helper.students.values() if st.grade_level == grade
+    ]
+
+
+def test_groups(helper):
+    students = list(helper.students.values())
+    band = helper.add_group("band", students[:3], grade_level=6)
+    assert isinstance(band.students, StudentSet)
+    assert list(band.students) == students[:3]
+
+    # groups can still be made with lists; they are converted when needed
+    helper.groups["trip"] = type(band)("trip", 6, students[2:4])
+    assert list(helper.group_set("band") - helper.group_set("trip")) == students[:2]
+    assert isinstance(helper.groups["trip"].students, StudentSet)
+
+
+def test_sets_survive_reindex(helper):
+    students = list(helper.students.values())
+    band = helper.add_group("band", students[:3])
+    helper.reindex()
+    assert list(helper.group_set("band")) == students[:3]
+    assert list(band.students | helper.student_set(students[3:4])) == students[:4]
+
+
+def test_groups_persist_as_bitsets(helper):
+    students = list(helper.students.values())
+    helper.add_group("band", students[:3], grade_level=6)
+    helper.groups["trip"] = type(helper.groups["band"])("trip", 6, students[2:4])
+    helper.write_cache()
+
+    with closing(sqlite3.connect(get_data_dir() / "cache.sqlite3")) as db:
+        members = dict(db.execute("SELECT key, members FROM groups"))
+    assert members["band"] == b"\x07"
+
+    cached = Sis.read_cache()
+    assert [s.name for s in cached.groups["band"].students] == [
+        s.name for s in students[:3]
+    ]
+    assert [s.name for s in cached.group_set("band") - cached.group_set("trip")] == [
+        s.name for s in students[:2]
+    ]
@@ -1,19 +1,29 @@
+from concurrent.futures import ProcessPoolExecutor
 import csv
+import os
+import pickle
 import random
 from typing import cast
 from shutil import rmtree
 import shelve
+import sqlite3
+from contextlib import closing
 import datetime
+import time
 from tempfile import mkdtemp
 from pathlib import Path
 from unittest.mock import patch
 
 import pytest
+from fuzzywuzzy import process
 
 from teacherhelper._data_dir import get_data_dir
 from .fixtures import students_csv, parents_csv
+from .._cache import file_sha256
 from .._sis import Sis
-from .._entities import ParentGuardian
+from .._entities import Group, ParentGuardian, Student
+from .._index import process_name
+from .._stats import LookupStats
 
 
 @pytest.fixture
@@ -68,24 +78,22 @@ def check_helper_equality(a: Sis, b: Sis) -> bool:
 
 def test_write_cache(helper):
     helper.write_cache()
-    cache = get_data_dir() / "cache"
+    cache = get_data_dir() / "cache.sqlite3"
+    assert cache.exists()
 
-    # some file matching this pattern is in the folder. Different platforms
-    # will call it different things
-    assert any("cache" in str(i) for i in get_data_dir().iterdir())
-
-    # the slice is because we need to change `cache.db` to just `cache` at
-    # the end of the path for shelve
-    with shelve.open(str(cache), "r") as db:
-        # `date` points to a datetime object
-        assert isinstance(db["date"], datetime.datetime)
-        date = cast(datetime.datetime, db["date"])
+    with closing(sqlite3.connect(cache)) as db:
+        # the date the cache was written is stored in the meta table
+        (value,) = db.execute("SELECT value FROM meta WHERE key = 'date'").fetchone()
+        date = datetime.datetime.fromisoformat(value)
 
         # `date` is *almost* right now
         assert (datetime.datetime.now() - date).seconds < 1
 
-        cached_helper = cast(Sis, db["data"])
-        check_helper_equality(cached_helper, helper)
+        # every student is in the students table
+        keys = [k for k, in db.execute("SELECT key FROM students ORDER BY ordinal")]
+        assert keys == list(helper.students)
+
+    assert check_helper_equality(Sis.read_cache(), helper)
 
 
 def test_read_cache(helper):
@@ -99,29 +107,23 @@ def test_find_student(helper, random_student):
     changed = list(name)
     changed[3] = "b"
     changed = "".join(changed)
+    scores = {}
 
-    with patch("teacherhelper.sis._sis.process.extractOne") as p:
+    def fake_score(query, choice):
+        assert query == process_name(changed)
+        return scores.get(choice, 0)
 
+    with patch("teacherhelper.sis._index.score", side_effect=fake_score):
         # 89 is below the default threshold of 90
-        p.return_value = name, 89
-        result = helper.find_student(changed)
-        assert p.mock_calls[-1].args[0] == changed
-        assert result is None
+        scores[process_name(name)] = 89
+        assert helper.find_student(changed) is None
 
         # if we lower the threshold, we get a result
-        p.return_value = name, 89
-        result = helper.find_student(changed, threshold=88)
-        assert p.mock_calls[-1].args[0] == changed
-        assert result is random_student
+        assert helper.find_student(changed, threshold=88) is random_student
 
         # if we raise the confidence of the search result, we get a result
-        p.return_value = name, 95
-        result = helper.find_student(changed)
-        assert p.mock_calls[-1].args[0] == changed
-        assert result is random_student
-
-        for call in p.mock_calls:
-            assert call.args[1] == helper.students.keys()
+        scores[process_name(name)] = 95
+        assert helper.find_student(changed) is random_student
 
 
 def test_find_parent(helper, random_parent):
@@ -140,3 +142,670 @@ def test_find_parent(helper, random_parent):
     assert isinstance(result, ParentGuardian)
 
     # TODO: test that primary contacts are preferentially matched
+
+
+def test_find_student_matches_full_scan(helper, random_student):
+    """Narrowing the search with the trigram index gives the same result as
+    scoring the whole roster."""
+    name = random_student.name
+    for i in range(len(name)):
+        changed = name[:i] + "x" + name[i + 1 :]
+        full_scan = process.extractOne(changed, helper.students.keys())
+        expected = helper.students[full_scan[0]] if full_scan[1] >= 60 else None
+        assert helper.find_student(changed, threshold=60) is expected
+
+
+def test_read_cache_without_index(helper):
+    """Caches pickled before the name index existed still work."""
+    del helper._name_index
+    with shelve.open(str(get_data_dir() / "cache"), "c") as db:
+        db["data"] = helper
+        db["date"] = datetime.datetime.now()
+    cached = Sis.read_cache()
+    assert len(cached._name_index) == len(cached.students)
+
+
+def test_guardian_index_persists(helper):
+    helper.write_cache()
+    cached = Sis.read_cache()
+    index = cached._guardian_index
+    assert not index.is_stale
+    assert cached.guardian_index is index
+
+
+def test_guardian_index_tracks_changes(helper, random_student):
+    guardian = ParentGuardian(
+        {
+            "student": random_student,
+            "first_name": "Zebulon",
+            "last_name": "Quixote",
+            "primary_contact": False,
+        }
+    )
+    assert helper.find_parent("Zebulon Quixote", threshold=95) is None
+    random_student.guardians.append(guardian)
+    assert helper.find_parent("Zebulon Quixote", threshold=95) is guardian
+
+    random_student.primary_contact = guardian
+    assert "Zebulon Quixote" in helper.guardian_index.primary
+
+    random_student.guardians.remove(guardian)
+    random_student.primary_contact = None
+    assert helper.find_parent("Zebulon Quixote", threshold=95) is None
+
+
+def test_find_students(helper):
+    names = [st.name for st in list(helper.students.values())[:20]]
+    queries = []
+    for name in names:
+        queries.append(name)
+        queries.append(name.lower())
+        queries.append(name[:2] + "x" + name[3:])
+    queries += ["Nobody Atall", names[0]]
+
+    stats = LookupStats()
+    results = helper.find_students(queries, threshold=80, stats=stats)
+
+    assert results == [helper.find_student(q, threshold=80) for q in queries]
+    assert results[-2] is None
+    assert results[-1] is helper.students[names[0]]
+    assert stats.queries == len(queries)
+    assert stats.duplicates == 1
+    assert stats.exact_hits == 40
+    assert stats.hits + stats.misses == len(queries) - 1
+    assert set(stats.timings) == set(queries)
+    assert stats.slowest(1)[0][0] in queries
+
+
+def test_normalized_fast_path(helper, random_student):
+    first, last = random_student.first_name, random_student.last_name
+    query = f"  {last.upper()},  {first.lower()} "
+    with patch.object(helper._name_index, "candidate_positions") as fuzzy:
+        assert helper.find_student(query) is random_student
+        fuzzy.assert_not_called()
+    assert helper.fast_path_stats.normalized == 1
+    assert helper.fast_path_stats.fuzzy == 0
+
+    stats = LookupStats()
+    helper.find_students([query, random_student.name], stats=stats)
+    assert (stats.exact_hits, stats.normalized_hits) == (1, 1)
+    assert helper.fast_path_stats.hit_rate == 1.0
+
+
+def test_nicknames(helper, random_student):
+    helper.set_nicknames({"Nicky": random_student.first_name})
+    assert helper.find_student(f"Nicky {random_student.last_name}") is random_student
+    # the table survives a reindex
+    helper.reindex()
+    assert helper.find_student(f"nicky {random_student.last_name}") is random_student
+
+
+def test_phonetic_pre_filter():
+    names = [("Katelyn", "Smith"), ("Kate", "Lynsmith"), ("Sam", "Jones")]
+    students = {
+        f"{first} {last}": Student({"first_name": first, "last_name": last})
+        for first, last in names
+    }
+    sis = Sis({}, students, {})
+    katelyn = students["Katelyn Smith"]
+    guardian = ParentGuardian(
+        {
+            "student": katelyn,
+            "first_name": "Stephen",
+            "last_name": "Smith",
+            "primary_contact": True,
+        }
+    )
+    katelyn.guardians.append(guardian)
+
+    assert sis.find_student("Caitlin Smith", threshold=70) is katelyn
+    assert sis.fast_path_stats.phonetic == 1
+    stats = LookupStats()
+    sis.find_students(["Caitlin Smith"], threshold=70, stats=stats)
+    assert stats.phonetic_hits == 1
+    assert sis.find_parent("Steven Smyth") is guardian
+
+    # names which sound alike still have to clear the threshold
+    assert sis.find_student("Caitlin Smith", threshold=95) is None
+    assert sis.fast_path_stats.fuzzy == 1
+
+
+def test_phonetic_match_does_not_beat_a_closer_spelling():
+    """A name which sounds like the query only wins if no other name scores
+    higher."""
+    names = [("Caitlin", "Smith"), ("Katelyn", "Smiths"), ("Sam", "Jones")]
+    students = {
+        f"{first} {last}": Student({"first_name": first, "last_name": last})
+        for first, last in names
+    }
+    for st in students.values():
+        st.guardians.append(
+            ParentGuardian(
+                {
+                    "student": st,
+                    "first_name": st.first_name,
+                    "last_name": st.last_name,
+                    "primary_contact": True,
+                }
+            )
+        )
+    sis = Sis({}, students, {})
+    closest = students["Katelyn Smiths"]
+    assert sis.find_student("Katelyn Smith", threshold=60) is closest
+    assert sis.fast_path_stats.fuzzy == 1
+    assert sis.find_students(["Katelyn Smith"], threshold=60) == [closest]
+    assert sis.rank_students("Katelyn Smith", k=2)[0] == (closest, 96)
+    assert sis.find_parent("Katelyn Smith", threshold=60) is closest.guardians[0]
+
+
+def test_find_student_beyond_trigram_candidates():
+    """At low thresholds, the best match may share no trigram with the
+    query; it's still found, as it would be by scoring every student."""
+    names = [("Zaiden", "Ray"), ("Devan", "Roy"), ("Sam", "Jones")]
+    students = {
+        f"{first} {last}": Student({"first_name": first, "last_name": last})
+        for first, last in names
+    }
+    sis = Sis({}, students, {})
+    for query in ("fDewvn Ray", "Dveavn Roy"):
+        expected = process.extractOne(query, list(students))[0]
+        assert sis.find_student(query, threshold=60) is students[expected]
+    assert sis.find_student("fDewvn Ray", threshold=60).name == "Devan Roy"
+    assert sis.find_students(["fDewvn Ray"], threshold=60) == [students["Devan Roy"]]
+    assert sis.rank_students("fDewvn Ray", k=1)[0][0].name == "Devan Roy"
+
+
+def test_parallel_matches_serial(helper):
+    names = [st.name for st in list(helper.students.values())[:10]]
+    queries = [n[:2] + "x" + n[3:] for n in names] + ["Nobody Atall"]
+    parents = [g.name for st in helper.students.values() for g in st.guardians][:10]
+    parent_queries = [n[:1] + "e" + n[2:] for n in parents]
+
+    serial = [helper.find_student(q, threshold=60) for q in queries]
+    serial_parents = [helper.find_parent(q) for q in parent_queries]
+
+    helper.enable_parallel(workers=2, crossover=1)
+    try:
+        assert [helper.find_student(q, threshold=60) for q in queries] == serial
+        assert helper.find_students(queries, threshold=60) == serial
+        assert [helper.find_parent(q) for q in parent_queries] == serial_parents
+        # the pool is reused between lookups
+        pool = helper._sharded
+        helper.find_student(queries[0])
+        assert helper._sharded is pool
+    finally:
+        helper.disable_parallel()
+
+
+def test_parallel_scorer_is_not_pickled(helper):
+    helper.enable_parallel(workers=1, crossover=1)
+    try:
+        helper.find_student("Nobody Atall")
+        helper.write_cache()
+    finally:
+        helper.disable_parallel()
+    cached = Sis.read_cache()
+    assert cached._parallel_options is None
+    assert cached._sharded is None
+
+
+def test_rank_students(helper, random_student):
+    name = random_student.name
+    changed = name[:2] + "x" + name[3:]
+    ranked = helper.rank_students(changed, k=3)
+    assert len(ranked) == 3
+    assert ranked[0][0] is helper.find_student(changed, threshold=0)
+    scores = [score for _, score in ranked]
+    assert scores == sorted(scores, reverse=True)
+    assert ranked[0][1] == process.extractOne(changed, helper.students.keys())[1]
+
+    # exact matches come first
+    assert helper.rank_students(name.lower(), k=1) == [(random_student, 100)]
+
+    # threshold leaves out poor matches
+    assert all(s >= 95 for _, s in helper.rank_students(changed, threshold=95))
+
+    # no matches are asked for, even exact ones
+    assert helper.rank_students(changed, k=0) == []
+    assert helper.rank_students(name, k=0) == []
+    assert helper.rank_parents(changed, k=0) == []
+
+
+def test_rank_parents(helper, random_parent):
+    ranked = helper.rank_parents(random_parent.name, k=4)
+    assert len(ranked) == 4
+    assert ranked[0] == (random_parent, 100)
+    assert all(isinstance(g, ParentGuardian) for g, _ in ranked)
+
+
+def test_secondary_indexes(helper, random_student):
+    assert helper.by_email(random_student.email.upper()) is random_student
+    assert helper.by_email("nobody@example.com") is None
+
+    grade = helper.in_grade(random_student.grade_level)
+    assert random_student in grade
+    assert grade == [
+        st
+        for st in helper.students.values()
+        if st.grade_level == random_student.grade_level
+    ]
+
+    homeroom = helper.in_homeroom(random_student.homeroom)
+    assert homeroom == helper.homerooms[random_student.homeroom].students
+
+
+def test_student_id_index(helper, random_student):
+    random_student.student_id = "12345"
+    helper.reindex()
+    assert helper.by_student_id("12345") is random_student
+
+
+def test_guardians_linked_in_row_order(helper, parents_csv):
+    expected = {}
+    for row in parents_csv[1:]:
+        expected.setdefault(f"{row[2]} {row[3]}", []).append(f"{row[0]} {row[1]}")
+    for name, st in helper.students.items():
+        assert [g.name for g in st.guardians] == expected.get(name, [])
+        assert all(g.student is st for g in st.guardians)
+    assert helper.link_report.fallback_rows == []
+
+
+def test_link_report(monkeypatch, students_csv, parents_csv):
+    dir = Path(mkdtemp())
+    monkeypatch.setenv("HELPER_DATA", str(dir))
+    students_csv = [row[:] for row in students_csv]
+    parents_csv = [row[:] for row in parents_csv]
+    # a typo needs the fallback, and isn't linked to the closest student,
+    # which has another name
+    students_csv[1][:2] = "Johnathan", "Smithson"
+    parents_csv[1][2:4] = "Jonathan", "Smithson"
+    parents_csv[301][2:4] = "Johnathan", "Smithson"
+    # nonsense needs the fallback, and doesn't match anything
+    parents_csv[2][2:4] = "Qqqqq", "Zzzzzzz"
+    for filename, data in (
+        ("students.csv", students_csv),
+        ("parents.csv", parents_csv),
+    ):
+        with open(dir / filename, "w") as fp:
+            csv.writer(fp).writerows(data)
+
+    try:
+        sis = Sis.new_school_year()
+    finally:
+        rmtree(dir)
+
+    assert sis.link_report.fallback_rows == [
+        (2, "Jonathan Smithson", "Johnathan Smithson"),
+        (3, "Qqqqq Zzzzzzz", None),
+    ]
+    assert sis.link_report.unmatched_rows == [(3, "Qqqqq Zzzzzzz", None)]
+    assert sis.link_report.rejected_rows == [
+        (2, "Jonathan Smithson", "Johnathan Smithson")
+    ]
+    guardian = " ".join(parents_csv[1][:2])
+    student = sis.students["Johnathan Smithson"]
+    assert guardian not in [g.name for g in student.guardians]
+
+
+def test_off_roster_guardian_is_left_out(monkeypatch, students_csv, parents_csv):
+    monkeypatch.setenv("HELPER_DATA", mkdtemp())
+    write_sources(students_csv, parents_csv)
+    before = Sis.new_school_year()
+    first, last = students_csv[1][:2]
+    row = parents_csv[1][:]
+    # a guardian of a student who isn't on the roster, but whose name is
+    # close to one who is
+    row[:4] = "Someone", "Else", first + "x", last
+    row[4] = "Y"
+    write_sources(students_csv, parents_csv + [row])
+    try:
+        after = Sis.new_school_year()
+    finally:
+        rmtree(get_data_dir())
+
+    key = f"{first} {last}"
+    names = [g.name for g in before.students[key].guardians]
+    assert [g.name for g in after.students[key].guardians] == names
+    assert (
+        after.students[key].primary_contact.name
+        == before.students[key].primary_contact.name
+    )
+    assert after.link_report.rejected_rows == [
+        (len(parents_csv) + 1, f"{first}x {last}", key)
+    ]
+
+
+def test_cache_round_trip(helper):
+    helper.groups["band"] = Group("band", 6, list(helper.students.values())[:3])
+    helper.write_cache()
+    cached = Sis.read_cache()
+
+    assert list(cached.students) == list(helper.students)
+    for key, st in helper.students.items():
+        other = cached.students[key]
+        for attr in ("name", "first_name", "last_name", "grade_level", "email"):
+            assert getattr(other, attr) == getattr(st, attr)
+        assert [g.__getstate__().keys() for g in other.guardians] == [
+            g.__getstate__().keys() for g in st.guardians
+        ]
+        for g, other_g in zip(st.guardians, other.guardians):
+            assert {k: v for k, v in g.__getstate__().items() if k != "student"} == {
+                k: v for k, v in other_g.__getstate__().items() if k != "student"
+            }
+            assert other_g.student is other
+        if st.primary_contact is None:
+            assert other.primary_contact is None
+        else:
+            assert other.primary_contact in other.guardians
+            assert other.primary_contact.name == st.primary_contact.name
+
+    for key, homeroom in cached.homerooms.items():
+        assert [s.name for s in homeroom.students] == [
+            s.name for s in helper.homerooms[key].students
+        ]
+        assert all(cached.students[s.name] is s for s in homeroom.students)
+    assert [s.name for s in cached.groups["band"].students] == [
+        s.name for s in helper.groups["band"].students
+    ]
+    assert cached.link_report == helper.link_report
+
+
+def test_read_cache_is_lazy(helper, random_student, random_parent):
+    helper.write_cache()
+    cached = Sis.read_cache()
+    assert cached.students._loaded == {}
+
+    assert cached.find_student(random_student.name).name == random_student.name
+    assert list(cached.students._loaded) == [random_student.name]
+    assert "_guardian_index" not in vars(cached)
+
+    assert cached.find_parent(random_parent.name).name == random_parent.name
+    assert cached.by_email(random_student.email).name == random_student.name
+    assert len(cached.students._loaded) <= 3
+
+
+def test_pickle_cached_sis(helper):
+    helper.write_cache()
+    cached = Sis.read_cache()
+    copy = pickle.loads(pickle.dumps(cached))
+    assert type(copy.students) is dict
+    assert check_helper_equality(copy, helper)
+    assert list(copy._name_index.names) == list(helper._name_index.names)
+
+
+def test_cache_header(helper):
+    assert Sis.read_cache_header() is None
+    assert Sis.cache_is_stale()
+
+    helper.write_cache()
+    header = Sis.read_cache_header()
+    assert header.is_compatible
+    assert (datetime.datetime.now() - header.written_at).seconds < 1
+    assert set(header.source_hashes) == {"students.csv", "parents.csv"}
+    assert header.changed_sources(get_data_dir()) == []
+    assert not Sis.cache_is_stale()
+
+    with open(get_data_dir() / "parents.csv", "a") as fp:
+        fp.write("\n")
+    assert header.changed_sources(get_data_dir()) == ["parents.csv"]
+    assert Sis.cache_is_stale()
+
+
+def test_cache_checks_only_read_header(helper):
+    helper.write_cache()
+    with patch("teacherhelper.sis._cache.CacheReader") as reader:
+        assert Sis.cache_exists()
+        assert not Sis.cache_is_stale()
+        reader.assert_not_called()
+
+
+def test_incompatible_cache_version(helper):
+    helper.write_cache()
+    with closing(sqlite3.connect(get_data_dir() / "cache.sqlite3")) as db:
+        db.execute("UPDATE meta SET value = 0 WHERE key = 'schema_version'")
+        db.commit()
+    assert Sis.cache_exists()
+    assert Sis.cache_is_stale()
+    with pytest.raises(ValueError):
+        Sis.read_cache()
+
+
+def write_sources(students_csv, parents_csv):
+    for filename, data in (
+        ("students.csv", students_csv),
+        ("parents.csv", parents_csv),
+    ):
+        with open(get_data_dir() / filename, "w") as fp:
+            csv.writer(fp).writerows(data)
+
+
+def check_same_roster(a: Sis, b: Sis):
+    assert list(a.students) == list(b.students)
+    for key, st in a.students.items():
+        other = b.students[key]
+        for attr in ("homeroom", "grade_level", "email", "student_id"):
+            assert getattr(st, attr) == getattr(other, attr)
+        assert [(g.name, g.mobile_phone) for g in st.guardians] == [
+            (g.name, g.mobile_phone) for g in other.guardians
+        ]
+        assert getattr(st.primary_contact, "name", None) == getattr(
+            other.primary_contact, "name", None
+        )
+    assert set(a.homerooms) == set(b.homerooms)
+    for key, homeroom in a.homerooms.items():
+        assert [s.name for s in homeroom.students] == [
+            s.name for s in b.homerooms[key].students
+        ]
+
+
+def test_refresh_without_changes(helper):
+    students = dict(helper.students)
+    with patch("teacherhelper.sis._cache.write") as write:
+        report = helper.refresh(write=False)
+        write.assert_not_called()
+    assert not report.changed
+    assert all(helper.students[k] is st for k, st in students.items())
+
+
+def test_refresh(helper, students_csv, parents_csv):
+    helper.groups["band"] = Group("band", 6, list(helper.students.values())[:3])
+    helper.write_cache()
+    cached = Sis.read_cache()
+    before = dict(cached.students.items())
+
+    students_csv = [row[:] for row in students_csv]
+    parents_csv = [row[:] for row in parents_csv]
+    removed = " ".join(students_csv.pop(1)[:2])
+    moved, emailed = (" ".join(row[:2]) for row in students_csv[1:3])
+    students_csv[1][3] = "Newteacher, Ms"
+    students_csv[2][4] = "new@empacad.org"
+    students_csv.append(["Zed", "Zebra", "5th Grade", students_csv[1][3], "z@e", ""])
+    # a new guardian for the new student, and a new phone number for another
+    parents_csv.append(
+        ["Zoe", "Zebra", "Zed", "Zebra", "Y", "", "", "", "", "", "Y", "Y", ""]
+    )
+    parents_csv[5][6] = "9731112222"
+    rephoned = " ".join(parents_csv[5][2:4])
+    write_sources(students_csv, parents_csv)
+
+    with patch("teacherhelper.sis._cache.write") as write:
+        report = cached.refresh()
+        write.assert_not_called()
+
+    assert report.removed == [removed]
+    assert report.added == ["Zed Zebra"]
+    assert report.updated == [moved, emailed]
+    assert report.guardians_updated == [rephoned]
+    assert report.homerooms_added == ["Newteacher, Ms"]
+    assert report.groups_changed == ["band"]
+    assert removed not in cached.students
+    assert cached.by_email("new@empacad.org").name == emailed
+    assert [s.name for s in cached.in_homeroom("Newteacher, Ms")] == [
+        moved,
+        "Zed Zebra",
+    ]
+    assert cached.find_parent("Zoe Zebra").student is cached.students["Zed Zebra"]
+    assert not cached.cache_is_stale()
+
+    # unchanged students are left alone
+    for key, st in before.items():
+        if key != removed:
+            assert cached.students[key] is st
+
+    rebuilt = Sis.new_school_year()
+    check_same_roster(cached, rebuilt)
+    reread = Sis.read_cache()
+    check_same_roster(reread, rebuilt)
+    assert [s.name for s in reread.groups["band"].students] == [
+        s.name for s in list(helper.students.values())[1:3]
+    ]
+    assert reread.find_parent("Zoe Zebra").student is reread.students["Zed Zebra"]
+
+
+def with_zebras(students_csv, parents_csv):
+    return (
+        students_csv + [["Zed", "Zebra", "5th Grade", students_csv[1][3], "z@e", ""]],
+        parents_csv
+        + [["Zoe", "Zebra", "Zed", "Zebra", "Y", "", "", "", "", "", "Y", "Y", ""]],
+    )
+
+
+def test_readers_keep_their_version(helper, students_csv, parents_csv):
+    helper.write_cache()
+    old = Sis.read_cache()
+    fresh = Sis.read_cache()
+    write_sources(*with_zebras(students_csv, parents_csv))
+    fresh.refresh()
+
+    # the refresh published a new file rather than changing the one that
+    # `old` is reading, which still loads its version lazily
+    assert "Zed Zebra" not in old.students
+    assert not old.students._loaded
+    check_same_roster(old, helper)
+    assert "Zed Zebra" in Sis.read_cache().students
+
+    # `fresh` follows the versions it publishes, so a second refresh
+    # applies on top of the first
+    write_sources(students_csv, parents_csv)
+    assert fresh.refresh().removed == ["Zed Zebra"]
+    check_same_roster(Sis.read_cache(), helper)
+    assert not list(get_data_dir().glob("*.tmp"))
+
+
+def read_published_caches(data_dir, deadline, versions):
+    """Read the cache until *deadline*, checking that each read sees one
+    whole version. *versions* maps the hash of students.csv to the students
+    of that version."""
+    os.environ["HELPER_DATA"] = data_dir
+    seen = set()
+    while time.time() < deadline:
+        sis = Sis.read_cache(check_date=False)
+        digest = sis.source_hashes["students.csv"]
+        keys = list(sis.students)
+        assert keys == versions[digest]
+        assert sum(len(h.students) for h in sis.homerooms.values()) == len(keys)
+        assert sis.find_student(keys[-1]) is sis.students[keys[-1]]
+        sis._cache.close()
+        seen.add(digest)
+    return seen
+
+
+def test_concurrent_readers(helper, students_csv, parents_csv):
+    """Readers in other processes only ever see complete versions of the
+    cache while it is republished, both incrementally and in full."""
+    sources = [(students_csv, parents_csv), with_zebras(students_csv, parents_csv)]
+    versions = {}
+    for source in sources:
+        write_sources(*source)
+        path = get_data_dir() / "students.csv"
+        versions[file_sha256(path)] = [" ".join(r[:2]) for r in source[0][1:]]
+    helper.write_cache()
+    cached = Sis.read_cache()
+
+    deadline = time.time() + 2
+    with ProcessPoolExecutor(max_workers=3) as pool:
+        readers = [
+            pool.submit(read_published_caches, str(get_data_dir()), deadline, versions)
+            for _ in range(3)
+        ]
+        i = 0
+        while time.time() < deadline:
+            i += 1
+            write_sources(*sources[i % 2])
+            cached.refresh()
+            if i % 3 == 0:
+                helper.write_cache()
+        seen = set().union(*(reader.result() for reader in readers))
+    assert seen == set(versions)
+
+
+def test_lookup_cache(helper, random_student, random_parent):
+    assert helper.lookup_cache_stats is None
+    helper.enable_lookup_cache(maxsize=2)
+    typo = random_student.name[:-1]
+    with patch.object(Sis, "_find_student", wraps=helper._find_student) as lookup:
+        first = helper.find_student(typo, threshold=60)
+        assert helper.find_student(typo, threshold=60) is first
+        lookup.assert_called_once()
+        # the threshold is part of the key
+        helper.find_student(typo, threshold=99)
+        assert lookup.call_count == 2
+
+    assert helper.find_parent(random_parent.name) is random_parent
+    stats = helper.lookup_cache_stats
+    assert (stats.hits, stats.misses, stats.evictions, stats.size) == (1, 3, 1, 2)
+    assert stats.hit_rate == 0.25
+
+    helper.disable_lookup_cache()
+    assert helper.lookup_cache_stats is None
+
+
+def test_lookup_cache_invalidation(helper, students_csv, parents_csv):
+    helper.enable_lookup_cache()
+    assert helper.find_student("Zed Zebra") is None
+    assert helper.find_parent("Zoe Zebra", threshold=95) is None
+
+    students_csv = students_csv + [
+        ["Zed", "Zebra", "5th Grade", students_csv[1][3], "z@e", ""]
+    ]
+    parents_csv = parents_csv + [
+        ["Zoe", "Zebra", "Zed", "Zebra", "Y", "", "", "", "", "", "Y", "Y", ""]
+    ]
+    write_sources(students_csv, parents_csv)
+    with patch("teacherhelper.sis._cache.write"):
+        helper.refresh()
+
+    assert helper.find_student("Zed Zebra") is helper.students["Zed Zebra"]
+    assert helper.find_parent("Zoe Zebra", threshold=95).name == "Zoe Zebra"
+    assert helper.lookup_cache_stats.invalidations == 1
+
+
+def test_complete(helper, random_student):
+    first, last = random_student.first_name, random_student.last_name
+    assert random_student.name in helper.complete(first[:3].lower(), limit=None)
+    assert random_student.name in helper.complete(f"{first} {last[:2]}")
+    assert random_student.name in helper.complete(last, kind="student", limit=None)
+    guardian = random_student.guardians[0]
+    assert guardian.name in helper.complete(guardian.name, kind="parent")
+    assert random_student.name not in helper.complete(
+        random_student.name, kind="parent"
+    )
+    assert len(helper.complete("", limit=7)) == 7
+    assert helper.complete("a", limit=0) == []
+    with pytest.raises(ValueError, match="can't complete"):
+        helper.complete("a", kind="teacher")
+
+
+def test_complete_new_names(helper, students_csv, parents_csv):
+    assert helper.complete("zebr") == []
+    write_sources(*with_zebras(students_csv, parents_csv))
+    with patch("teacherhelper.sis._cache.write"):
+        helper.refresh()
+    assert helper.complete("zebr") == ["Zed Zebra", "Zoe Zebra"]
+    assert helper.complete("zebr", kind="parent") == ["Zoe Zebra"]
+
+
+def test_complete_from_cache(helper):
+    helper.write_cache()
+    names = helper.complete("a", limit=None)
+    assert Sis.read_cache().complete("a", limit=None) == names
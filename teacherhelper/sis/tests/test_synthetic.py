@@ -0,0 +1,46 @@
+from collections import Counter, defaultdict
+
+import pytest
+
+from .. import Sis, synthetic_roster, write_synthetic_exports
+
+
+def test_synthetic_roster():
+    students, guardians = synthetic_roster(300, guardians=(1, 3))
+    assert len(students) == 301
+    names = [(r[0], r[1]) for r in students[1:]]
+    assert len(set(names)) == 300
+
+    per_student = Counter((r[2], r[3]) for r in guardians[1:])
+    assert set(per_student) == set(names)
+    assert set(per_student.values()) <= {1, 2, 3}
+    assert sum(r[4] == "Y" for r in guardians[1:]) == 300
+
+    grades = defaultdict(set)
+    for row in students[1:]:
+        grades[row[3]].add(row[2])
+    assert all(len(g) == 1 for g in grades.values())
+    teachers = {tuple(reversed(t.split(", "))) for t in grades}
+    assert not teachers & set(names)
+
+
+def test_same_seed_same_roster():
+    assert synthetic_roster(50, seed=3) == synthetic_roster(50, seed=3)
+    assert synthetic_roster(50, seed=3) != synthetic_roster(50, seed=4)
+
+
+def test_too_many_students():
+    with pytest.raises(ValueError, match="distinct names"):
+        synthetic_roster(10**9)
+
+
+def test_new_school_year(tmp_path, monkeypatch):
+    monkeypatch.setenv("HELPER_DATA", str(tmp_path))
+    write_synthetic_exports(tmp_path, 200)
+    sis = Sis.new_school_year()
+    students, guardians = synthetic_roster(200)
+    assert len(sis.students) == 200
+    assert sum(len(st.guardians) for st in sis.students.values()) == (
+        len(guardians) - 1
+    )
+    assert len(sis.homerooms) == 8
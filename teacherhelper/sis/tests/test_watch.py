@@ -0,0 +1,91 @@
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from teacherhelper._data_dir import get_data_dir
+from .fixtures import students_csv, parents_csv
+from .test_sis import helper, write_sources
+from .._sis import Sis
+from .._watch import CacheWatcher
+
+
+def new_student(students_csv):
+    return students_csv + [["Zed", "Zebra", "5th Grade", students_csv[1][3], "z@e", ""]]
+
+
+@pytest.fixture
+def watcher(helper):
+    reports = []
+    done = threading.Event()
+
+    def on_rebuild(report):
+        reports.append(report)
+        done.set()
+
+    watcher = CacheWatcher(debounce=0.05, on_rebuild=on_rebuild)
+    watcher.reports = reports
+    watcher.done = done
+    yield watcher
+    if watcher._timer is not None:
+        watcher._timer.cancel()
+
+
+def test_builds_missing_cache(watcher):
+    assert not Sis.cache_exists()
+    watcher.rebuild()
+    assert watcher.reports == [None]
+    assert not Sis.cache_is_stale()
+
+    # unchanged exports don't cause a rebuild
+    watcher.rebuild()
+    assert watcher.reports == [None]
+
+
+def test_debounced_incremental_rebuild(helper, watcher, students_csv, parents_csv):
+    helper.write_cache()
+    write_sources(new_student(students_csv), parents_csv)
+    path = get_data_dir() / "students.csv"
+    with patch.object(Sis, "new_school_year") as new_school_year:
+        for _ in range(5):
+            watcher.on_change(path)
+        # the cache and other files in the data directory are ignored
+        watcher.on_change(get_data_dir() / "cache.sqlite3")
+        assert watcher.done.wait(5)
+        new_school_year.assert_not_called()
+
+    (report,) = watcher.reports
+    assert report.added == ["Zed Zebra"]
+    assert "Zed Zebra" in Sis.read_cache().students
+    assert "_cache" not in vars(watcher.sis)
+
+
+def test_unreadable_export_keeps_cache(helper, watcher, students_csv, parents_csv):
+    helper.write_cache()
+    broken = [row[:] for row in new_student(students_csv)]
+    broken[-1][2] = "Kindergarten"
+    write_sources(broken, parents_csv)
+    watcher.rebuild()
+    assert watcher.reports == []
+    assert "Zed Zebra" not in Sis.read_cache().students
+
+    write_sources(new_student(students_csv), parents_csv)
+    watcher.rebuild()
+    assert watcher.reports[0].added == ["Zed Zebra"]
+
+
+def test_run(helper, watcher, students_csv, parents_csv):
+    pytest.importorskip("watchdog")
+    helper.write_cache()
+    stop = threading.Event()
+    thread = threading.Thread(target=watcher.run, args=(stop,))
+    thread.start()
+    try:
+        # give the observer a moment to start
+        threading.Event().wait(0.5)
+        write_sources(new_student(students_csv), parents_csv)
+        assert watcher.done.wait(10)
+    finally:
+        stop.set()
+        thread.join()
+    assert watcher.reports[0].added == ["Zed Zebra"]
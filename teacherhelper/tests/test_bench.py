@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from .. import _bench
+from ..__main__ import main
+
+BENCHMARKS = [
+    "new_school_year",
+    "write_cache",
+    "read_cache",
+    "read_cache (load all)",
+    "find_student (hit)",
+    "find_student (miss)",
+    "find_parent",
+    "RubricWriter.add_pages",
+    "complete (first)",
+    "complete",
+]
+
+
+def test_run(monkeypatch):
+    monkeypatch.delenv("HELPER_DATA", raising=False)
+    timings = []
+    results = _bench.run([40, 60], lookups=10, pages=3, progress=timings.append)
+    assert [t.benchmark for t in timings] == BENCHMARKS * 2
+    assert [r["students"] for r in results["results"]] == [40] * 10 + [60] * 10
+    assert results["results"][4]["ops"] == 10
+    assert results["results"][5]["ops"] == 1
+    assert results["results"][7]["ops"] == 3
+    assert all(r["per_op"] > 0 for r in results["results"])
+    assert json.loads(json.dumps(results)) == results
+    assert "HELPER_DATA" not in _bench.os.environ
+
+
+def test_timing_without_ops():
+    timing = _bench.Timing("a", 10, 0, 0.5)
+    assert timing.per_op == 0.0
+    assert str(timing).split() == ["10", "a", "0", "0.000ms"]
+
+
+def test_bench_rejects_no_lookups(capsys):
+    with pytest.raises(SystemExit):
+        main(["bench", "--lookups", "0"])
+    assert "must be at least 1" in capsys.readouterr().err
+
+
+def test_compare():
+    before = {"results": [{"benchmark": "a", "students": 10, "per_op": 0.002}]}
+    after = {
+        "results": [
+            {"benchmark": "a", "students": 10, "per_op": 0.001},
+            {"benchmark": "a", "students": 20, "per_op": 0.004},
+        ]
+    }
+    (line,) = _bench.compare(before, after)
+    assert line.split() == ["10", "a", "2.000ms", "->", "1.000ms", "(0.50x)"]
+
+
+def test_bench_command(tmp_path, capsys):
+    saved = tmp_path / "bench.json"
+    args = ["bench", "--sizes", "30", "--lookups", "5", "--pages", "2"]
+    main(args + ["--json", str(saved)])
+    out = capsys.readouterr().out.splitlines()
+    assert len(out) == 1 + len(BENCHMARKS)
+    assert out[2].split()[:2] == ["30", "write_cache"]
+
+    main(args + ["--compare", str(saved)])
+    out = capsys.readouterr().out
+    assert "compared with" in out
+    assert "-> " in out.splitlines()[-1]
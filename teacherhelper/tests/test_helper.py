@@ -5,6 +5,8 @@ import random
 from typing import cast
 from shutil import rmtree
 import shelve
+import sqlite3
+from contextlib import closing
 import datetime
 from tempfile import mkdtemp
 from pathlib import Path
@@ -14,6 +16,7 @@ from webbrowser import get
 import pytest
 
 from .._data_dir import get_data_dir
+from ..sis._index import process_name
 from ..sis.tests.fixtures import students_csv, parents_csv
 from ..helper import Helper, get_helper
 
@@ -78,24 +81,22 @@ def test_get_helper(helper):
 
 def test_write_cache(helper):
     helper.write_cache()
-    cache = get_data_dir() / "cache"
+    cache = get_data_dir() / "cache.sqlite3"
+    assert cache.exists()
 
-    # some file matching this pattern is in the folder. Different platforms
-    # will call it different things
-    assert any("cache" in str(i) for i in get_data_dir().iterdir())
-
-    # the slice is because we need to change `cache.db` to just `cache` at
-    # the end of the path for shelve
-    with shelve.open(str(cache), "r") as db:
-        # `date` points to a datetime object
-        assert isinstance(db["date"], datetime.datetime)
-        date = cast(datetime.datetime, db["date"])
+    with closing(sqlite3.connect(cache)) as db:
+        # the date the cache was written is stored in the meta table
+        (value,) = db.execute("SELECT value FROM meta WHERE key = 'date'").fetchone()
+        date = datetime.datetime.fromisoformat(value)
 
         # `date` is *almost* right now
         assert (datetime.datetime.now() - date).seconds < 1
 
-        cached_helper = cast(Helper, db["data"])
-        check_helper_equality(cached_helper, helper)
+        # every student is in the students table
+        keys = [k for k, in db.execute("SELECT key FROM students ORDER BY ordinal")]
+        assert keys == list(helper.students)
+
+    assert check_helper_equality(Helper.read_cache(), helper)
 
 
 def test_read_cache(helper):
@@ -110,28 +111,24 @@ def test_find_nearest_match(helper, random_student):
     changed[3] = "b"
     changed = "".join(changed)
 
-    with patch("teacherhelper.sis._sis.process.extractOne") as p:
+    scores = {}
+
+    def fake_score(query, choice):
+        assert query == process_name(changed)
+        return scores.get(choice, 0)
 
+    with patch("teacherhelper.sis._index.score", side_effect=fake_score):
         # 89 is below the default threshold of 90
-        p.return_value = name, 89
-        result = helper.find_nearest_match(changed)
-        assert p.mock_calls[-1].args[0] == changed
-        assert result is None
+        scores[process_name(name)] = 89
+        assert helper.find_nearest_match(changed) is None
 
         # if we lower the threshold, we get a result
-        p.return_value = name, 89
         result = helper.find_nearest_match(changed, threshold=88)
-        assert p.mock_calls[-1].args[0] == changed
         assert result is random_student
 
         # if we raise the confidence of the search result, we get a result
-        p.return_value = name, 95
-        result = helper.find_nearest_match(changed)
-        assert p.mock_calls[-1].args[0] == changed
-        assert result is random_student
-
-        for call in p.mock_calls:
-            assert call.args[1] == helper.students.keys()
+        scores[process_name(name)] = 95
+        assert helper.find_nearest_match(changed) is random_student
 
 
 def test_find_parent(helper, random_parent):
@@ -0,0 +1,138 @@
+"""Importing the package, and starting `th`, shouldn't import the modules
+which aren't needed, or print anything. These tests run the imports in a new
+interpreter under `python -X importtime`, and check what it reports."""
+
+import subprocess
+import sys
+from typing import Dict, Tuple
+import warnings
+
+import pytest
+
+import teacherhelper
+
+# modules which are slow to import, and which startup shouldn't need
+HEAVY = (
+    "fuzzywuzzy",
+    "markdown",
+    "sqlite3",
+    "docx",
+    "googleapiclient",
+    "teacherhelper.email_",
+    "teacherhelper.helper",
+    "teacherhelper.sis",
+    "teacherhelper.sis._server",
+    "teacherhelper.sis._watch",
+)
+
+
+def import_times(code: str) -> Tuple[str, Dict[str, int]]:
+    """Run *code* in a new interpreter, and return what it printed along
+    with the cumulative import time of each module, in microseconds."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return proc.stdout, times
+
+
+@pytest.mark.parametrize(
+    "code",
+    (
+        "import teacherhelper",
+        "import teacherhelper.__main__",
+        # `th -s` with no lookup server running gets this far before it
+        # needs the cache
+        "from teacherhelper import _daemon; _daemon.find('student', 'x')",
+    ),
+)
+def test_startup_is_light(code, tmp_path, monkeypatch):
+    monkeypatch.setenv("HELPER_DATA", str(tmp_path))
+    monkeypatch.delenv("EMAIL_USERNAME", raising=False)
+    output, times = import_times(code)
+    assert output == ""
+    assert "teacherhelper" in times
+    assert [m for m in HEAVY if m in times] == []
+
+
+def test_cli_help_is_light():
+    output, times = import_times(
+        "import sys; sys.argv = ['th', '--help']\n"
+        "from teacherhelper.__main__ import main\n"
+        "try:\n    main()\nexcept SystemExit:\n    pass"
+    )
+    assert "--serve" in output
+    assert [m for m in HEAVY if m in times] == []
+
+
+def test_cli_import_time():
+    """Starting `th` takes a fraction of the time that importing the lookup
+    machinery does."""
+    _, times = import_times("import teacherhelper.__main__, teacherhelper.sis")
+    assert times["teacherhelper.__main__"] < times["teacherhelper.sis"] / 2, times
+
+
+def test_sis_import_skips_process_pool():
+    """Only ingesting in parallel and `ShardedScorer` start a process pool,
+    so lookups don't pay for importing multiprocessing."""
+    _, times = import_times("import teacherhelper.sis")
+    assert "teacherhelper.sis" in times
+    assert "concurrent.futures.process" not in times
+    assert "multiprocessing" not in times
+
+
+def test_sis_import_skips_server():
+    """The lookup server, cache watcher and synthetic rosters are exported
+    lazily, since lookups don't need them."""
+    _, times = import_times("import teacherhelper.sis")
+    assert "teacherhelper.sis" in times
+    for module in ("_server", "_watch", "_synthetic"):
+        assert f"teacherhelper.sis.{module}" not in times
+
+
+def test_lazy_exports():
+    from teacherhelper.email_ import Email
+    from teacherhelper.helper import Helper
+    from teacherhelper.sis import Sis
+
+    assert teacherhelper.Sis is Sis
+    assert teacherhelper.Email is Email
+    assert teacherhelper.Helper is Helper
+    assert teacherhelper.sis.Sis is Sis
+    assert {"Email", "Helper", "Sis", "sis", "docx"} <= set(dir(teacherhelper))
+    with pytest.raises(AttributeError):
+        teacherhelper.Nothing
+
+    from teacherhelper.sis._server import LookupServer
+    from teacherhelper.sis._synthetic import synthetic_roster
+    from teacherhelper.sis._watch import CacheWatcher
+
+    assert teacherhelper.sis.LookupServer is LookupServer
+    assert teacherhelper.sis.CacheWatcher is CacheWatcher
+    assert teacherhelper.sis.synthetic_roster is synthetic_roster
+    assert {"CacheWatcher", "LookupServer", "write_synthetic_exports"} <= set(
+        dir(teacherhelper.sis)
+    )
+    with pytest.raises(AttributeError):
+        teacherhelper.sis.Nothing
+
+
+def test_email_warns_about_missing_credentials(monkeypatch):
+    from teacherhelper.email_ import Email
+
+    monkeypatch.delenv("EMAIL_USERNAME", raising=False)
+    monkeypatch.setenv("EMAIL_PASSWORD", "hunter2")
+    with pytest.warns(UserWarning, match="EMAIL_USERNAME"):
+        Email()
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        Email(username="me@example.com")
@@ -0,0 +1,62 @@
+import io
+import json
+
+import pytest
+
+from ..__main__ import batch, main
+from ..sis.tests.fixtures import students_csv, parents_csv
+from ..sis.tests.test_sis import helper
+
+
+def run_batch(names, **kwargs):
+    out = io.StringIO()
+    batch(io.StringIO("\n".join(names)), out=out, **kwargs)
+    return [json.loads(line) for line in out.getvalue().splitlines()]
+
+
+def test_batch_students(helper):
+    helper.write_cache()
+    first, second = list(helper.students.values())[:2]
+    records = run_batch([first.name, "", f"  {second.name[:-1]}  ", "Zzyzx Qwerty"])
+    assert [r["query"] for r in records] == [
+        first.name,
+        second.name[:-1],
+        "Zzyzx Qwerty",
+    ]
+    assert records[0] == {
+        "query": first.name,
+        "match": first.name,
+        "score": 100,
+        "student_id": first.student_id,
+        "grade_level": first.grade_level,
+        "homeroom": first.homeroom,
+        "email": first.email,
+    }
+    assert records[1]["match"] == second.name
+    assert 60 <= records[1]["score"] < 100
+    assert records[1]["score"] == helper.rank_students(second.name[:-1], k=1)[0][1]
+    assert records[2] == {**dict.fromkeys(records[0]), "query": "Zzyzx Qwerty"}
+
+
+def test_batch_parents(helper):
+    helper.write_cache()
+    guardian = list(helper.students.values())[5].guardians[0]
+    (record,) = run_batch([guardian.name], kind="parent")
+    assert record["match"] == guardian.name
+    assert record["student"] == guardian.student.name
+    assert record["mobile_phone"] == guardian.mobile_phone
+    assert record["primary_contact"] == guardian.primary_contact
+
+
+def test_batch_command(helper, tmp_path, capsys):
+    helper.write_cache()
+    names = tmp_path / "names.txt"
+    names.write_text("\n".join(list(helper.students)[:3]))
+    main(["batch", str(names), "--threshold", "95"])
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["score"] for line in lines] == [100] * 3
+
+
+def test_batch_without_cache(helper):
+    with pytest.raises(ValueError, match="cache does not exist"):
+        run_batch(["anyone"])
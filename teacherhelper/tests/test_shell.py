@@ -0,0 +1,51 @@
+import pytest
+
+from .._shell import COMPLETION_LIMIT, NameCompleter, unclosed_string
+from ..sis.tests.fixtures import students_csv, parents_csv
+from ..sis.tests.test_sis import helper
+
+
+@pytest.mark.parametrize(
+    "line, typed",
+    (
+        ("sis", None),
+        ('sis.find_student("Jo Sm', "Jo Sm"),
+        ("sis.find_student('Jo", "Jo"),
+        ("f('a', \"O'Br", "O'Br"),
+        ("f('a', 'b')", None),
+        ('f("a \\" b', 'a \\" b'),
+    ),
+)
+def test_unclosed_string(line, typed):
+    assert unclosed_string(line) == typed
+
+
+def test_completes_names_in_strings(helper):
+    student = list(helper.students.values())[7]
+    completer = NameCompleter({"sis": helper}, helper)
+    typed = f"{student.first_name} {student.last_name[:2]}".lower()
+    matches = completer.completions(typed, f'sis.find_student("{typed}')
+    assert student.name in matches
+    if len(matches) > 1:
+        # readline mustn't replace what was typed with a prefix of the matches
+        assert matches[-1] == typed
+
+    # only the text after the last delimiter is replaced
+    name = helper.complete(student.last_name)[0]
+    typed = name[:-2]
+    assert completer.completions(typed[2:], f'"{typed}') == [name[2:]]
+
+
+def test_too_many_names(helper):
+    completer = NameCompleter({"sis": helper}, helper)
+    matches = completer.completions("", '"')
+    assert len(matches) == COMPLETION_LIMIT + 1
+    assert matches[-1] == ""
+
+
+def test_completes_python_outside_strings(helper):
+    completer = NameCompleter({"sis": helper}, helper)
+    assert "sis.find_student(" in completer.completions("sis.find_s", "sis.find_s")
+    # "=" is a delimiter, but the space after it isn't
+    assert completer.completions(" sis.comp", "x = sis.comp") == [" sis.complete("]
+    assert NameCompleter({}).completions("Jo", '"Jo') == []